@@ -1,4 +1,4 @@
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request, Response
 from flask_cors import CORS
 from backend.config import Config
 from backend.database import db
@@ -7,6 +7,7 @@ from backend.routes.public import public_bp
 from backend.routes.admin import admin_bp
 from backend.routes.auth import auth_bp
 from backend.routes.doctor_self import doctor_self_bp
+from backend.services import metrics, profiler, tracing, scheduler, maintenance, otp_dispatch, revocation, challenge_store, dedup, location_buffer, group_commit, doctor_events, coherence, search_snapshot
 
 def create_app():
     app = Flask(__name__, template_folder="../web/templates", static_folder="../web/static")
@@ -16,6 +17,30 @@ def create_app():
     CORS(app, resources={r"/api/*": {"origins": "*"}})
 
     db.init_app(app)
+    metrics.init_app(app)
+    profiler.init_app(app)
+    tracing.init_app(app)
+    otp_dispatch.init_app(app)
+    challenge_store.init_app(app)
+    location_buffer.init_app(app)
+    group_commit.init_app(app)
+    doctor_events.init_app(app)
+    dedup.init_app(app)
+    coherence.init_app(app)
+    
+    # Background jobs
+    scheduler.every("purge_expired", Config.PURGE_INTERVAL_MINUTES * 60, maintenance.purge_expired)
+    scheduler.every("dedup_scan", Config.DEDUP_SCAN_INTERVAL_HOURS * 3600, dedup.scan_all)
+    # Every worker keeps its own copy of the JWT denylist; on its own thread so long jobs can't hold up logouts
+    scheduler.every("revocation_sync", Config.REVOCATION_SYNC_SECONDS, revocation.sync, single_process=False,
+                    own_thread=True)
+    # Each worker writes its own buffered location moves
+    scheduler.every("location_flush", Config.LOCATION_FLUSH_SECONDS, location_buffer.flush, single_process=False)
+    # One worker writes the search snapshot; every worker maps the newest file
+    scheduler.every("search_snapshot_build", Config.SEARCH_SNAPSHOT_BUILD_SECONDS, search_snapshot.build_if_stale)
+    scheduler.every("search_snapshot_refresh", Config.SEARCH_SNAPSHOT_REFRESH_SECONDS, search_snapshot.refresh,
+                    single_process=False)
+    scheduler.init_app(app)
 
     app.register_blueprint(search_bp)
     app.register_blueprint(public_bp)
@@ -34,6 +59,14 @@ def create_app():
     def favicon():
         return "", 204
     
+    # Prometheus scrape endpoint
+    @app.route("/metrics")
+    def metrics_endpoint():
+        token = app.config.get("METRICS_TOKEN")
+        if token and request.headers.get("Authorization") != f"Bearer {token}":
+            return jsonify({"error": "Unauthorized"}), 401
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+    
     # Error handlers (simplified for deployment stability)
     @app.errorhandler(500)
     def internal_error(e):
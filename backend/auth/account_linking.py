@@ -4,8 +4,12 @@ Handles finding or creating doctors across all auth methods.
 Prevents duplicate accounts and links auth methods to existing doctors.
 """
 
+from sqlalchemy import and_, or_
 from backend.database import db
 from backend.models.doctor import Doctor
+from backend.models.doctor_identity import DoctorIdentity, IDENTITY_COLUMNS, normalize_identifier
+from backend.normalization.qualification import resolve_specialty
+from backend.services import group_commit
 from datetime import datetime
 import uuid
 
@@ -18,14 +22,23 @@ def find_doctor_by_identifier(identifier: str, method: str):
         method: 'otp', 'magic', 'google'
     """
     
-    if method == 'otp':
-        return Doctor.query.filter_by(personal_mobile=identifier).first()
-    elif method == 'magic':
-        return Doctor.query.filter_by(email=identifier.lower()).first()
-    elif method == 'google':
-        return Doctor.query.filter_by(google_sub=identifier).first()
+    identifier = normalize_identifier(method, identifier)
+    if method not in IDENTITY_COLUMNS or not identifier:
+        return None
     
-    return None
+    return Doctor.query.join(DoctorIdentity, DoctorIdentity.doctor_id == Doctor.id) \
+        .filter(DoctorIdentity.method == method, DoctorIdentity.identifier == identifier) \
+        .first()
+
+
+def _candidate_identities(identifier: str, method: str, profile_data: dict):
+    """(method, identifier) pairs to resolve, the login identity first"""
+    candidates = [(method, normalize_identifier(method, identifier))]
+    if method != 'magic':
+        candidates.append(('magic', normalize_identifier('magic', profile_data.get('email'))))
+    if method != 'otp':
+        candidates.append(('otp', normalize_identifier('otp', profile_data.get('personal_mobile'))))
+    return [(m, i) for m, i in candidates if i]
 
 
 def find_or_create_doctor(identifier: str, method: str, profile_data: dict):
@@ -33,6 +46,10 @@ def find_or_create_doctor(identifier: str, method: str, profile_data: dict):
     Find existing doctor or create new one.
     Implements account linking logic.
     
+    The login identity and any email/mobile in profile_data are resolved in
+    one indexed query, and linking or creating happens in the same
+    group-commit unit, so two logins can't both create the doctor.
+    
     Args:
         identifier: The auth identifier (mobile/email/google_sub)
         method: Auth method used ('otp', 'magic', 'google')
@@ -42,84 +59,94 @@ def find_or_create_doctor(identifier: str, method: str, profile_data: dict):
         (doctor, is_new, linked) tuple
     """
     
-    # 1. Try direct match by identifier
-    doctor = find_doctor_by_identifier(identifier, method)
-    if doctor:
-        doctor.last_login_at = datetime.utcnow()
-        db.session.commit()
-        return doctor, False, False  # existing, not new, not linked
-    
-    # 2. Try linking via email (if provided)
-    email = profile_data.get('email', '').lower() if profile_data.get('email') else None
-    if email and method != 'magic':  # Don't double-check for magic (already checked)
-        doctor = Doctor.query.filter_by(email=email).first()
-        if doctor:
-            # Link new auth method to existing doctor
-            link_auth_method(doctor, identifier, method)
-            return doctor, False, True  # existing, not new, linked
-    
-    # 3. Try linking via mobile (if provided)
-    mobile = profile_data.get('personal_mobile')
-    if mobile and method != 'otp':  # Don't double-check for OTP (already checked)
-        doctor = Doctor.query.filter_by(personal_mobile=mobile).first()
-        if doctor:
-            # Link new auth method to existing doctor
-            link_auth_method(doctor, identifier, method)
-            return doctor, False, True  # existing, not new, linked
-    
-    # 4. Create new doctor
-    doctor = create_doctor(identifier, method, profile_data)
-    return doctor, True, False  # new, not linked
+    candidates = _candidate_identities(identifier, method, profile_data)
+    
+    def resolve(session):
+        matches = {}
+        if candidates:
+            rows = session.query(DoctorIdentity.method, DoctorIdentity.identifier, Doctor) \
+                .join(Doctor, Doctor.id == DoctorIdentity.doctor_id) \
+                .filter(or_(*[and_(DoctorIdentity.method == m, DoctorIdentity.identifier == i) for m, i in candidates])) \
+                .all()
+            matches = {(m, i): doctor for m, i, doctor in rows}
+        
+        # 1. Direct match by identifier
+        if candidates and candidates[0] in matches:
+            doctor = matches[candidates[0]]
+            doctor.last_login_at = datetime.utcnow()
+            return doctor.id, False, False  # existing, not new, not linked
+        
+        # 2./3. Link via email, then mobile (candidate order)
+        for candidate in candidates[1:]:
+            if candidate in matches:
+                doctor = matches[candidate]
+                _link(doctor, identifier, method)
+                return doctor.id, False, True  # existing, not new, linked
+        
+        # 4. Create new doctor
+        doctor = _new_doctor(identifier, method, profile_data)
+        session.add(doctor)
+        return doctor.id, True, False  # new, not linked
+    
+    doctor_id, is_new, linked = group_commit.run(resolve)
+    return db.session.get(Doctor, doctor_id), is_new, linked
 
 
-def link_auth_method(doctor: Doctor, identifier: str, method: str):
-    """
-    Link a new authentication method to existing doctor.
-    """
-    
+def _set_identity(doctor: Doctor, identifier: str, method: str):
+    """Set the Doctor column for a login identity (doctor_identities follows on flush)"""
     if method == 'otp':
-        doctor.personal_mobile = identifier
+        doctor.personal_mobile = normalize_identifier('otp', identifier) or identifier
     elif method == 'magic':
-        doctor.email = identifier.lower()
+        doctor.email = identifier
     elif method == 'google':
         doctor.google_sub = identifier
-    
+
+
+def _link(doctor: Doctor, identifier: str, method: str):
+    _set_identity(doctor, identifier, method)
     doctor.last_login_at = datetime.utcnow()
-    db.session.commit()
 
 
-def create_doctor(identifier: str, method: str, profile_data: dict):
+def link_auth_method(doctor: Doctor, identifier: str, method: str):
     """
-    Create new doctor with auth method.
-    Note: personal_mobile is REQUIRED and will be collected during registration.
+    Link a new authentication method to existing doctor.
     """
     
+    group_commit.run(lambda session: _link(session.get(Doctor, doctor.id), identifier, method))
+
+
+def _new_doctor(identifier: str, method: str, profile_data: dict):
     doctor = Doctor(
         id=str(uuid.uuid4()),
         name=profile_data.get('name', ''),
         degree=profile_data.get('degree', ''),
-        specialty=profile_data.get('specialty', ''),
+        specialty=resolve_specialty(profile_data) or '',
         area=profile_data.get('area', ''),
         city=profile_data.get('city', ''),
-        personal_mobile=profile_data.get('personal_mobile'),  # REQUIRED
-        email=profile_data.get('email', '').lower() if profile_data.get('email') else None,
+        personal_mobile=normalize_identifier('otp', profile_data.get('personal_mobile')),  # REQUIRED
+        email=profile_data.get('email'),
         verified=False,  # Admin will verify
         self_registered=True,
         last_login_at=datetime.utcnow()
     )
     
     # Set primary auth identifier
-    if method == 'otp':
-        doctor.personal_mobile = identifier
-    elif method == 'magic':
-        doctor.email = identifier.lower()
-    elif method == 'google':
-        doctor.google_sub = identifier
+    _set_identity(doctor, identifier, method)
+    return doctor
+
+
+def create_doctor(identifier: str, method: str, profile_data: dict):
+    """
+    Create new doctor with auth method.
+    Note: personal_mobile is REQUIRED and will be collected during registration.
+    """
     
-    db.session.add(doctor)
-    db.session.commit()
+    def add(session):
+        doctor = _new_doctor(identifier, method, profile_data)
+        session.add(doctor)
+        return doctor.id
     
-    return doctor
+    return db.session.get(Doctor, group_commit.run(add))
 
 
 def validate_required_fields(profile_data: dict, method: str):
@@ -3,10 +3,12 @@ Google OAuth Authentication Module
 Verifies Google ID tokens and extracts user information.
 """
 
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
+import jwt
 from backend.config import Config
+from backend.auth.google_verifier import get_verifier
+from backend.services import metrics, tracing
 
+@tracing.traced("google_auth.verify_google_token", tracing.KIND_CLIENT)
 def verify_google_token(id_token_string: str):
     """
     Verify Google ID token and extract user information.
@@ -24,12 +26,14 @@ def verify_google_token(id_token_string: str):
         return None, "Google authentication not configured"
     
     try:
-        # Verify token with Google
-        idinfo = id_token.verify_oauth2_token(
-            id_token_string,
-            google_requests.Request(),
-            Config.GOOGLE_CLIENT_ID
-        )
+        # Verify locally against Google's cached signing keys
+        with metrics.external_call("google", "verify_token") as call:
+            try:
+                idinfo, cached = get_verifier(Config.GOOGLE_CLIENT_ID).verify(id_token_string)
+            except jwt.InvalidTokenError:
+                call.outcome = "rejected"
+                raise
+            call.outcome = "cached" if cached else "success"
         
         # Extract user info
         user_info = {
@@ -42,7 +46,7 @@ def verify_google_token(id_token_string: str):
         
         return user_info, None
         
-    except ValueError as e:
+    except jwt.InvalidTokenError as e:
         return None, f"Invalid Google token: {str(e)}"
     except Exception as e:
         return None, f"Google authentication error: {str(e)}"
@@ -0,0 +1,177 @@
+"""
+Google ID Token Verifier
+Verifies Google ID tokens locally against Google's cached signing keys.
+
+- The JWKS is fetched over a pooled HTTP session and cached for the
+  Cache-Control max-age Google sends (usually several hours).
+- A token signed with an unknown key id triggers one early refresh
+  (Google rotates keys), at most once per JWKS_MIN_REFRESH_SECONDS.
+- If a refresh fails, the keys already cached keep being used and the
+  refresh is retried after JWKS_MIN_REFRESH_SECONDS, so a JWKS outage
+  doesn't block Google login.
+- Verified tokens are remembered by SHA-256 digest for a short time so a
+  client retrying the same login doesn't redo signature verification.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+import jwt
+import requests
+from backend.services import circuit_breaker, metrics, tracing
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_JWKS_URL = "https://www.googleapis.com/oauth2/v3/certs"
+GOOGLE_ISSUERS = ["accounts.google.com", "https://accounts.google.com"]
+DEFAULT_MAX_AGE = 3600
+JWKS_MIN_REFRESH_SECONDS = 60
+
+
+class JWKSCache:
+    """Signing keys by kid, refreshed when Cache-Control max-age runs out"""
+
+    def __init__(self, url=GOOGLE_JWKS_URL, fetch=None):
+        self.url = url
+        self._fetch = fetch or self._http_fetch
+        self._session = None
+        self._keys = {}
+        self._expires_at = 0.0
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+
+    def _http_fetch(self):
+        """Returns (jwks dict, max_age seconds)"""
+        if self._session is None:
+            self._session = requests.Session()
+        # Only the network fetch is guarded: rejected tokens say nothing about Google's health
+        with circuit_breaker.get("google").call(), \
+                tracing.span("google.fetch_certs", tracing.KIND_CLIENT), \
+                metrics.external_call("google", "fetch_certs") as call:
+            resp = self._session.get(self.url, timeout=(3, 5))
+            resp.raise_for_status()
+            call.outcome = "success"
+        match = re.search(r"max-age=(\d+)", resp.headers.get("Cache-Control", ""))
+        return resp.json(), int(match.group(1)) if match else DEFAULT_MAX_AGE
+
+    def _refresh(self):
+        jwks, max_age = self._fetch()
+        keys = {}
+        for jwk in jwks.get("keys", []):
+            if jwk.get("kid"):
+                keys[jwk["kid"]] = jwt.PyJWK.from_json(json.dumps(jwk))
+        now = time.time()
+        self._keys = keys
+        self._expires_at = now + max_age
+        self._last_refresh = now
+
+    def get(self, kid):
+        """Key for kid, refreshing if the cache expired or the kid is new"""
+        now = time.time()
+        key = self._keys.get(kid)
+        if key is not None and now < self._expires_at:
+            return key
+        with self._lock:
+            # Another thread may have refreshed while we waited
+            key = self._keys.get(kid)
+            stale = time.time() >= self._expires_at
+            can_refresh = time.time() - self._last_refresh >= JWKS_MIN_REFRESH_SECONDS
+            if stale or (key is None and can_refresh):
+                try:
+                    self._refresh()
+                except Exception as e:
+                    if not self._keys:
+                        raise
+                    # Google rotates keys slowly: keep the ones we have and retry later
+                    logger.warning(f"Google JWKS refresh failed, using cached keys: {e}")
+                    now = time.time()
+                    self._expires_at = now + JWKS_MIN_REFRESH_SECONDS
+                    self._last_refresh = now
+                key = self._keys.get(kid)
+        return key
+
+
+class VerifiedTokenCache:
+    """Small LRU of token digest -> claims, entries live until min(ttl, token exp)"""
+
+    def __init__(self, capacity=1024, ttl=300):
+        self.capacity = capacity
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token):
+        digest = self.digest(token)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            claims, expires_at = entry
+            if time.time() >= expires_at:
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return claims
+
+    def put(self, token, claims):
+        expires_at = min(time.time() + self.ttl, claims.get("exp", 0))
+        with self._lock:
+            self._entries[self.digest(token)] = (claims, expires_at)
+            self._entries.move_to_end(self.digest(token))
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+
+class GoogleTokenVerifier:
+    def __init__(self, client_id, jwks=None, cache=None):
+        self.client_id = client_id
+        self.jwks = jwks or JWKSCache()
+        self.cache = cache or VerifiedTokenCache()
+
+    def verify(self, token):
+        """
+        Verify signature, audience, issuer and expiry.
+        Returns (claims, from_cache). Raises jwt.InvalidTokenError on bad tokens
+        and requests exceptions (or CircuitOpenError) if Google's keys can't be fetched.
+        """
+        claims = self.cache.get(token)
+        if claims is not None:
+            return claims, True
+
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = self.jwks.get(kid)
+        if key is None:
+            raise jwt.InvalidTokenError(f"Unknown signing key: {kid}")
+
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=["RS256"],
+            audience=self.client_id,
+            issuer=GOOGLE_ISSUERS,
+            options={"require": ["exp", "iat", "iss", "aud", "sub"]}
+        )
+        self.cache.put(token, claims)
+        return claims, False
+
+
+_verifier = None
+_verifier_lock = threading.Lock()
+
+
+def get_verifier(client_id):
+    """Process-wide verifier (shares the JWKS and verified-token caches)"""
+    global _verifier
+    if _verifier is None or _verifier.client_id != client_id:
+        with _verifier_lock:
+            if _verifier is None or _verifier.client_id != client_id:
+                _verifier = GoogleTokenVerifier(client_id)
+    return _verifier
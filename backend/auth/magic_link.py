@@ -5,10 +5,10 @@ Generates secure tokens for email-based passwordless login.
 
 import secrets
 import hashlib
-from datetime import datetime, timedelta
-from backend.database import db
-from backend.models.auth_session import AuthSession
+import time
+import uuid
 from backend.config import Config
+from backend.services import challenge_store
 
 def generate_magic_token(email: str, ip_address: str = None, user_agent: str = None):
     """
@@ -22,20 +22,20 @@ def generate_magic_token(email: str, ip_address: str = None, user_agent: str = N
     # Hash for storage
     token_hash = hashlib.sha256(plain_token.encode()).hexdigest()
     
-    # Create session
-    expires_at = datetime.utcnow() + timedelta(minutes=Config.MAGIC_LINK_EXPIRY_MINUTES)
-    
-    session = AuthSession(
-        identifier=email.lower(),
-        method='magic',
-        token_hash=token_hash,
-        expires_at=expires_at,
-        ip_address=ip_address,
-        user_agent=user_agent
-    )
-    
-    db.session.add(session)
-    db.session.commit()
+    # Create session (challenge store; auth_sessions row is written as audit)
+    now = time.time()
+    session = {
+        "id": str(uuid.uuid4()),
+        "identifier": email.lower(),
+        "hash": token_hash,
+        "expires_at": now + Config.MAGIC_LINK_EXPIRY_MINUTES * 60,
+        "created_at": now,
+        "attempts": 0,
+        "used": False,
+        "ip_address": ip_address,
+        "user_agent": user_agent,
+    }
+    challenge_store.get_store().create("magic", token_hash, session)
     
     return session, plain_token
 
@@ -50,22 +50,19 @@ def verify_magic_token(token: str):
     token_hash = hashlib.sha256(token.encode()).hexdigest()
     
     # Find session
-    session = AuthSession.query.filter_by(
-        token_hash=token_hash,
-        method='magic',
-        used=False
-    ).first()
+    store = challenge_store.get_store()
+    session = store.get("magic", token_hash)
     
-    if not session:
+    if not session or session["used"]:
         return None, "Invalid or expired magic link"
     
     # Check expiry
-    if datetime.utcnow() > session.expires_at:
+    if challenge_store.is_expired(session):
         return None, "Magic link has expired"
     
-    # Mark as used
-    session.used = True
-    db.session.commit()
+    # Mark as used (compare-and-set: a link can only be redeemed once)
+    if not store.claim("magic", token_hash):
+        return None, "Invalid or expired magic link"
     
     return session, None
 
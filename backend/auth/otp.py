@@ -1,10 +1,12 @@
 import hashlib
 import secrets
+import time
+import uuid
 import jwt
 from datetime import datetime, timedelta
 from backend.config import Config
-from backend.models.session import OTPSession
-from backend.database import db
+from backend.services import challenge_store, rate_limit, revocation
+from backend.normalization.phone import normalize_phone
 
 def generate_otp():
     """Generate a 6-digit OTP"""
@@ -20,82 +22,111 @@ def verify_otp_hash(otp, otp_hash):
 
 def create_otp_session(mobile_number, ip_address=None, user_agent=None):
     """
-    Create a new OTP session for a mobile number.
-    Returns (session, plain_otp) or (None, error_message)
+    Create a new OTP session for a mobile number (normalized to E.164, so
+    rate limits apply however the number is written).
+    Returns (session, plain_otp), or (None, retry_after_seconds) when rate limited
     """
-    # Rate limiting: check recent sessions
-    recent_cutoff = datetime.utcnow() - timedelta(hours=1)
-    recent_count = OTPSession.query.filter(
-        OTPSession.mobile_number == mobile_number,
-        OTPSession.created_at >= recent_cutoff
-    ).count()
+    mobile_number = normalize_phone(mobile_number) or mobile_number
     
-    if recent_count >= Config.OTP_RATE_LIMIT_PER_HOUR:
-        return None, f"Too many OTP requests. Try again in {60 - (datetime.utcnow().minute % 60)} minutes."
+    # Rate limiting: per phone and per requesting IP
+    retry_after = rate_limit.check(("otp:phone", mobile_number), ("otp:ip", ip_address))
+    if retry_after:
+        return None, retry_after
     
     # Generate OTP
     otp = generate_otp()
-    otp_hash = hash_otp(otp)
+    now = time.time()
     
-    # Create session
-    session = OTPSession.create_session(
-        mobile_number=mobile_number,
-        otp_hash=otp_hash,
-        ip_address=ip_address,
-        user_agent=user_agent,
-        expiry_minutes=Config.OTP_EXPIRY_MINUTES
-    )
+    # Create session (challenge store; otp_sessions row is written as audit)
+    session = {
+        "id": str(uuid.uuid4()),
+        "identifier": mobile_number,
+        "hash": hash_otp(otp),
+        "expires_at": now + Config.OTP_EXPIRY_MINUTES * 60,
+        "created_at": now,
+        "attempts": 0,
+        "used": False,
+        "ip_address": ip_address,
+        "user_agent": user_agent,
+        "delivery_status": "queued",
+        "delivery_channel": None,
+        "delivery_attempts": [],
+    }
+    challenge_store.get_store().create("otp", session["id"], session)
     
     return session, otp
 
-def verify_otp_session(session_id, otp):
+def verify_otp_session(session_id, otp, mobile_number=None):
     """
-    Verify OTP for a given session.
+    Verify OTP for a given session (and, if given, that it was sent to mobile_number).
     Returns (success: bool, message: str)
     """
-    session = OTPSession.query.filter_by(id=session_id).first()
+    store = challenge_store.get_store()
+    session = store.get("otp", session_id)
     
     if not session:
         return False, "Invalid session"
     
-    if session.verified:
+    if mobile_number and normalize_phone(session["identifier"]) != normalize_phone(mobile_number):
+        return False, "Invalid session"
+    
+    if session["used"]:
         return False, "OTP already used"
     
-    if session.is_expired():
+    if challenge_store.is_expired(session):
         return False, "OTP expired"
     
-    if session.is_locked():
+    # Count the attempt before comparing, atomically, so parallel guesses can't exceed the limit
+    attempts = store.incr_attempts("otp", session_id)
+    if attempts is None:
+        return False, "Invalid session"
+    if attempts > Config.OTP_MAX_ATTEMPTS:
         return False, "Too many attempts. Request a new OTP."
     
-    if not verify_otp_hash(otp, session.otp_hash):
-        session.increment_attempt()
-        return False, f"Invalid OTP. {3 - session.attempts} attempts remaining."
+    if not verify_otp_hash(otp, session["hash"]):
+        return False, f"Invalid OTP. {Config.OTP_MAX_ATTEMPTS - attempts} attempts remaining."
     
-    # Mark as verified
-    session.verified = True
-    db.session.commit()
+    # Mark as verified (compare-and-set: only one request can win)
+    if not store.claim("otp", session_id):
+        return False, "OTP already used"
     
     return True, "OTP verified successfully"
 
-def generate_jwt(doctor_id):
-    """Generate JWT token for authenticated doctor"""
+def generate_jwt(doctor_id, expires_hours=None):
+    """Generate JWT token for authenticated doctor (jti lets it be revoked)"""
+    now = datetime.utcnow()
     payload = {
         'doctor_id': doctor_id,
-        'exp': datetime.utcnow() + timedelta(hours=Config.JWT_EXPIRY_HOURS),
-        'iat': datetime.utcnow()
+        'jti': uuid.uuid4().hex,
+        'exp': now + timedelta(hours=expires_hours or Config.JWT_EXPIRY_HOURS),
+        'iat': now
     }
     token = jwt.encode(payload, Config.JWT_SECRET_KEY, algorithm='HS256')
     return token
 
-def verify_jwt(token):
+def decode_jwt(token):
     """
-    Verify JWT token and return doctor_id.
-    Returns (doctor_id, None) on success or (None, error_message) on failure
+    Verify JWT token and return its claims.
+    Returns (payload, None) on success or (None, error_message) on failure
     """
     try:
         payload = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=['HS256'])
-        return payload['doctor_id'], None
     except jwt.ExpiredSignatureError:
         return None, "Token expired"
     except jwt.InvalidTokenError:
         return None, "Invalid token"
+    
+    # Tokens issued before jti was added can't be revoked; they age out within JWT_EXPIRY_HOURS
+    if payload.get('jti') and revocation.is_revoked(payload['jti']):
+        return None, "Token revoked"
+    return payload, None
+
+def verify_jwt(token):
+    """
+    Verify JWT token and return doctor_id.
+    Returns (doctor_id, None) on success or (None, error_message) on failure
+    """
+    payload, error = decode_jwt(token)
+    if error:
+        return None, error
+    return payload['doctor_id'], None
@@ -19,9 +19,45 @@ class Config:
     OTP_MAX_ATTEMPTS = 3
     OTP_RATE_LIMIT_PER_HOUR = 3  # Max OTP requests per phone per hour
     
+    # Background OTP delivery
+    OTP_DISPATCH_WORKERS = int(os.getenv('OTP_DISPATCH_WORKERS', '4'))
+    OTP_DISPATCH_QUEUE_SIZE = 1000
+    OTP_DISPATCH_RETRIES = 2  # Extra attempts per channel before falling back
+    OTP_DISPATCH_BACKOFF_SECONDS = 1.0  # Doubles after each failed attempt
+    
+    # Rate limiting: 'sqlite' (a file shared by this host's workers), 'memory' (single worker only)
+    # or redis://host:port/db (shared by workers on any host)
+    RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'sqlite')
+    RATE_LIMIT_SQLITE_PATH = os.getenv('RATE_LIMIT_SQLITE_PATH', os.path.join(BASE_DIR, 'ratelimit.db'))  # Also holds idempotency keys
+    RATE_LIMIT_TIMEOUT_SECONDS = 0.5
+    RATE_LIMITS = {  # rule -> (max hits, window seconds)
+        'otp:phone': (OTP_RATE_LIMIT_PER_HOUR, 3600),
+        'otp:ip': (20, 3600),
+        'magic:email': (3, 3600),
+        'magic:ip': (20, 3600),
+        'google:ip': (30, 600),
+        'contact:ip': (30, 60),
+    }
+    
+    # OTP / magic-link challenge state: 'sqlite' (session tables), 'memory' (single worker only)
+    # or redis://host:port/db (shared). With memory/redis the session tables become an async audit log.
+    CHALLENGE_STORE = os.getenv('CHALLENGE_STORE', 'sqlite')
+    CHALLENGE_AUDIT_BATCH_SIZE = 100  # Audit rows written per transaction
+    
+    # Idempotency-Key replay for request-otp / register / request-magic-link
+    IDEMPOTENCY_STORE = os.getenv('IDEMPOTENCY_STORE', RATE_LIMIT_BACKEND)  # 'sqlite', 'memory' or redis://host:port/db
+    IDEMPOTENCY_TTL_SECONDS = 3600  # How long a stored response is replayed
+    IDEMPOTENCY_IN_FLIGHT_SECONDS = 30  # Reservation held while the first request runs
+    
     # mTalkz SMS/WhatsApp Gateway
     MTALKZ_API_KEY = os.getenv('MTALKZ_API_KEY', '')  # Set this in environment!
     MTALKZ_SENDER_ID = os.getenv('MTALKZ_SENDER_ID', 'SAMDDR')
+    MTALKZ_BASE_URL = os.getenv('MTALKZ_BASE_URL', 'https://api.mtalkz.com')  # Point at tools/mock_mtalkz.py for tests
+    MTALKZ_POOL_SIZE = 10  # Keep-alive connections to the gateway
+    MTALKZ_CONNECT_TIMEOUT = 3
+    MTALKZ_READ_TIMEOUT = 8
+    MTALKZ_HEDGED = os.getenv('MTALKZ_HEDGED', 'False') == 'True'  # Fire SMS if WhatsApp is slow
+    MTALKZ_HEDGE_MS = int(os.getenv('MTALKZ_HEDGE_MS', '1500'))  # WhatsApp latency budget before hedging
     
     # Email Service (for Magic Links)
     EMAIL_SERVICE_ENABLED = os.getenv('EMAIL_SERVICE_ENABLED', 'False') == 'True'
@@ -29,6 +65,14 @@ class Config:
     SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
     SMTP_USER = os.getenv('SMTP_USER', '')
     SMTP_PASSWORD = os.getenv('SMTP_PASSWORD', '')
+    MAIL_FROM = os.getenv('MAIL_FROM', SMTP_USER)  # Sender address, defaults to the SMTP login
+    SMTP_USE_TLS = os.getenv('SMTP_USE_TLS', 'True') == 'True'  # STARTTLS after connect
+    SMTP_POOL_SIZE = int(os.getenv('SMTP_POOL_SIZE', '2'))  # Reusable authenticated connections
+    SMTP_TIMEOUT_SECONDS = 10
+    SMTP_HEALTHCHECK_SECONDS = 30  # NOOP-probe connections idle longer than this before reuse
+    SMTP_IDLE_SECONDS = 240  # Close connections idle longer than this
+    MAIL_BATCH_SIZE = 20  # Queued messages sent per connection checkout
+    MAIL_QUEUE_SIZE = 1000
     
     # Magic Link Configuration
     MAGIC_LINK_EXPIRY_MINUTES = 15
@@ -53,3 +97,89 @@ class Config:
     
     # CORS
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', '*')  # Restrict in production
+    
+    # Metrics (/metrics, Prometheus text format)
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')  # If set, scrapers must send it as a Bearer token
+    METRICS_MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR', '')  # Shared dir for gunicorn workers
+    METRICS_FLUSH_SECONDS = int(os.getenv('METRICS_FLUSH_SECONDS', '5'))
+    
+    # Sampling profiler (admin: /api/admin/profile)
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))  # Fraction of requests sampled outside capture windows
+    PROFILE_INTERVAL_MS = int(os.getenv('PROFILE_INTERVAL_MS', '5'))
+    PROFILE_MAX_STACKS = 5000  # Distinct stacks kept per route
+    
+    # Tracing (OTLP/JSON spans)
+    TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'False') == 'True'
+    TRACING_SAMPLE_RATE = float(os.getenv('TRACING_SAMPLE_RATE', '1.0'))  # Fraction of new traces recorded
+    TRACING_SERVICE_NAME = os.getenv('TRACING_SERVICE_NAME', 'samd-directory')
+    TRACING_EXPORT_PATH = os.getenv('TRACING_EXPORT_PATH', os.path.join(BASE_DIR, 'traces.jsonl'))
+    TRACING_OTLP_ENDPOINT = os.getenv('TRACING_OTLP_ENDPOINT', '')  # e.g. http://localhost:4318/v1/traces
+    TRACING_EXPORT_INTERVAL_SECONDS = 2
+    
+    # Background jobs
+    SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'True') == 'True'
+    SCHEDULER_LOCK_DIR = os.getenv('SCHEDULER_LOCK_DIR', BASE_DIR)  # Lock files so one worker runs each job
+    
+    # Purge of expired auth_sessions / otp_sessions / otps rows
+    PURGE_INTERVAL_MINUTES = int(os.getenv('PURGE_INTERVAL_MINUTES', '15'))
+    PURGE_BATCH_SIZE = 500  # Rows per delete transaction
+    PURGE_BATCH_PAUSE_MS = 50  # Gap between batches so requests can take the write lock
+    PURGE_RETENTION_MINUTES = 60  # Keep used/expired rows this long for abuse review
+    PURGE_ANALYZE_EVERY = 24  # Run ANALYZE every N purges
+    PURGE_VACUUM_PAGES = 500  # Max pages freed per incremental vacuum
+    
+    # Data migrations (backend/migrations/runner.py)
+    MIGRATION_BATCH_SIZE = int(os.getenv('MIGRATION_BATCH_SIZE', '1000'))  # Rows per transaction; progress is checkpointed per batch
+    
+    # Group commit: request writes go through one writer thread per worker (backend/services/group_commit.py)
+    GROUP_COMMIT_ENABLED = os.getenv('GROUP_COMMIT_ENABLED', 'True') == 'True'  # False = every request commits itself
+    GROUP_COMMIT_WINDOW_MS = float(os.getenv('GROUP_COMMIT_WINDOW_MS', '2'))  # Collect writes this long per transaction
+    GROUP_COMMIT_MAX_BATCH = 100  # Writes per transaction
+    GROUP_COMMIT_TIMEOUT_SECONDS = 10  # A request gives up on a write still queued after this
+    GROUP_COMMIT_LOCK_RETRIES = 3  # Retries when another process holds the SQLite write lock
+    
+    # Doctor change events (backend/services/doctor_events.py)
+    DOCTOR_EVENTS_QUEUE_SIZE = 10000  # Per queued subscriber; on overflow it rebuilds from the table
+    
+    # Cross-worker cache coherence (backend/services/coherence.py)
+    COHERENCE_POLL_SECONDS = float(os.getenv('COHERENCE_POLL_SECONDS', '1'))  # Longest another worker's cache stays stale
+    COHERENCE_MAX_CHANGES = 5000  # More changes than this in one poll clears the caches instead
+    DOCTOR_CACHE_SIZE = int(os.getenv('DOCTOR_CACHE_SIZE', '5000'))  # Public profiles cached per worker
+    
+    # Shared search snapshot, mmap()ed by every worker (backend/services/search_snapshot.py)
+    SEARCH_SNAPSHOT_ENABLED = os.getenv('SEARCH_SNAPSHOT_ENABLED', 'True') == 'True'
+    SEARCH_SNAPSHOT_PATH = os.getenv('SEARCH_SNAPSHOT_PATH', os.path.join(BASE_DIR, 'search.snapshot'))
+    SEARCH_SNAPSHOT_BUILD_SECONDS = int(os.getenv('SEARCH_SNAPSHOT_BUILD_SECONDS', '60'))  # Rebuilt this often, if doctors changed
+    SEARCH_SNAPSHOT_REFRESH_SECONDS = 5  # How often workers look for a newer file
+    SEARCH_SNAPSHOT_MAX_CHANGED = 500  # More doctors changed since the build than this and search reads the database
+    
+    # Live-location write-behind (backend/services/location_buffer.py)
+    LOCATION_FLUSH_SECONDS = int(os.getenv('LOCATION_FLUSH_SECONDS', '5'))  # How often buffered moves are written
+    LOCATION_MIN_MOVE_METERS = float(os.getenv('LOCATION_MIN_MOVE_METERS', '25'))  # Smaller moves are GPS jitter
+    LOCATION_FLUSH_BATCH = 500  # Rows per flush transaction
+    
+    # Duplicate doctor detection (admin: /api/admin/duplicates)
+    DEDUP_SCAN_INTERVAL_HOURS = int(os.getenv('DEDUP_SCAN_INTERVAL_HOURS', '24'))  # Full rescan; sign-ups are checked as they happen
+    DEDUP_MIN_SCORE = float(os.getenv('DEDUP_MIN_SCORE', '0.5'))  # Pairs scoring at least this are listed
+    DEDUP_MAX_BLOCK_SIZE = 50  # Skip blocks bigger than this (placeholder coordinates, very common names)
+    DEDUP_GEO_CELL_DEGREES = 0.005  # Geo blocking cell, ~500 m
+    
+    # Circuit breakers for mTalkz / SMTP / Google / Cloudinary (admin: /api/admin/breakers)
+    CIRCUIT_WINDOW_SECONDS = int(os.getenv('CIRCUIT_WINDOW_SECONDS', '60'))  # Rolling window for error/slow rates
+    CIRCUIT_MIN_CALLS = int(os.getenv('CIRCUIT_MIN_CALLS', '10'))  # Don't judge a provider on fewer calls
+    CIRCUIT_FAILURE_RATE = float(os.getenv('CIRCUIT_FAILURE_RATE', '0.5'))  # Open at this error rate
+    CIRCUIT_SLOW_CALL_RATE = float(os.getenv('CIRCUIT_SLOW_CALL_RATE', '0.8'))  # ...or this share of slow calls
+    CIRCUIT_OPEN_SECONDS = int(os.getenv('CIRCUIT_OPEN_SECONDS', '30'))  # Fail fast this long before probing
+    CIRCUIT_HALF_OPEN_CALLS = 3  # Trial calls that must succeed to close again
+    CIRCUIT_SLOW_CALL_SECONDS = {  # breaker -> seconds after which a call counts as slow
+        'mtalkz.whatsapp': 3.0,
+        'mtalkz.sms': 3.0,
+        'smtp': 5.0,
+        'google': 2.0,
+        'cloudinary': 8.0,
+    }
+    
+    # JWT revocation (logout); denylist is held in memory by every worker
+    REVOCATION_SYNC_SECONDS = int(os.getenv('REVOCATION_SYNC_SECONDS', '3'))  # How fast revocations reach other workers
+    REVOCATION_BLOOM_BITS = 1 << 20  # 128 KB filter, ~1% false positives at 100k live revocations
+    REVOCATION_BLOOM_HASHES = 7
@@ -1,57 +1,75 @@
 """
 Data Migration Script for SAMD Directory
 Backfills existing doctor records with new privacy and tracking fields.
-Run this once after deploying the new schema.
+Run this once after deploying the new schema:
+
+    python backend/migrate_data.py [--batch-size 1000] [--restart]
 """
 
 import sys
 sys.path.insert(0, '.')
 
+from sqlalchemy import and_, or_
 from backend.app import create_app
-from backend.database import db
 from backend.models.doctor import Doctor
+from backend.migrations.runner import run_batched, parse_args
 from datetime import datetime
 
-def migrate_existing_doctors():
+# Rows that still need each backfill below
+NEEDS_MOBILE = and_(Doctor.personal_mobile.is_(None), Doctor.phone.isnot(None), Doctor.phone != '')
+NEEDS_SELF_REGISTERED = Doctor.self_registered.is_(None)
+NEEDS_LOCATION = and_(Doctor.last_location_update.is_(None), or_(Doctor.latitude != 0, Doctor.longitude != 0))
+NEEDS_MIGRATION = or_(NEEDS_MOBILE, NEEDS_SELF_REGISTERED, NEEDS_LOCATION)
+
+def migrate_existing_doctors(batch_size=None, restart=False):
     """Backfill existing doctors with new fields"""
     app = create_app()
     
     with app.app_context():
-        doctors = Doctor.query.all()
-        count = len(doctors)
-        
+        count = Doctor.query.filter(NEEDS_MIGRATION).count()
         print(f"Found {count} doctors to migrate...")
         
-        updated = 0
-        for doctor in doctors:
+        def migrate_doctor(doctor):
+            changes = []
             # Backfill personal_mobile from phone if not set
             if not doctor.personal_mobile and doctor.phone:
                 doctor.personal_mobile = doctor.phone
-                updated += 1
+                changes.append("mobile")
             
             # Set self_registered flag
             if doctor.self_registered is None:
                 doctor.self_registered = False  # Assume existing doctors were admin-added
+                changes.append("self_registered")
             
             # Set last_location_update
             if not doctor.last_location_update and (doctor.latitude or doctor.longitude):
                 doctor.last_location_update = datetime.utcnow()
+                changes.append("location")
+            return changes
         
-        db.session.commit()
+        # Batched and checkpointed: an interrupted run resumes where it stopped.
+        # Rows whose phone is already another doctor's personal_mobile are reported and skipped.
+        result = run_batched("migrate_existing_doctors", Doctor, migrate_doctor,
+                             where=NEEDS_MIGRATION, batch_size=batch_size, restart=restart)
         
-        print(f"✅ Migrated {count} doctors")
-        print(f"   - {updated} had personal_mobile backfilled from phone")
-        print(f"   - All marked as admin-added (self_registered=False)")
-        print(f"   - Location timestamps set for {sum(1 for d in doctors if d.latitude)}")
+        changes = result['changes']
+        print(f"✅ Migrated {result['rows_changed']} doctors")
+        print(f"   - {changes.get('mobile', 0)} had personal_mobile backfilled from phone")
+        print(f"   - {changes.get('self_registered', 0)} marked as admin-added (self_registered=False)")
+        print(f"   - Location timestamps set for {changes.get('location', 0)}")
+        if result['rows_failed']:
+            print(f"   ⚠️ {result['rows_failed']} skipped (mobile number already used by another doctor)")
         
         # Summary
+        total = Doctor.query.count()
         verified_count = Doctor.query.filter_by(verified=True).count()
         unverified_count = Doctor.query.filter_by(verified=False).count()
         
         print(f"\n📊 Current Status:")
-        print(f"   Total: {count}")
+        print(f"   Total: {total}")
         print(f"   Verified: {verified_count}")
         print(f"   Pending: {unverified_count}")
 
 if __name__ == "__main__":
-    migrate_existing_doctors()
+    args = parse_args(__doc__)
+    migrate_existing_doctors(batch_size=args.batch_size, restart=args.restart)
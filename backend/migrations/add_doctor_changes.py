@@ -0,0 +1,29 @@
+"""
+Database migration to add the doctor_changes table, the log workers poll
+to keep their in-memory doctor caches in step (see services/coherence.py).
+Must run before the new code serves writes: every doctor write appends to it.
+"""
+
+import sys
+sys.path.insert(0, '.')
+
+from backend.app import app
+from backend.database import db
+from backend.models.doctor_change import DoctorChange
+
+def migrate():
+    """Create doctor_changes if it doesn't exist"""
+    
+    with app.app_context():
+        print("Running database migration...")
+        
+        try:
+            DoctorChange.__table__.create(db.engine, checkfirst=True)
+            print("✅ doctor_changes table ready")
+        except Exception as e:
+            print(f"⚠️  Could not create doctor_changes: {e}")
+        
+        print("\n✅ Migration complete!")
+
+if __name__ == "__main__":
+    migrate()
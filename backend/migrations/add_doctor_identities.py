@@ -0,0 +1,68 @@
+"""
+Database migration to add the doctor_identities table.
+Also adds email, google_sub and last_login_at to doctors (add_unified_auth.py
+tried to add the first two with UNIQUE, which SQLite's ADD COLUMN rejects)
+and backfills identities from existing doctor rows. Safe to re-run.
+
+Run add_phone_e164.py first: phone identities are taken from phone_e164.
+"""
+
+import sys
+sys.path.insert(0, '.')
+
+from sqlalchemy import text
+from backend.app import app
+from backend.database import db
+from backend.models.doctor_identity import DoctorIdentity, IDENTITY_COLUMNS
+
+COLUMNS = [
+    ("email", "TEXT"),
+    ("google_sub", "TEXT"),
+    ("last_login_at", "DATETIME"),
+]
+
+UNIQUE_INDEXES = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_doctors_email ON doctors (email)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_doctors_google_sub ON doctors (google_sub)",
+]
+
+def migrate():
+    """Add identity columns, create doctor_identities and backfill it"""
+
+    with app.app_context():
+        print("Running database migration...")
+
+        for name, column_type in COLUMNS:
+            try:
+                db.session.execute(text(f'ALTER TABLE doctors ADD COLUMN {name} {column_type}'))
+                db.session.commit()
+                print(f"✅ Added {name} column")
+            except Exception as e:
+                db.session.rollback()
+                print(f"⚠️  {name} column might already exist: {e}")
+
+        for statement in UNIQUE_INDEXES:
+            try:
+                db.session.execute(text(statement))
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"⚠️  Could not add unique index (duplicate values?): {e}")
+
+        DoctorIdentity.__table__.create(db.engine, checkfirst=True)
+        print("✅ doctor_identities table ready")
+
+        # One INSERT ... SELECT per method; existing rows are left alone
+        for method, column in IDENTITY_COLUMNS.items():
+            result = db.session.execute(text(
+                f"INSERT OR IGNORE INTO doctor_identities (doctor_id, method, identifier, created_at) "
+                f"SELECT id, :method, {'lower(trim(email))' if column == 'email' else column}, CURRENT_TIMESTAMP "
+                f"FROM doctors WHERE {column} IS NOT NULL AND {column} != ''"
+            ), {"method": method})
+            db.session.commit()
+            print(f"✅ Backfilled {result.rowcount} '{method}' identities from doctors.{column}")
+
+        print("\n✅ Migration complete!")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,35 @@
+"""
+Database migration to add the dedup_keys and duplicate_candidates tables
+and run a first duplicate scan over the existing doctors. Safe to re-run
+(the scan keeps pairs already dismissed by an admin).
+"""
+
+import sys
+sys.path.insert(0, '.')
+
+from backend.app import app
+from backend.database import db
+from backend.models.dedup_key import DedupKey
+from backend.models.duplicate_candidate import DuplicateCandidate
+from backend.services import dedup
+
+def migrate():
+    """Create the dedup tables and populate them"""
+
+    with app.app_context():
+        print("Running database migration...")
+
+        DedupKey.__table__.create(db.engine, checkfirst=True)
+        DuplicateCandidate.__table__.create(db.engine, checkfirst=True)
+        print("✅ dedup_keys and duplicate_candidates tables ready")
+
+        stats = dedup.scan_all()
+        print(f"✅ Scanned {stats['doctors']} doctors: {stats['pairs_compared']} pairs compared "
+              f"(instead of {stats['all_pairs']}), {stats['candidates']} likely duplicates")
+        if stats['oversized_blocks']:
+            print(f"⚠️  {stats['oversized_blocks']} blocks were too large to compare and were skipped")
+
+        print("\n✅ Migration complete!")
+
+if __name__ == "__main__":
+    migrate()
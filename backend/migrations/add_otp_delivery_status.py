@@ -0,0 +1,37 @@
+"""
+Database migration to add OTP delivery tracking columns to otp_sessions.
+Needed by the background OTP dispatcher and /api/auth/otp-status.
+"""
+
+import sys
+sys.path.insert(0, '.')
+
+from sqlalchemy import text
+from backend.app import app
+from backend.database import db
+
+COLUMNS = [
+    ("delivery_status", "TEXT DEFAULT 'queued'"),
+    ("delivery_channel", "TEXT"),
+    ("delivery_attempts", "TEXT"),
+]
+
+def migrate():
+    """Add delivery_status, delivery_channel and delivery_attempts"""
+    
+    with app.app_context():
+        print("Running database migration...")
+        
+        for name, column_type in COLUMNS:
+            try:
+                db.session.execute(text(f'ALTER TABLE otp_sessions ADD COLUMN {name} {column_type}'))
+                db.session.commit()
+                print(f"✅ Added {name} column")
+            except Exception as e:
+                db.session.rollback()
+                print(f"⚠️  {name} column might already exist: {e}")
+        
+        print("\n✅ Migration complete!")
+
+if __name__ == "__main__":
+    migrate()
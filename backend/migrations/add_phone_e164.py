@@ -0,0 +1,77 @@
+"""
+Database migration to add doctors.phone_e164 (canonical personal_mobile).
+Backfills it in bulk from personal_mobile and adds the unique index that
+OTP login and registration lookups use. Safe to re-run.
+
+Numbers that normalize to the same E.164 value belong to duplicate accounts:
+only the first keeps phone_e164, the rest are listed for manual merging.
+"""
+
+import sys
+sys.path.insert(0, '.')
+
+from sqlalchemy import text
+from backend.app import app
+from backend.database import db
+from backend.normalization.phone import normalize_phone
+
+BATCH_SIZE = 1000
+
+def migrate():
+    """Add phone_e164, backfill it and index it"""
+
+    with app.app_context():
+        print("Running database migration...")
+
+        try:
+            db.session.execute(text('ALTER TABLE doctors ADD COLUMN phone_e164 TEXT'))
+            db.session.commit()
+            print("✅ Added phone_e164 column")
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠️  phone_e164 column might already exist: {e}")
+
+        rows = db.session.execute(text(
+            "SELECT id, personal_mobile FROM doctors WHERE personal_mobile IS NOT NULL "
+            "ORDER BY self_registered DESC, verified DESC, id"  # Real accounts win duplicates
+        )).fetchall()
+
+        owners = {}
+        updates, invalid, duplicates = [], [], []
+        for doctor_id, mobile in rows:
+            phone = normalize_phone(mobile)
+            if not phone:
+                invalid.append((doctor_id, mobile))
+            elif phone in owners:
+                duplicates.append((doctor_id, mobile, owners[phone]))
+            else:
+                owners[phone] = doctor_id
+                updates.append({"id": doctor_id, "phone": phone})
+
+        # Clear first so re-runs can't trip the unique index mid-way
+        db.session.execute(text("UPDATE doctors SET phone_e164 = NULL"))
+        statement = text("UPDATE doctors SET phone_e164 = :phone WHERE id = :id")
+        for start in range(0, len(updates), BATCH_SIZE):
+            db.session.execute(statement, updates[start:start + BATCH_SIZE])
+        db.session.commit()
+        print(f"✅ Backfilled phone_e164 for {len(updates)} doctors")
+
+        db.session.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_doctors_phone_e164 ON doctors (phone_e164)"
+        ))
+        db.session.commit()
+        print("✅ Unique index ix_doctors_phone_e164 ready")
+
+        if invalid:
+            print(f"\n⚠️  {len(invalid)} personal_mobile values are not phone numbers:")
+            for doctor_id, mobile in invalid[:20]:
+                print(f"   - {doctor_id}: {mobile!r}")
+        if duplicates:
+            print(f"\n⚠️  {len(duplicates)} doctors share a number with another doctor (left NULL):")
+            for doctor_id, mobile, owner in duplicates[:20]:
+                print(f"   - {doctor_id}: {mobile!r} (same as {owner})")
+
+        print("\n✅ Migration complete!")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,27 @@
+"""
+Database migration to add the revoked_tokens table (JWT logout/denylist).
+"""
+
+import sys
+sys.path.insert(0, '.')
+
+from backend.app import app
+from backend.database import db
+from backend.models.revoked_token import RevokedToken
+
+def migrate():
+    """Create revoked_tokens if it doesn't exist"""
+    
+    with app.app_context():
+        print("Running database migration...")
+        
+        try:
+            RevokedToken.__table__.create(db.engine, checkfirst=True)
+            print("✅ revoked_tokens table ready")
+        except Exception as e:
+            print(f"⚠️  Could not create revoked_tokens: {e}")
+        
+        print("\n✅ Migration complete!")
+
+if __name__ == "__main__":
+    migrate()
@@ -1,48 +1,62 @@
 """
 Database migration to add email and google_sub fields to doctors table.
-Also renames otp_sessions to auth_sessions for unified auth.
+Also sets up auth_sessions for unified auth.
+
+Runs on the migration runner: each schema step is recorded once it succeeds
+and the email backfill is batched and checkpointed, so an interrupted run
+can simply be started again.
+
+    python backend/migrations/add_unified_auth.py [--batch-size 1000] [--restart]
+
+SQLite can't ADD COLUMN ... UNIQUE, so uniqueness comes from separate
+indexes. otp_sessions is no longer renamed: OTP challenges still live there
+(OTPSession), and auth_sessions is created alongside it.
 """
 
 import sys
 sys.path.insert(0, '.')
 
+from sqlalchemy import func
 from backend.app import app
 from backend.database import db
+from backend.models.auth_session import AuthSession
+from backend.models.doctor import Doctor
+from backend.migrations.runner import run_steps, run_batched, parse_args
+
+STEPS = [
+    ("add doctors.email", "ALTER TABLE doctors ADD COLUMN email TEXT"),
+    ("add doctors.google_sub", "ALTER TABLE doctors ADD COLUMN google_sub TEXT"),
+    ("create auth_sessions", lambda: AuthSession.__table__.create(db.engine, checkfirst=True)),
+]
+
+INDEX_STEPS = [
+    ("unique index on doctors.email", "CREATE UNIQUE INDEX IF NOT EXISTS ix_doctors_email ON doctors (email)"),
+    ("unique index on doctors.google_sub", "CREATE UNIQUE INDEX IF NOT EXISTS ix_doctors_google_sub ON doctors (google_sub)"),
+]
+
+def _lowercase_email(doctor):
+    """Magic-link lookups compare lowercased emails"""
+    normalized = doctor.email.strip().lower()
+    if normalized == doctor.email:
+        return False
+    doctor.email = normalized
+    return True
 
-def migrate():
+def migrate(batch_size=None, restart=False):
     """Add email and Google OAuth support to doctors table"""
-    
+
     with app.app_context():
         print("Running database migration...")
-        
-        # Add email and google_sub columns
-        try:
-            db.session.execute('ALTER TABLE doctors ADD COLUMN email TEXT UNIQUE')
-            print("✅ Added email column")
-        except Exception as e:
-            print(f"⚠️  Email column might already exist: {e}")
-        
-        try:
-            db.session.execute('ALTER TABLE doctors ADD COLUMN google_sub TEXT UNIQUE')
-            print("✅ Added google_sub column")
-        except Exception as e:
-            print(f"⚠️  google_sub column might already exist: {e}")
-        
-        # Rename otp_sessions to auth_sessions for unified auth
-        try:
-            db.session.execute('ALTER TABLE otp_sessions RENAME TO auth_sessions')
-            print("✅ Renamed otp_sessions to auth_sessions")
-        except Exception as e:
-            print(f"⚠️  Table rename might have already happened: {e}")
-        
-        # Add method column to track auth type
-        try:
-            db.session.execute('ALTER TABLE auth_sessions ADD COLUMN method TEXT DEFAULT "otp"')
-            print("✅ Added method column to auth_sessions")
-        except Exception as e:
-            print(f"⚠️  Method column might already exist: {e}")
-        
-        db.session.commit()
+
+        run_steps("add_unified_auth", STEPS, restart=restart)
+
+        # Emails saved before the model lowercased them; must happen before the unique index
+        run_batched("add_unified_auth: lowercase emails", Doctor, _lowercase_email,
+                    where=Doctor.email != func.lower(func.trim(Doctor.email)),
+                    batch_size=batch_size, restart=restart)
+
+        run_steps("add_unified_auth", INDEX_STEPS)
+
         print("\n✅ Migration complete!")
         print("\nDoctor table now supports:")
         print("  - personal_mobile (for OTP)")
@@ -51,4 +65,5 @@ def migrate():
         print("\nNote: personal_mobile is REQUIRED for all doctors")
 
 if __name__ == "__main__":
-    migrate()
+    args = parse_args(__doc__)
+    migrate(batch_size=args.batch_size, restart=args.restart)
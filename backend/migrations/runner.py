@@ -0,0 +1,241 @@
+"""
+Migration Runner - Batched, resumable data migrations.
+
+run_batched() walks a table in primary-key order, batch_size rows at a
+time (keyset pagination, each page streamed with yield_per), applies a
+per-row function and commits the batch together with a checkpoint row in
+migration_checkpoints. An interrupted run picks up after the last committed
+key; a finished one is skipped unless restarted. A batch that hits an
+IntegrityError is retried row by row under savepoints so one bad row
+doesn't stall the rest. The per-row function may return the names of the
+changes it made instead of True; those are counted per name and kept in the
+checkpoint, so a resumed run still reports totals for the whole migration.
+
+run_steps() does the same bookkeeping for schema steps (ALTER TABLE ...),
+so a re-run only retries the steps that haven't succeeded yet.
+
+    from backend.migrations.runner import run_steps, run_batched, parse_args
+
+    run_steps("add_x", [("add x column", "ALTER TABLE doctors ADD COLUMN x TEXT")])
+    run_batched("backfill_x", Doctor, fill_x, where=Doctor.x.is_(None))
+"""
+
+import argparse
+import json
+import time
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import select, text
+from sqlalchemy.exc import IntegrityError
+from backend.config import Config
+from backend.database import db
+
+REPORT_EVERY = 10  # Print throughput every N batches
+ALREADY_APPLIED = ("duplicate column name", "already exists")  # SQLite errors for repeated DDL
+
+CHECKPOINT_TABLE = """
+CREATE TABLE IF NOT EXISTS migration_checkpoints (
+    name TEXT PRIMARY KEY,
+    last_key TEXT,
+    rows_done INTEGER NOT NULL DEFAULT 0,
+    rows_changed INTEGER NOT NULL DEFAULT 0,
+    rows_failed INTEGER NOT NULL DEFAULT 0,
+    changes TEXT,
+    completed_at DATETIME,
+    updated_at DATETIME
+)
+"""
+
+
+def parse_args(description=None):
+    """Common flags for migration scripts"""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--batch-size", type=int, default=Config.MIGRATION_BATCH_SIZE)
+    parser.add_argument("--restart", action="store_true", help="ignore checkpoints and start over")
+    return parser.parse_args()
+
+
+def _ensure_table():
+    db.session.execute(text(CHECKPOINT_TABLE))
+    columns = {row[1] for row in db.session.execute(text("PRAGMA table_info(migration_checkpoints)"))}
+    if "changes" not in columns:  # Table created before per-change counts existed
+        db.session.execute(text("ALTER TABLE migration_checkpoints ADD COLUMN changes TEXT"))
+    db.session.commit()
+
+
+def _load(name):
+    row = db.session.execute(
+        text("SELECT last_key, rows_done, rows_changed, rows_failed, changes, completed_at FROM migration_checkpoints WHERE name = :name"),
+        {"name": name}
+    ).mappings().first()
+    if row is None:
+        return None
+    return {**row, "changes": json.loads(row["changes"]) if row["changes"] else {}}
+
+
+def _save(name, last_key, done, changed, failed, completed=False, changes=None):
+    """Upsert the checkpoint; runs inside the batch's transaction"""
+    now = datetime.utcnow()
+    db.session.execute(text(
+        "INSERT INTO migration_checkpoints (name, last_key, rows_done, rows_changed, rows_failed, changes, completed_at, updated_at) "
+        "VALUES (:name, :last_key, :done, :changed, :failed, :changes, :completed_at, :now) "
+        "ON CONFLICT(name) DO UPDATE SET last_key = excluded.last_key, rows_done = excluded.rows_done, "
+        "rows_changed = excluded.rows_changed, rows_failed = excluded.rows_failed, changes = excluded.changes, "
+        "completed_at = excluded.completed_at, updated_at = excluded.updated_at"
+    ), {
+        "name": name, "last_key": None if last_key is None else str(last_key),
+        "done": done, "changed": changed, "failed": failed,
+        "changes": json.dumps(dict(changes)) if changes else None,
+        "completed_at": now if completed else None, "now": now,
+    })
+
+
+def reset(name):
+    """Forget a migration's checkpoint so the next run starts from the beginning"""
+    _ensure_table()
+    db.session.execute(text("DELETE FROM migration_checkpoints WHERE name = :name OR name LIKE :steps"),
+                       {"name": name, "steps": f"{name}: %"})
+    db.session.commit()
+
+
+def run_steps(name, steps, restart=False):
+    """
+    Run (label, sql-or-callable) steps once each. Steps that succeeded (or
+    whose column/table already exists) are skipped on later runs; any other
+    failure is reported and retried next time.
+    """
+    _ensure_table()
+    if restart:
+        reset(name)
+    for label, step in steps:
+        key = f"{name}: {label}"
+        checkpoint = _load(key)
+        if checkpoint and checkpoint["completed_at"]:
+            print(f"⏭  {label} (done {checkpoint['completed_at']})")
+            continue
+        try:
+            if callable(step):
+                step()
+            else:
+                db.session.execute(text(step))
+            _save(key, None, 0, 0, 0, completed=True)
+            db.session.commit()
+            print(f"✅ {label}")
+        except Exception as e:
+            db.session.rollback()
+            if any(marker in str(e) for marker in ALREADY_APPLIED):
+                _save(key, None, 0, 0, 0, completed=True)
+                db.session.commit()
+                print(f"⏭  {label} (already applied)")
+            else:
+                print(f"⚠️  {label} failed: {e}")
+
+
+def _page(model, key, where, last_key, batch_size):
+    statement = select(model).order_by(key).limit(batch_size).execution_options(yield_per=batch_size)
+    if last_key is not None:
+        statement = statement.where(key > last_key)
+    if where is not None:
+        statement = statement.where(where)
+    return db.session.scalars(statement)
+
+
+def _tally(result, counts):
+    """Count one migrate_row result (a bool, or the names of the changes made); True if the row changed"""
+    if result and not isinstance(result, bool):
+        counts.update(result)
+    return bool(result)
+
+
+def _apply_rows_individually(rows, key_name, migrate_row):
+    """Retry a failed batch one row per savepoint; returns (changed, failed keys, change counts)"""
+    changed, failed, counts = 0, [], Counter()
+    for row in rows:
+        try:
+            with db.session.begin_nested():
+                result = migrate_row(row)
+                db.session.flush()
+        except IntegrityError as e:
+            failed.append(getattr(row, key_name))
+            print(f"⚠️  {getattr(row, key_name)}: {e.orig}")
+            continue
+        if _tally(result, counts):
+            changed += 1
+    return changed, failed, counts
+
+
+def run_batched(name, model, migrate_row, where=None, batch_size=None, restart=False):
+    """
+    Apply migrate_row(row) -> bool (True if it changed the row) to every row
+    of model matching where, committing every batch_size rows. migrate_row
+    may instead return the names of the changes it made; "changes" in the
+    result then counts each name. Returns the checkpoint counters plus timing.
+    """
+    batch_size = batch_size or Config.MIGRATION_BATCH_SIZE
+    _ensure_table()
+    if restart:
+        reset(name)
+
+    checkpoint = _load(name) or {"last_key": None, "rows_done": 0, "rows_changed": 0, "rows_failed": 0,
+                                 "changes": {}, "completed_at": None}
+    if checkpoint["completed_at"]:
+        print(f"⏭  {name} already completed at {checkpoint['completed_at']} (use --restart to run again)")
+        return {**checkpoint, "seconds": 0.0, "rows_per_second": 0.0}
+
+    key = model.__mapper__.primary_key[0]
+    key_name = key.key
+    last_key = checkpoint["last_key"]
+    if last_key is not None:
+        last_key = key.type.python_type(last_key)
+        print(f"↪️  Resuming {name} after {key_name}={last_key} ({checkpoint['rows_done']} rows already done)")
+
+    done, changed, failed = checkpoint["rows_done"], checkpoint["rows_changed"], checkpoint["rows_failed"]
+    counts = Counter(checkpoint["changes"])
+    started = time.perf_counter()
+    processed = batches = 0
+
+    try:
+        while True:
+            batch_started = time.perf_counter()
+            rows = list(_page(model, key, where, last_key, batch_size))
+            if not rows:
+                _save(name, last_key, done, changed, failed, completed=True, changes=counts)
+                db.session.commit()
+                break
+
+            batch_counts = Counter()
+            batch_changed = sum(1 for row in rows if _tally(migrate_row(row), batch_counts))
+            batch_failed = []
+            try:
+                db.session.flush()
+            except IntegrityError:
+                db.session.rollback()
+                rows = list(_page(model, key, where, last_key, batch_size))
+                batch_changed, batch_failed, batch_counts = _apply_rows_individually(rows, key_name, migrate_row)
+
+            last_key = getattr(rows[-1], key_name)
+            done += len(rows)
+            changed += batch_changed
+            failed += len(batch_failed)
+            counts.update(batch_counts)
+            _save(name, last_key, done, changed, failed, changes=counts)
+            db.session.commit()  # The batch and its checkpoint land together
+            db.session.expunge_all()
+
+            processed += len(rows)
+            batches += 1
+            if batches % REPORT_EVERY == 0:
+                elapsed = time.perf_counter() - started
+                print(f"  {name}: {done} rows ({changed} changed), {processed / elapsed:,.0f} rows/sec, "
+                      f"last batch {(time.perf_counter() - batch_started) * 1000:.0f} ms")
+    except KeyboardInterrupt:
+        db.session.rollback()
+        print(f"\n⏸  Interrupted; {done} rows committed up to {key_name}={last_key}. Re-run to resume.")
+        raise
+
+    seconds = time.perf_counter() - started
+    rate = processed / seconds if seconds else 0.0
+    print(f"✅ {name}: {processed} rows in {seconds:.1f}s ({rate:,.0f} rows/sec); "
+          f"overall {done} rows, {changed} changed, {failed} failed")
+    return {"last_key": last_key, "rows_done": done, "rows_changed": changed, "rows_failed": failed,
+            "changes": dict(counts), "seconds": seconds, "rows_per_second": rate}
@@ -13,8 +13,8 @@ class AuthSession(db.Model):
     id = db.Column(db.String, primary_key=True, default=lambda: str(uuid.uuid4()))
     identifier = db.Column(db.String, nullable=False)  # email, mobile, or google_sub
     method = db.Column(db.String, nullable=False)  # 'otp', 'magic', 'google'
-    token_hash = db.Column(db.String, nullable=False)
-    expires_at = db.Column(db.DateTime, nullable=False)
+    token_hash = db.Column(db.String, nullable=False, index=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
     used = db.Column(db.Boolean, default=False)
     attempts = db.Column(db.Integer, default=0)
     ip_address = db.Column(db.String)
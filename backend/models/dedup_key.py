@@ -0,0 +1,15 @@
+"""
+DedupKey Model - Blocking index for duplicate detection
+One row per (blocking key, doctor): normalized phone, phonetic name and geo
+cell keys. Doctors sharing a key form a block; only pairs inside a block are
+scored, so a new doctor is checked with one indexed lookup instead of
+against the whole table.
+"""
+
+from backend.database import db
+
+class DedupKey(db.Model):
+    __tablename__ = "dedup_keys"
+
+    key = db.Column(db.String, primary_key=True)  # 'p:+9198...', 'n:P340 R520', 'g:4223:14566:R520'
+    doctor_id = db.Column(db.String, db.ForeignKey("doctors.id", ondelete="CASCADE"), primary_key=True, index=True)
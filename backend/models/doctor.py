@@ -1,5 +1,7 @@
 import uuid
+from sqlalchemy.orm import validates
 from backend.database import db
+from backend.normalization.phone import normalize_phone
 
 class Doctor(db.Model):
     __tablename__ = "doctors"
@@ -17,6 +19,12 @@ class Doctor(db.Model):
     
     # Privacy-enhanced contact fields
     personal_mobile = db.Column(db.String, unique=True)  # For authentication & private contact
+    phone_e164 = db.Column(db.String, unique=True)  # personal_mobile normalized (+919876543210); use for lookups
+    
+    # Other login identities (mirrored into doctor_identities for lookups)
+    email = db.Column(db.String, unique=True)  # Magic link login, stored lowercased
+    google_sub = db.Column(db.String, unique=True)  # Google account id
+    last_login_at = db.Column(db.DateTime)
     business_mobile = db.Column(db.String)  # Public-facing masked number
     
     # Doctor profile fields
@@ -35,6 +43,24 @@ class Doctor(db.Model):
     clinic_name = db.Column(db.String)
     profile_photo_url = db.Column(db.String)
 
+    @validates("personal_mobile")
+    def _sync_phone_e164(self, key, value):
+        """Keep phone_e164 in step with every write to personal_mobile"""
+        self.phone_e164 = normalize_phone(value)
+        return value
+
+    @validates("email")
+    def _lowercase_email(self, key, value):
+        return value.strip().lower() if value else None
+
+    @classmethod
+    def find_by_phone(cls, raw):
+        """Doctor whose personal mobile matches raw in any format, or None"""
+        phone = normalize_phone(raw)
+        if not phone:
+            return None
+        return cls.query.filter_by(phone_e164=phone).first()
+
     def to_dict(self):
         return {
             "id": self.id,
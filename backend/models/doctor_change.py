@@ -0,0 +1,18 @@
+"""
+DoctorChange Model - Log of which doctors changed, for cross-worker caches
+One row per doctor per committed write, in the same transaction as the
+write. Workers read it by id to drop their stale copies (services/coherence.py);
+rows are purged after PURGE_RETENTION_MINUTES.
+"""
+
+from datetime import datetime
+from backend.database import db
+
+class DoctorChange(db.Model):
+    __tablename__ = "doctor_changes"
+    # AUTOINCREMENT so ids are never reused after a purge: workers read by id
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = db.Column(db.Integer, primary_key=True)
+    doctor_id = db.Column(db.String, nullable=False)  # No FK: deletions are logged too
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
@@ -0,0 +1,69 @@
+"""
+DoctorIdentity Model - Login identities (phone, email, Google account) per doctor
+One row per (method, identifier); the unique index makes account resolution a
+single indexed lookup. Rows are kept in step with Doctor.phone_e164 / email /
+google_sub by a before_flush hook, so code only ever sets those columns.
+"""
+
+import uuid
+from datetime import datetime
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from backend.database import db
+from backend.models.doctor import Doctor
+from backend.normalization.phone import normalize_phone
+
+# Auth method -> Doctor column holding its (normalized) identifier
+IDENTITY_COLUMNS = {
+    "otp": "phone_e164",
+    "magic": "email",
+    "google": "google_sub",
+}
+
+class DoctorIdentity(db.Model):
+    __tablename__ = "doctor_identities"
+    __table_args__ = (db.UniqueConstraint("method", "identifier", name="uq_doctor_identities_method_identifier"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    doctor_id = db.Column(db.String, db.ForeignKey("doctors.id", ondelete="CASCADE"), nullable=False, index=True)
+    method = db.Column(db.String, nullable=False)  # 'otp', 'magic', 'google' (as in AuthSession.method)
+    identifier = db.Column(db.String, nullable=False)  # E.164 phone, lowercased email or google_sub
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+def normalize_identifier(method, identifier):
+    """Canonical identifier for a method, or None if it can't be one"""
+    if not identifier:
+        return None
+    if method == "otp":
+        return normalize_phone(identifier)
+    if method == "magic":
+        return identifier.strip().lower()
+    return str(identifier)
+
+
+@event.listens_for(Session, "before_flush")
+def _sync_identities(session, flush_context, instances):
+    """Mirror identity column changes on Doctor rows into doctor_identities"""
+    for doctor in list(session.new) + list(session.dirty):
+        if not isinstance(doctor, Doctor):
+            continue
+        if doctor.id is None:
+            doctor.id = str(uuid.uuid4())  # Identity rows need it before the INSERT
+        state = inspect(doctor)
+        for method, column in IDENTITY_COLUMNS.items():
+            history = state.attrs[column].history
+            if not history.has_changes():
+                continue
+            for old in history.deleted or ():
+                if old:
+                    session.query(DoctorIdentity).filter_by(
+                        doctor_id=doctor.id, method=method, identifier=old
+                    ).delete(synchronize_session=False)
+            for new in history.added or ():
+                if new:
+                    session.add(DoctorIdentity(doctor_id=doctor.id, method=method, identifier=new))
+
+    for doctor in session.deleted:
+        if isinstance(doctor, Doctor):
+            session.query(DoctorIdentity).filter_by(doctor_id=doctor.id).delete(synchronize_session=False)
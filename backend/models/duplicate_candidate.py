@@ -0,0 +1,32 @@
+"""
+DuplicateCandidate Model - Pairs of doctor rows that look like the same person
+Written by the dedup engine (backend/services/dedup.py); admins review them at
+/api/admin/duplicates. doctor_a_id < doctor_b_id so each pair is stored once.
+"""
+
+from datetime import datetime
+from backend.database import db
+
+class DuplicateCandidate(db.Model):
+    __tablename__ = "duplicate_candidates"
+    __table_args__ = (db.UniqueConstraint("doctor_a_id", "doctor_b_id", name="uq_duplicate_candidates_pair"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    doctor_a_id = db.Column(db.String, db.ForeignKey("doctors.id", ondelete="CASCADE"), nullable=False, index=True)
+    doctor_b_id = db.Column(db.String, db.ForeignKey("doctors.id", ondelete="CASCADE"), nullable=False, index=True)
+    score = db.Column(db.Float, nullable=False)
+    reasons = db.Column(db.String)  # Comma-separated: 'phone', 'name', 'phonetic', 'nearby', ...
+    status = db.Column(db.String, default="open", index=True)  # 'open' or 'dismissed' (not the same person)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "doctor_a_id": self.doctor_a_id,
+            "doctor_b_id": self.doctor_b_id,
+            "score": round(self.score, 3),
+            "reasons": self.reasons.split(",") if self.reasons else [],
+            "status": self.status,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
@@ -0,0 +1,19 @@
+"""
+RevokedToken Model - Denylist of JWTs revoked before they expire (logout)
+Rows can be purged once the token itself has expired.
+"""
+
+from datetime import datetime
+from backend.database import db
+
+class RevokedToken(db.Model):
+    __tablename__ = "revoked_tokens"
+    # AUTOINCREMENT so ids are never reused after a purge: workers sync by id
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String, nullable=False, unique=True)  # JWT ID claim
+    doctor_id = db.Column(db.String, index=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # Token's own exp
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow)
+    reason = db.Column(db.String, default="logout")
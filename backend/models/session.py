@@ -1,3 +1,4 @@
+import json
 import uuid
 from datetime import datetime, timedelta
 from backend.database import db
@@ -14,7 +15,7 @@ class OTPSession(db.Model):
     otp_hash = db.Column(db.String, nullable=False)  # Hashed OTP (never store plain)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    expires_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
     
     attempts = db.Column(db.Integer, default=0)  # Failed verification attempts
     verified = db.Column(db.Boolean, default=False)
@@ -23,6 +24,11 @@ class OTPSession(db.Model):
     ip_address = db.Column(db.String)  # Track requesting IP
     user_agent = db.Column(db.String)  # Track user agent for fingerprinting
     
+    # Delivery tracking (filled in by the background OTP dispatcher)
+    delivery_status = db.Column(db.String, default="queued")  # queued, sending, sent, failed
+    delivery_channel = db.Column(db.String)  # Channel that delivered: whatsapp or sms
+    delivery_attempts = db.Column(db.Text)  # JSON list of per-attempt results
+    
     def is_expired(self):
         """Check if OTP session has expired"""
         return datetime.utcnow() > self.expires_at
@@ -36,6 +42,18 @@ class OTPSession(db.Model):
         self.attempts += 1
         db.session.commit()
     
+    def attempt_log(self):
+        """Per-attempt delivery results, oldest first"""
+        return json.loads(self.delivery_attempts) if self.delivery_attempts else []
+    
+    def delivery_dict(self):
+        return {
+            "session_id": self.id,
+            "delivery_status": self.delivery_status,
+            "delivery_channel": self.delivery_channel,
+            "attempts": self.attempt_log()
+        }
+    
     @staticmethod
     def create_session(mobile_number, otp_hash, ip_address=None, user_agent=None, expiry_minutes=5):
         """Create a new OTP session"""
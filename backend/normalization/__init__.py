@@ -0,0 +1 @@
+# Shared normalizers for values that are written and looked up in several places
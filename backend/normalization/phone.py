@@ -0,0 +1,101 @@
+"""
+Phone Normalizer - One canonical E.164 form for every stored or looked-up number.
+
+Numbers reach us as "+91 98765 43210", "098765-43210", "919876543210",
+9876543210.0 (Excel) or bare 10-digit mobiles. Everything that writes or
+queries a phone number goes through normalize_phone() so Doctor.phone_e164
+can be matched exactly on its unique index.
+"""
+
+import re
+
+DEFAULT_COUNTRY_CODE = "91"
+NATIONAL_LENGTH = 10  # Indian mobile and (area code + subscriber) landline numbers
+SEPARATORS = re.compile(r"[/,;|]|\bor\b", re.IGNORECASE)
+
+
+def normalize_phone(raw, country_code=DEFAULT_COUNTRY_CODE):
+    """
+    Return the E.164 form ("+919876543210") or None if raw isn't a phone number.
+
+    - "+<digits>" and "00<digits>" are taken as already international
+    - a leading 0 trunk prefix is dropped ("09876543210", "0261 2345678")
+    - 10 national digits get the default country code
+    - 12 digits starting with the country code are taken as-is
+    """
+    if raw is None:
+        return None
+    if isinstance(raw, float):
+        if raw != raw or not raw.is_integer():  # NaN from pandas, or junk
+            return None
+        raw = int(raw)
+    text = str(raw).strip()
+    if not text:
+        return None
+
+    digits = "".join(ch for ch in text if ch.isdigit())
+    if text.startswith("+"):
+        international = digits
+    elif digits.startswith("00"):
+        international = digits[2:]
+    else:
+        national = digits[1:] if digits.startswith("0") else digits
+        if len(national) == NATIONAL_LENGTH:
+            international = country_code + national
+        elif len(national) == len(country_code) + NATIONAL_LENGTH and national.startswith(country_code):
+            international = national
+        else:
+            return None
+
+    if not 8 <= len(international) <= 15 or international.startswith("0"):
+        return None
+    return "+" + international
+
+
+def first_valid_phone(raw, country_code=DEFAULT_COUNTRY_CODE):
+    """Normalize the first usable number in a cell like "98765 43210 / 0261-2345678" """
+    if raw is None or isinstance(raw, (int, float)):
+        return normalize_phone(raw, country_code)
+    for part in SEPARATORS.split(str(raw)):
+        phone = normalize_phone(part, country_code)
+        if phone:
+            return phone
+    return None
+
+
+def gateway_number(e164):
+    """E.164 without the '+', as SMS/WhatsApp gateways expect ("919876543210")"""
+    return e164[1:] if e164 and e164.startswith("+") else e164
+
+
+def _normalize_column(text, country_code):
+    """Vectorized normalize_phone over a pandas string Series (NA where invalid)"""
+    text = text.str.strip()
+    plus = text.str.startswith("+").fillna(False)
+    digits = text.str.replace(r"\D", "", regex=True)
+    national = digits.where(~digits.str.startswith("0").fillna(False), digits.str[1:])
+    national_len = national.str.len()
+
+    is_country_prefixed = (national_len == len(country_code) + NATIONAL_LENGTH) & national.str.startswith(country_code)
+    international = national.where(national.isna())  # All NA, same dtype
+    international = international.mask(is_country_prefixed.fillna(False), national)
+    international = international.mask((national_len == NATIONAL_LENGTH).fillna(False), country_code + national)
+    international = international.mask(digits.str.startswith("00").fillna(False), digits.str[2:])
+    international = international.mask(plus, digits)
+
+    length = international.str.len()
+    valid = (length >= 8) & (length <= 15) & ~international.str.startswith("0")
+    return ("+" + international).where(valid.fillna(False))
+
+
+def normalize_phone_series(series, country_code=DEFAULT_COUNTRY_CODE):
+    """
+    first_valid_phone() for a whole pandas Series at once (import pipeline).
+    Numeric cells are expected as strings already (no "9876543210.0").
+    """
+    text = series.astype("string")
+    parts = text.str.split("(?i)" + SEPARATORS.pattern, n=2, regex=True, expand=True)
+    result = _normalize_column(parts[0], country_code)
+    for column in list(parts.columns)[1:]:
+        result = result.fillna(_normalize_column(parts[column], country_code))
+    return result
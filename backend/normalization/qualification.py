@@ -0,0 +1,195 @@
+"""
+Qualification Normalizer - Map free-text qualifications ("MBBS, MD (Paed)")
+to the specialty shown in the directory. Shared by the Excel importers,
+self-registration and profile/admin updates.
+
+The text is split into words once and all terms are looked up in tables
+built at import time; every hit is ranked by an explicit priority, so the
+result no longer depends on dict order:
+
+1. specialty keywords ("ORTHO", "CARDIO", ...) - the most specific signal
+2. "SURG" - any surgeon not caught above
+3. super-specialty degrees (DM, MCH)
+4. postgraduate degrees (MDS, MD (AYU), MD, MS, ...)
+5. graduate degrees (MBBS, BDS, BAMS, ...), and "DENT" for spelled-out
+   "Bachelor of Dental Surgery"
+6. "PHYSICIAN"
+
+Within a tier the longest term wins ("MD (AYU)" over "MD"); between two
+specialty keywords the first one in the text wins. Degrees match
+as whole words, with dotted initials joined first ("M.B.B.S.", "M. D.",
+"B.H..M.S"), so
+"MD" is not found inside "MDS" and "MS" is not found inside "BAMS".
+Keywords match at the start of a word ("ORTHOPAEDIC", "CARDIOLOGY"); "ENT"
+only as a whole word. Results are memoized per distinct string.
+"""
+
+import re
+from functools import lru_cache
+
+DEFAULT_SPECIALTY = 'General Physician'
+
+# Specialty keywords for advanced detection (tier 1)
+SPECIALTY_KEYWORDS = {
+    'CARDIO': 'Cardiologist',
+    'ORTHO': 'Orthopedic',
+    'GYNEC': 'Gynecologist',
+    'GYN': 'Gynecologist',  # GYNAEC..., GYNY
+    'OBST': 'Gynecologist',
+    'OBG': 'Gynecologist',  # OBG, OBGY, OBGYN
+    'PEDIATR': 'Pediatrician',
+    'DERMA': 'Dermatologist',
+    'ENT': 'ENT Specialist',
+    'OPHTHAL': 'Ophthalmologist',
+    'NEURO': 'Neurologist',
+    'PSYCHI': 'Psychiatrist',
+    'RADIO': 'Radiologist',
+    'ANESTH': 'Anesthesiologist',
+    'PATHOL': 'Pathologist',
+    'MICRO': 'Microbiologist',
+}
+WHOLE_WORD_KEYWORDS = {'ENT'}  # Would otherwise match "DENTAL", "PARENTERAL"
+
+# Keyword -> (previous word that cancels it, longer word start that cancels it)
+KEYWORD_EXCEPTIONS = {
+    'ORTHO': (None, 'ORTHODONT'),  # Orthodontics is dentistry
+    'SURG': ('DENTAL', None),  # BDS "Dental Surgeon" / "Dental Surgery"; DENT says Dentist instead
+}
+
+SUPER_SPECIALTY_DEGREES = {
+    'DM': 'Super Specialist',
+    'MCH': 'Super Specialist',
+}
+
+POSTGRADUATE_DEGREES = {
+    'MD': 'Specialist',
+    'MS': 'Surgeon',
+    'DNB': 'Specialist',
+    'MDS': 'Dental Specialist',
+    'MD (AYU)': 'Ayurvedic Specialist',
+    'MD (HOM)': 'Homeopathic Specialist',
+    'MPT': 'Physiotherapy Specialist',
+    'M.PHARM': 'Pharmacist',
+}
+
+GRADUATE_DEGREES = {
+    'MBBS': 'General Physician',
+    'BDS': 'Dentist',
+    'BAMS': 'Ayurvedic Physician',
+    'BHMS': 'Homeopathic Physician',
+    'BPT': 'Physiotherapist',
+    'B.SC NURSING': 'Nurse',
+    'GNM': 'Nurse',
+    'B.PHARM': 'Pharmacist',
+    'BUMS': 'Unani Physician',
+    'BNYS': 'Naturopathy & Yoga',
+}
+
+# Comprehensive degree to specialty mapping
+DEGREE_SPECIALTY_MAP = {**SUPER_SPECIALTY_DEGREES, **POSTGRADUATE_DEGREES, **GRADUATE_DEGREES}
+
+# (tier, terms, matched as whole-token degrees?) - lower tier wins
+PRIORITY = [
+    (1, SPECIALTY_KEYWORDS, False),
+    (2, {'SURG': 'Surgeon'}, False),
+    (3, SUPER_SPECIALTY_DEGREES, True),
+    (4, POSTGRADUATE_DEGREES, True),
+    (5, GRADUATE_DEGREES, True),
+    (5, {'DENT': 'Dentist'}, False),  # Below MDS, so "MDS (Conservative Dentistry)" stays Dental Specialist
+    (6, {'PHYSICIAN': 'General Physician'}, False),
+]
+
+
+# Dots after a one-letter word, when another letter follows directly or a one-letter
+# word follows: "M.B.B.S." -> "MBBS.", "B.SC" -> "BSC", "M. D. MED" -> "MD. MED", "B.H..M.S" -> "BHMS"
+_INITIAL_DOTS = re.compile(r"(?<=\b[A-Z])\.+(?:(?=[A-Z])|\s*(?=[A-Z]\b))")
+_WORDS = re.compile(r"[A-Z]+")
+
+
+def _words(text):
+    """Upper-case text -> words, with dotted initials joined ("B.SC NURSING" -> BSC, NURSING)"""
+    if "." in text:
+        text = _INITIAL_DOTS.sub("", text)
+    return _WORDS.findall(text)
+
+
+def _compile():
+    """
+    Index every term by how it is looked up: degrees by their exact word
+    sequence (1 or 2 words), keywords by the word prefix they must start.
+    Each entry carries its rank (tier, -term length); lower ranks win.
+    """
+    degrees, keywords = {}, {}
+    for tier, terms, degree in PRIORITY:
+        for term, specialty in terms.items():
+            rank = ((tier, -len(term)), specialty)
+            if degree:
+                degrees[tuple(_words(term))] = rank
+            else:
+                keywords[term] = rank
+    prefix_lengths = sorted({len(k) for k in keywords if k not in WHOLE_WORD_KEYWORDS}, reverse=True)
+    return degrees, keywords, prefix_lengths
+
+
+_DEGREES, _KEYWORDS, _PREFIX_LENGTHS = _compile()
+_PAIR_STARTS = {words[0] for words in _DEGREES if len(words) == 2}  # "MD" of "MD (AYU)"
+
+
+def _better(rank, other):
+    return other if rank is None or (other is not None and other[0] < rank[0]) else rank
+
+
+@lru_cache(maxsize=4096)
+def _classify(word):
+    """
+    (rank, previous word that cancels it) for one word on its own. Sheets use
+    a few hundred distinct words, so this runs once per word, not per row.
+    """
+    if word in WHOLE_WORD_KEYWORDS:
+        return _KEYWORDS[word], None
+    keyword, cancelled_after = None, None
+    for length in _PREFIX_LENGTHS:
+        prefix = word[:length]
+        if len(prefix) < length or prefix not in _KEYWORDS or prefix in WHOLE_WORD_KEYWORDS:
+            continue
+        previous, longer = KEYWORD_EXCEPTIONS.get(prefix, (None, None))
+        if longer and word.startswith(longer):
+            continue
+        keyword, cancelled_after = _KEYWORDS[prefix], previous
+        break
+    degree = _DEGREES.get((word,))
+    if keyword is not None and _better(degree, keyword) is keyword:
+        return keyword, cancelled_after
+    return degree, None
+
+
+@lru_cache(maxsize=8192)
+def _match(qual_upper):
+    words = _words(qual_upper)
+    best, previous = None, None
+    for i, word in enumerate(words):
+        rank, cancelled_after = _classify(word)
+        if cancelled_after is not None and previous == cancelled_after:
+            rank = None
+        if word in _PAIR_STARTS and i + 1 < len(words):
+            rank = _better(rank, _DEGREES.get((word, words[i + 1])))
+        best = _better(best, rank)
+        previous = word
+    return best[1] if best else DEFAULT_SPECIALTY
+
+
+def normalize_qualification(qual_str):
+    """Extract and normalize qualification to specialty"""
+    if not qual_str or qual_str != qual_str:  # None, '' or NaN from pandas
+        return DEFAULT_SPECIALTY
+    return _match(str(qual_str).upper().strip())
+
+
+def resolve_specialty(data):
+    """data["specialty"] if the key is present, else derived from data["degree"]; None if neither is set"""
+    if "specialty" in data:
+        return data["specialty"]
+    degree = data.get("degree")
+    if degree and str(degree).strip():
+        return normalize_qualification(degree)
+    return None
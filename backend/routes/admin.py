@@ -1,7 +1,9 @@
-from flask import Blueprint, request, jsonify, render_template, current_app
+from flask import Blueprint, request, jsonify, render_template, current_app, Response
 from functools import wraps
-from backend.database import db
 from backend.models.doctor import Doctor
+from backend.models.duplicate_candidate import DuplicateCandidate
+from backend.normalization.qualification import normalize_qualification
+from backend.services import circuit_breaker, profiler, scheduler, maintenance, dedup, group_commit
 from datetime import datetime
 
 admin_bp = Blueprint("admin", __name__)
@@ -52,8 +54,7 @@ def get_all_doctors():
 def verify_doctor(id):
     """Verify a doctor"""
     doctor = Doctor.query.get_or_404(id)
-    doctor.verified = True
-    db.session.commit()
+    group_commit.run(lambda session: setattr(session.get(Doctor, id), "verified", True))
     
     return jsonify({
         "success": True,
@@ -65,8 +66,7 @@ def verify_doctor(id):
 def unverify_doctor(id):
     """Unverify a doctor (mark as pending)"""
     doctor = Doctor.query.get_or_404(id)
-    doctor.verified = False
-    db.session.commit()
+    group_commit.run(lambda session: setattr(session.get(Doctor, id), "verified", False))
     
     return jsonify({
         "success": True,
@@ -86,11 +86,18 @@ def admin_update_doctor(id):
         'area', 'city', 'business_mobile', 'verified'
     ]
     
-    for field in allowed_fields:
-        if field in data:
-            setattr(doctor, field, data[field])
+    changes = {field: data[field] for field in allowed_fields if field in data}
     
-    db.session.commit()
+    # A new degree without an explicit specialty re-derives it
+    if data.get("degree") and "specialty" not in data:
+        changes["specialty"] = normalize_qualification(data["degree"])
+    
+    def apply(session):
+        target = session.get(Doctor, id)
+        for field, value in changes.items():
+            setattr(target, field, value)
+    
+    group_commit.run(apply)
     
     return jsonify({
         "success": True,
@@ -101,9 +108,8 @@ def admin_update_doctor(id):
 @require_admin
 def delete_doctor(id):
     """Delete a doctor (soft delete or permanent)"""
-    doctor = Doctor.query.get_or_404(id)
-    db.session.delete(doctor)
-    db.session.commit()
+    Doctor.query.get_or_404(id)
+    group_commit.run(lambda session: session.delete(session.get(Doctor, id)))
     
     return jsonify({"success": True})
 
@@ -123,3 +129,102 @@ def get_stats():
         "self_registered": self_registered,
         "with_business_numbers": with_business_numbers
     })
+
+@admin_bp.route("/api/admin/profile")
+@require_admin
+def profile_status():
+    """Profiler sampling configuration and per-route sample counts"""
+    return jsonify(profiler.status())
+
+@admin_bp.route("/api/admin/profile/capture", methods=["POST"])
+@require_admin
+def profile_capture():
+    """
+    Start a timed capture window.
+    Body: {"seconds": 30, "rate": 1.0, "route": "/api/search"} (rate and route optional)
+    """
+    data = request.json or {}
+    try:
+        seconds = float(data.get("seconds", 30))
+        rate = float(data.get("rate", 1.0))
+    except (TypeError, ValueError):
+        return jsonify({"error": "seconds and rate must be numbers"}), 400
+    
+    if not (0 < seconds <= 600) or not (0 < rate <= 1):
+        return jsonify({"error": "seconds must be in (0, 600] and rate in (0, 1]"}), 400
+    
+    return jsonify(profiler.start_capture(seconds, rate, data.get("route")))
+
+@admin_bp.route("/api/admin/profile/stacks")
+@require_admin
+def profile_stacks():
+    """Collapsed stacks (flamegraph.pl / speedscope input), optionally for one route"""
+    return Response(profiler.collapsed_stacks(request.args.get("route")), mimetype="text/plain")
+
+@admin_bp.route("/api/admin/profile/stacks", methods=["DELETE"])
+@require_admin
+def profile_reset():
+    """Discard collected samples"""
+    profiler.reset()
+    return jsonify({"success": True})
+
+@admin_bp.route("/api/admin/maintenance")
+@require_admin
+def maintenance_status():
+    """Last purge report and background job status"""
+    return jsonify({
+        "last_purge": maintenance.last_report,
+        "jobs": scheduler.jobs()
+    })
+
+@admin_bp.route("/api/admin/maintenance/purge", methods=["POST"])
+@require_admin
+def run_purge():
+    """Purge expired auth/OTP rows now"""
+    return jsonify(maintenance.purge_expired())
+
+@admin_bp.route("/api/admin/breakers")
+@require_admin
+def breaker_status():
+    """Circuit breaker state for external providers (this worker's view)"""
+    return jsonify({"breakers": circuit_breaker.all_states()})
+
+@admin_bp.route("/api/admin/breakers/<name>/reset", methods=["POST"])
+@require_admin
+def breaker_reset(name):
+    """Close a breaker now, e.g. after the provider confirms recovery"""
+    if not circuit_breaker.reset(name):
+        return jsonify({"error": "Unknown breaker"}), 404
+    return jsonify({"success": True, "breaker": name})
+
+@admin_bp.route("/api/admin/duplicates")
+@require_admin
+def list_duplicates():
+    """Likely duplicate doctors, best matches first. ?status=open|dismissed&limit=100"""
+    status = request.args.get("status", "open")
+    limit = min(request.args.get("limit", 100, type=int), 500)
+    candidates = DuplicateCandidate.query.filter_by(status=status).order_by(DuplicateCandidate.score.desc()).limit(limit).all()
+    
+    ids = {c.doctor_a_id for c in candidates} | {c.doctor_b_id for c in candidates}
+    doctors = {d.id: d.to_dict() for d in Doctor.query.filter(Doctor.id.in_(ids))} if ids else {}
+    
+    return jsonify({
+        "duplicates": [
+            {**c.to_dict(), "doctor_a": doctors[c.doctor_a_id], "doctor_b": doctors[c.doctor_b_id]}
+            for c in candidates if c.doctor_a_id in doctors and c.doctor_b_id in doctors
+        ]
+    })
+
+@admin_bp.route("/api/admin/duplicates/<int:candidate_id>/dismiss", methods=["POST"])
+@require_admin
+def dismiss_duplicate(candidate_id):
+    """Mark a pair as different people; rescans won't list it again"""
+    candidate = DuplicateCandidate.query.get_or_404(candidate_id)
+    group_commit.run(lambda session: setattr(session.get(DuplicateCandidate, candidate_id), "status", "dismissed"))
+    return jsonify({"success": True, "duplicate": candidate.to_dict()})
+
+@admin_bp.route("/api/admin/duplicates/scan", methods=["POST"])
+@require_admin
+def scan_duplicates():
+    """Rescan the whole table now"""
+    return jsonify(dedup.scan_all())
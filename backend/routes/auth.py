@@ -1,13 +1,17 @@
 from flask import Blueprint, request, jsonify, redirect
 from functools import wraps
+from datetime import datetime
 from backend.database import db
 from backend.models.doctor import Doctor
-from backend.auth.otp import create_otp_session, verify_otp_session, generate_jwt, verify_jwt
+from backend.auth.otp import create_otp_session, verify_otp_session, generate_jwt, decode_jwt
 from backend.auth.magic_link import generate_magic_token, verify_magic_token, get_magic_link_url
 from backend.auth.google_auth import verify_google_token
 from backend.auth.account_linking import find_or_create_doctor, validate_required_fields
-from backend.services.otp_service import send_otp
+from backend.services import otp_dispatch, idempotency
 from backend.services.email_service import send_magic_link
+from backend.services import rate_limit, revocation, group_commit, location_buffer
+from backend.normalization.phone import normalize_phone
+from backend.normalization.qualification import resolve_specialty
 
 auth_bp = Blueprint("auth", __name__)
 
@@ -25,19 +29,21 @@ def jwt_required(f):
         except IndexError:
             return jsonify({"error": "Invalid authorization header format"}), 401
         
-        doctor_id, error = verify_jwt(token)
+        claims, error = decode_jwt(token)
         
         if error:
             return jsonify({"error": error}), 401
         
-        # Attach doctor_id to request context
-        request.doctor_id = doctor_id
+        # Attach doctor_id (and claims, for logout) to request context
+        request.doctor_id = claims['doctor_id']
+        request.jwt_claims = claims
         
         return f(*args, **kwargs)
     
     return decorated_function
 
 @auth_bp.route("/api/auth/request-otp", methods=["POST"])
+@idempotency.idempotent("request-otp")
 def request_otp():
     """
     Request OTP for login or registration.
@@ -49,6 +55,10 @@ def request_otp():
     if not mobile_number:
         return jsonify({"error": "Mobile number required"}), 400
     
+    mobile_number = normalize_phone(mobile_number)
+    if not mobile_number:
+        return jsonify({"error": "Invalid mobile number"}), 400
+    
     # Get request metadata for abuse tracking
     ip_address = request.remote_addr
     user_agent = request.headers.get('User-Agent', '')
@@ -57,25 +67,35 @@ def request_otp():
     session, result = create_otp_session(mobile_number, ip_address, user_agent)
     
     if not session:
-        # Rate limit exceeded
-        return jsonify({"error": result}), 429
+        # Rate limit exceeded; result is seconds until retry
+        return rate_limit.too_many_requests(result, "Too many OTP requests.")
     
     # result is the plain OTP
     otp = result
     
-    # Send OTP via SMS
-    success, message = send_otp(mobile_number, otp)
-    
-    if not success:
-        return jsonify({"error": f"Failed to send OTP: {message}"}), 500
+    # Deliver in the background (WhatsApp, then SMS fallback)
+    if not otp_dispatch.enqueue(session["id"], mobile_number, otp):
+        return jsonify({"error": "OTP service busy. Please try again shortly."}), 503
     
     return jsonify({
         "success": True,
-        "session_id": session.id,
-        "message": "OTP sent successfully. Check WhatsApp or SMS.",
+        "session_id": session["id"],
+        "delivery_status": "queued",
+        "status_url": f"/api/auth/otp-status/{session['id']}",
+        "message": "OTP is being sent. Check WhatsApp or SMS.",
         "expires_in_minutes": 5
     })
 
+@auth_bp.route("/api/auth/otp-status/<session_id>", methods=["GET"])
+def otp_status(session_id):
+    """Poll OTP delivery status (queued, sending, sent, failed) and attempts"""
+    status = otp_dispatch.delivery_status(session_id)
+    
+    if not status:
+        return jsonify({"error": "Invalid session"}), 404
+    
+    return jsonify(status)
+
 @auth_bp.route("/api/auth/verify-otp", methods=["POST"])
 def verify_otp():
     """
@@ -91,13 +111,13 @@ def verify_otp():
         return jsonify({"error": "session_id, otp, and mobile required"}), 400
     
     # Verify OTP
-    success, message = verify_otp_session(session_id, otp)
+    success, message = verify_otp_session(session_id, otp, mobile_number)
     
     if not success:
         return jsonify({"error": message}), 400
     
     # Check if doctor exists
-    doctor = Doctor.query.filter_by(personal_mobile=mobile_number).first()
+    doctor = Doctor.find_by_phone(mobile_number)
     
     if doctor:
         # Existing doctor - issue JWT
@@ -119,6 +139,7 @@ def verify_otp():
         })
 
 @auth_bp.route("/api/auth/register", methods=["POST"])
+@idempotency.idempotent("register")
 def register_doctor():
     """
     Complete doctor self-registration after OTP verification.
@@ -130,7 +151,7 @@ def register_doctor():
     mobile = data.get("mobile")
     name = data.get("name")
     degree = data.get("degree")
-    specialty = data.get("specialty")
+    specialty = resolve_specialty(data)  # Derived from the degree if not given
     area = data.get("area") 
     latitude = data.get("latitude")
     longitude = data.get("longitude")
@@ -138,34 +159,41 @@ def register_doctor():
     # Validate required fields
     if not all([mobile, name, specialty, area, latitude, longitude]):
         return jsonify({
-            "error": "Required fields: mobile, name, specialty, area, latitude, longitude"
+            "error": "Required fields: mobile, name, specialty (or degree), area, latitude, longitude"
         }), 400
     
-    # Check if doctor already exists
-    existing = Doctor.query.filter_by(personal_mobile=mobile).first()
-    if existing:
+    mobile = normalize_phone(mobile)
+    if not mobile:
+        return jsonify({"error": "Invalid mobile number"}), 400
+    
+    def create(session):
+        # Checked in the writer, so two sign-ups with one number can't both pass
+        if Doctor.find_by_phone(mobile):
+            return None
+        doctor = Doctor(
+            name=name,
+            degree=degree or "",
+            specialty=specialty,
+            area=area,
+            city=data.get("city", ""),
+            latitude=latitude,
+            longitude=longitude,
+            personal_mobile=mobile,
+            phone=mobile,  # Legacy field
+            experience_years=data.get("experience_years", 0),
+            clinic_name=data.get("clinic_name", ""),
+            verified=False,  # Requires admin approval
+            self_registered=True,
+            last_location_update=datetime.utcnow()
+        )
+        session.add(doctor)
+        session.flush()
+        return doctor.id
+    
+    doctor_id = group_commit.run(create)
+    if doctor_id is None:
         return jsonify({"error": "Doctor with this mobile number already exists"}), 409
-    
-    # Create new doctor
-    doctor = Doctor(
-        name=name,
-        degree=degree or "",
-        specialty=specialty,
-        area=area,
-        city=data.get("city", ""),
-        latitude=latitude,
-        longitude=longitude,
-        personal_mobile=mobile,
-        phone=mobile,  # Legacy field
-        experience_years=data.get("experience_years", 0),
-        clinic_name=data.get("clinic_name", ""),
-        verified=False,  # Requires admin approval
-        self_registered=True,
-        last_location_update=datetime.utcnow()
-    )
-    
-    db.session.add(doctor)
-    db.session.commit()
+    doctor = db.session.get(Doctor, doctor_id)
     
     # Issue JWT token
     token = generate_jwt(doctor.id)
@@ -181,6 +209,7 @@ def register_doctor():
 # ==================== MAGIC LINK AUTH ====================
 
 @auth_bp.route("/api/auth/request-magic-link", methods=["POST"])
+@idempotency.idempotent("request-magic-link")
 def request_magic_link():
     """Send magic link to email for passwordless authentication"""
     data = request.json
@@ -199,6 +228,10 @@ def request_magic_link():
     ip_address = request.remote_addr
     user_agent = request.headers.get('User-Agent', '')
     
+    retry_after = rate_limit.check(("magic:email", email), ("magic:ip", ip_address))
+    if retry_after:
+        return rate_limit.too_many_requests(retry_after, "Too many magic link requests.")
+    
     # Generate magic token
     session, plain_token = generate_magic_token(email, ip_address, user_agent)
     
@@ -233,7 +266,7 @@ def verify_magic_link_endpoint():
         return jsonify({"error": error}), 400
     
     # Find or create doctor
-    email = session.identifier
+    email = session["identifier"]
     doctor, is_new, linked = find_or_create_doctor(
         identifier=email,
         method='magic',
@@ -268,6 +301,10 @@ def google_login():
     if not id_token_str:
         return jsonify({"error": "Google ID token required"}), 400
     
+    retry_after = rate_limit.check(("google:ip", request.remote_addr))
+    if retry_after:
+        return rate_limit.too_many_requests(retry_after, "Too many login attempts.")
+    
     # Verify Google token
     user_info, error = verify_google_token(id_token_str)
     
@@ -327,27 +364,66 @@ def complete_registration():
     if errors:
         return jsonify({"error": "; ".join(errors)}), 400
     
+    personal_mobile = normalize_phone(data["personal_mobile"])
+    if not personal_mobile:
+        return jsonify({"error": "Invalid mobile number"}), 400
+    
     # Update doctor profile
-    doctor.name = data.get("name", doctor.name)
-    doctor.personal_mobile = data["personal_mobile"]  # REQUIRED
-    doctor.degree = data.get("degree", "")
-    doctor.specialty = data["specialty"]  # REQUIRED
-    doctor.experience_years = data.get("experience_years", 0)
-    doctor.area = data.get("area", "")
-    doctor.city = data.get("city", "")
-    doctor.latitude = data.get("latitude")
-    doctor.longitude = data.get("longitude")
-    doctor.clinic_name = data.get("clinic_name", "")
-    doctor.self_registered = True
-    
-    db.session.commit()
+    changes = {
+        "name": data.get("name", doctor.name),
+        "personal_mobile": personal_mobile,  # REQUIRED
+        "degree": data.get("degree", ""),
+        "specialty": data["specialty"],  # REQUIRED
+        "experience_years": data.get("experience_years", 0),
+        "area": data.get("area", ""),
+        "city": data.get("city", ""),
+        "latitude": data.get("latitude"),
+        "longitude": data.get("longitude"),
+        "clinic_name": data.get("clinic_name", ""),
+        "self_registered": True,
+    }
+    if changes["latitude"] is not None and changes["longitude"] is not None:
+        # Stamp the move so an older buffered live-location fix can't overwrite it
+        changes["last_location_update"] = datetime.utcnow()
+        location_buffer.discard(doctor.id)
+    
+    def apply(session):
+        existing = Doctor.find_by_phone(personal_mobile)
+        if existing and existing.id != doctor.id:
+            return False
+        target = session.get(Doctor, doctor.id)
+        for field, value in changes.items():
+            setattr(target, field, value)
+        return True
+    
+    if not group_commit.run(apply):
+        return jsonify({"error": "Mobile number already in use"}), 409
     
     # Issue full JWT
     token = generate_jwt(doctor.id)
     
+    # The short-lived registration token has done its job
+    if request.jwt_claims.get("jti"):
+        revocation.revoke(request.jwt_claims["jti"], request.jwt_claims["exp"], doctor.id, reason="registration_complete")
+    
     return jsonify({
         "success": True,
         "token": token,
         "doctor": doctor.to_dict(),
         "message": "Registration completed! Your profile is pending verification."
     }), 201
+
+
+# ==================== LOGOUT ====================
+
+@auth_bp.route("/api/auth/logout", methods=["POST"])
+@jwt_required
+def logout():
+    """Revoke the presented token; other workers stop accepting it within seconds"""
+    claims = request.jwt_claims
+    if not claims.get("jti"):
+        return jsonify({"error": "Token predates logout support; it expires on its own"}), 400
+    
+    revocation.revoke(claims["jti"], claims["exp"], request.doctor_id)
+    
+    return jsonify({"success": True, "message": "Logged out"}), 200
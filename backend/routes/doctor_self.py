@@ -1,8 +1,10 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
-from backend.database import db
 from backend.models.doctor import Doctor
 from backend.routes.auth import jwt_required
+from backend.normalization.phone import normalize_phone
+from backend.normalization.qualification import normalize_qualification
+from backend.services import location_buffer, group_commit
 
 doctor_self_bp = Blueprint("doctor_self", __name__)
 
@@ -15,7 +17,7 @@ def get_my_profile():
     if not doctor:
         return jsonify({"error": "Doctor not found"}), 404
     
-    return jsonify(doctor.to_dict())
+    return jsonify(location_buffer.overlay(doctor.to_dict()))
 
 @doctor_self_bp.route("/api/doctor/update-profile", methods=["PUT"])
 @jwt_required
@@ -32,41 +34,47 @@ def update_profile():
     
     data = request.json
     
+    # Explicitly block name editing
+    if "name" in data:
+        return jsonify({
+            "error": "Name cannot be edited directly. Contact admin if correction needed."
+        }), 403
+    
     # Update allowed fields only
+    changes = {}
     if "degree" in data:
-        doctor.degree = data["degree"]
+        changes["degree"] = data["degree"]
+        if "specialty" not in data:
+            changes["specialty"] = normalize_qualification(data["degree"])
     
     if "specialty" in data:
-        doctor.specialty = data["specialty"]
-    
-    if "experience_years" in data:
-        doctor.experience_years = data["experience_years"]
-    
-    if "clinic_name" in data:
-        doctor.clinic_name = data["clinic_name"]
+        changes["specialty"] = data["specialty"]
     
-    if "city" in data:
-        doctor.city = data["city"]
-    
-    if "area" in data:
-        doctor.area = data["area"]
+    for field in ("experience_years", "clinic_name", "city", "area"):
+        if field in data:
+            changes[field] = data[field]
     
+    new_mobile = None
     if "personal_mobile" in data:
-        # Check if new mobile already exists
-        new_mobile = data["personal_mobile"]
-        existing = Doctor.query.filter_by(personal_mobile=new_mobile).first()
-        if existing and existing.id != doctor.id:
-            return jsonify({"error": "Mobile number already in use"}), 409
-        doctor.personal_mobile = new_mobile
-        doctor.phone = new_mobile  # Update legacy field too
-    
-    # Explicitly block name editing
-    if "name" in data:
-        return jsonify({
-            "error": "Name cannot be edited directly. Contact admin if correction needed."
-        }), 403
-    
-    db.session.commit()
+        new_mobile = normalize_phone(data["personal_mobile"])
+        if not new_mobile:
+            return jsonify({"error": "Invalid mobile number"}), 400
+    
+    def apply(session):
+        target = session.get(Doctor, doctor.id)
+        if new_mobile:
+            # Check if new mobile already exists (in any format)
+            existing = Doctor.find_by_phone(new_mobile)
+            if existing and existing.id != target.id:
+                return False
+            target.personal_mobile = new_mobile
+            target.phone = new_mobile  # Update legacy field too
+        for field, value in changes.items():
+            setattr(target, field, value)
+        return True
+    
+    if not group_commit.run(apply):
+        return jsonify({"error": "Mobile number already in use"}), 409
     
     return jsonify({
         "success": True,
@@ -93,19 +101,27 @@ def update_location():
     if not (-90 <= latitude <= 90) or not (-180 <= longitude <= 180):
         return jsonify({"error": "Invalid coordinates"}), 400
     
-    doctor.latitude = latitude
-    doctor.longitude = longitude
-    doctor.last_location_update = datetime.utcnow()
-    
-    # Optionally update area/city if provided
-    if "area" in data:
-        doctor.area = data["area"]
-    if "city" in data:
-        doctor.city = data["city"]
-    
-    db.session.commit()
+    # Optionally update area/city if provided: a real move, write it through now
+    if "area" in data or "city" in data:
+        location_buffer.discard(doctor.id)
+        changes = {"latitude": latitude, "longitude": longitude, "last_location_update": datetime.utcnow()}
+        for field in ("area", "city"):
+            if field in data:
+                changes[field] = data[field]
+        
+        def apply(session):
+            target = session.get(Doctor, doctor.id)
+            for field, value in changes.items():
+                setattr(target, field, value)
+        
+        group_commit.run(apply)
+        status = "saved"
+    else:
+        # Live-location fixes are coalesced and written in batches
+        status = location_buffer.submit(doctor, latitude, longitude)
     
     return jsonify({
         "success": True,
-        "doctor": doctor.to_dict()
+        "location_status": status,  # 'saved', 'buffered' or 'ignored' (moved less than the jitter threshold)
+        "doctor": location_buffer.overlay(doctor.to_dict())
     })
@@ -1,5 +1,6 @@
-from flask import Blueprint, render_template, jsonify
+from flask import Blueprint, render_template, jsonify, request, abort
 from backend.models.doctor import Doctor
+from backend.services import doctor_cache, location_buffer, rate_limit
 
 public_bp = Blueprint("public", __name__)
 
@@ -25,8 +26,10 @@ def doctor_detail(id):
 @public_bp.route("/api/doctor/<id>")
 def doctor_api(id):
     """Get doctor details via API"""
-    doctor = Doctor.query.get_or_404(id)
-    return jsonify(doctor.to_public_dict())
+    payload = doctor_cache.get_public(id)
+    if payload is None:
+        abort(404)
+    return jsonify(location_buffer.overlay(payload))
 
 @public_bp.route("/api/doctor/<id>/contact")
 def doctor_contact(id):
@@ -34,6 +37,10 @@ def doctor_contact(id):
     Get masked contact number for a doctor.
     Returns business_mobile if available, otherwise masked personal_mobile.
     """
+    retry_after = rate_limit.check(("contact:ip", request.remote_addr))
+    if retry_after:
+        return rate_limit.too_many_requests(retry_after)
+    
     doctor = Doctor.query.get_or_404(id)
     
     if doctor.business_mobile:
@@ -0,0 +1,387 @@
+"""
+Challenge Store - Short-lived OTP and magic-link state outside SQLite.
+
+A challenge is the state behind one OTP session or magic link: identifier,
+secret hash, expiry, attempt counter, used flag and (for OTPs) delivery
+status. Backends, picked by Config.CHALLENGE_STORE:
+
+- sqlite (default): the otp_sessions / auth_sessions rows, as before.
+- memory: a TTL dict in this process. Only for a single worker.
+- redis://host:port/db: any Redis-protocol server, shared by all workers.
+
+Every backend gives the same atomic operations: incr_attempts() is an
+atomic increment and claim() is a compare-and-set of used False -> True, so
+two concurrent verifications can't both succeed. With memory/redis the
+otp_sessions / auth_sessions rows become an audit trail, written in batches
+by a background thread so login traffic never waits on the SQLite lock.
+"""
+
+import copy
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import update
+from backend.config import Config
+from backend.database import db
+from backend.models.auth_session import AuthSession
+from backend.models.session import OTPSession
+from backend.services import group_commit
+from backend.services.rate_limit import RespClient
+
+logger = logging.getLogger(__name__)
+
+GRACE_SECONDS = 600  # Keep expired challenges this long so users get "expired", not "invalid"
+COUNTER_TTL_MS = 3600 * 1000  # Attempt/used/delivery keys outlive any challenge
+
+# kind -> (model, key column, used column, {state field: column})
+KINDS = {
+    "otp": (OTPSession, "id", "verified", {
+        "id": "id",
+        "identifier": "mobile_number",
+        "hash": "otp_hash",
+        "delivery_status": "delivery_status",
+        "delivery_channel": "delivery_channel",
+    }),
+    "magic": (AuthSession, "token_hash", "used", {
+        "id": "id",
+        "identifier": "identifier",
+        "hash": "token_hash",
+    }),
+}
+COMMON_COLUMNS = {
+    "expires_at": "expires_at",
+    "created_at": "created_at",
+    "attempts": "attempts",
+    "ip_address": "ip_address",
+    "user_agent": "user_agent",
+}
+
+
+def _to_datetime(epoch):
+    return datetime.utcfromtimestamp(epoch) if epoch is not None else None
+
+
+def _to_epoch(dt):
+    return (dt - datetime(1970, 1, 1)).total_seconds() if dt else None
+
+
+def to_columns(kind, fields):
+    """State fields -> model column values"""
+    model, _, used_column, mapping = KINDS[kind]
+    columns = {}
+    for field, value in fields.items():
+        if field in ("expires_at", "created_at"):
+            columns[field] = _to_datetime(value)
+        elif field == "used":
+            columns[used_column] = value
+        elif field == "delivery_attempts":
+            columns[field] = json.dumps(value)
+        elif field in mapping:
+            columns[mapping[field]] = value
+        elif field in COMMON_COLUMNS:
+            columns[COMMON_COLUMNS[field]] = value
+    if kind == "magic":
+        columns["method"] = "magic"
+    return columns
+
+
+def from_row(kind, row):
+    """Model row -> state dict"""
+    _, _, used_column, mapping = KINDS[kind]
+    state = {field: getattr(row, column) for field, column in {**mapping, **COMMON_COLUMNS}.items()}
+    state["expires_at"] = _to_epoch(row.expires_at)
+    state["created_at"] = _to_epoch(row.created_at)
+    state["attempts"] = row.attempts or 0
+    state["used"] = bool(getattr(row, used_column))
+    if kind == "otp":
+        state["delivery_attempts"] = row.attempt_log()
+    return state
+
+
+def is_expired(state):
+    return time.time() > state["expires_at"]
+
+
+class SqliteStore:
+    """
+    Challenge state in the otp_sessions / auth_sessions tables. Every write
+    (creation, attempts, claims, delivery updates) goes through the
+    group-commit writer; with a single writer the claim's compare-and-set
+    stays atomic.
+    """
+
+    def _row(self, kind, key):
+        model, key_column, _, _ = KINDS[kind]
+        return model.query.filter(getattr(model, key_column) == key).first()
+
+    def create(self, kind, key, state):
+        model = KINDS[kind][0]
+        columns = to_columns(kind, state)
+        group_commit.run(lambda session: session.add(model(**columns)))
+
+    def get(self, kind, key):
+        row = self._row(kind, key)
+        return from_row(kind, row) if row else None
+
+    def incr_attempts(self, kind, key):
+        model, key_column, _, _ = KINDS[kind]
+        column = getattr(model, key_column)
+        
+        def increment(session):
+            session.execute(update(model).where(column == key).values(attempts=model.attempts + 1))
+            return session.query(model.attempts).filter(column == key).scalar()
+        
+        return group_commit.run(increment)
+
+    def claim(self, kind, key):
+        model, key_column, used_column, _ = KINDS[kind]
+        statement = (
+            update(model)
+            .where(getattr(model, key_column) == key, getattr(model, used_column).isnot(True))
+            .values({used_column: True})
+        )
+        return group_commit.run(lambda session: session.execute(statement).rowcount == 1)
+
+    def update(self, kind, key, **fields):
+        model, key_column, _, _ = KINDS[kind]
+        columns = to_columns(kind, fields)
+        statement = update(model).where(getattr(model, key_column) == key).values(columns)
+        group_commit.run(lambda session: session.execute(statement))
+
+
+class MemoryStore:
+    """Challenge state in a process-local dict (single worker only)"""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _live(self, kind, key):
+        entry = self._entries.get((kind, key))
+        if entry is not None and time.time() > entry["expires_at"] + GRACE_SECONDS:
+            del self._entries[(kind, key)]
+            return None
+        return entry
+
+    def create(self, kind, key, state):
+        with self._lock:
+            self._entries[(kind, key)] = copy.deepcopy(state)
+            if len(self._entries) > 100000:
+                for stale in [k for k, s in self._entries.items() if time.time() > s["expires_at"] + GRACE_SECONDS]:
+                    del self._entries[stale]
+
+    def get(self, kind, key):
+        with self._lock:
+            entry = self._live(kind, key)
+            return copy.deepcopy(entry) if entry else None
+
+    def incr_attempts(self, kind, key):
+        with self._lock:
+            entry = self._live(kind, key)
+            if entry is None:
+                return None
+            entry["attempts"] += 1
+            return entry["attempts"]
+
+    def claim(self, kind, key):
+        with self._lock:
+            entry = self._live(kind, key)
+            if entry is None or entry["used"]:
+                return False
+            entry["used"] = True
+            return True
+
+    def update(self, kind, key, **fields):
+        with self._lock:
+            entry = self._live(kind, key)
+            if entry is not None:
+                entry.update(copy.deepcopy(fields))
+
+
+class RespStore:
+    """
+    Challenge state on a Redis-protocol server. The immutable part is one JSON
+    key created with SET NX; attempts (INCR), used (SET NX) and delivery
+    fields live in side keys so each operation is a single atomic command.
+    """
+
+    def __init__(self, url):
+        self.client = RespClient(url)
+
+    @staticmethod
+    def _key(kind, key):
+        return f"ch:{kind}:{key}"
+
+    def create(self, kind, key, state):
+        ttl_ms = int((state["expires_at"] - time.time() + GRACE_SECONDS) * 1000)
+        base = {k: v for k, v in state.items() if k not in ("attempts", "used")}
+        self.client.execute("SET", self._key(kind, key), json.dumps(base), "NX", "PX", ttl_ms)
+
+    def get(self, kind, key):
+        k = self._key(kind, key)
+        base, attempts, used, fields = self.client.pipeline(
+            ("GET", k), ("GET", f"{k}:attempts"), ("GET", f"{k}:used"), ("GET", f"{k}:fields")
+        )
+        if base is None:
+            return None
+        state = json.loads(base)
+        state.update(json.loads(fields) if fields else {})
+        state["attempts"] = int(attempts or 0)
+        state["used"] = used is not None
+        return state
+
+    def incr_attempts(self, kind, key):
+        k = self._key(kind, key)
+        attempts, _, base = self.client.pipeline(
+            ("INCR", f"{k}:attempts"), ("PEXPIRE", f"{k}:attempts", COUNTER_TTL_MS), ("GET", k)
+        )
+        return attempts if base is not None else None
+
+    def claim(self, kind, key):
+        k = self._key(kind, key)
+        claimed, base = self.client.pipeline(("SET", f"{k}:used", 1, "NX", "PX", COUNTER_TTL_MS), ("GET", k))
+        return base is not None and claimed == "OK"
+
+    def update(self, kind, key, **fields):
+        # Delivery fields have a single writer (the OTP dispatcher), so read-modify-write is safe
+        k = f"{self._key(kind, key)}:fields"
+        current = self.client.execute("GET", k)
+        merged = {**(json.loads(current) if current else {}), **fields}
+        self.client.execute("SET", k, json.dumps(merged), "PX", COUNTER_TTL_MS)
+
+
+class AuditWriter:
+    """
+    Persists challenge changes to otp_sessions / auth_sessions in batches.
+    Changes to the same challenge within a batch are merged into one write.
+    """
+
+    def __init__(self, batch_size=100):
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=10000)
+        self._started = False
+        self._lock = threading.Lock()
+        self.stats = {"written": 0, "dropped": 0, "batches": 0}
+
+    def record(self, kind, key, fields, create=False):
+        self._start()
+        try:
+            self._queue.put_nowait((kind, key, fields, create))
+        except queue.Full:
+            self.stats["dropped"] += 1
+            logger.warning(f"Challenge audit queue full, dropped {kind} {key}")
+
+    def _start(self):
+        if self._started:
+            return
+        with self._lock:
+            if not self._started:
+                threading.Thread(target=self._drain, name="challenge-audit", daemon=True).start()
+                self._started = True
+
+    def _drain(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with _app.app_context():
+                    self._write(batch)
+                self.stats["written"] += len(batch)
+            except Exception:
+                logger.exception(f"Challenge audit write failed, dropped {len(batch)} changes")
+                self.stats["dropped"] += len(batch)
+            self.stats["batches"] += 1
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write(self, batch):
+        merged = {}
+        for kind, key, fields, create in batch:
+            entry = merged.setdefault((kind, key), {"fields": {}, "create": False})
+            if "attempts" in fields:
+                # Concurrent increments can be queued out of order; the counter only grows
+                fields = {**fields, "attempts": max(fields["attempts"], entry["fields"].get("attempts", 0))}
+            entry["fields"].update(fields)
+            entry["create"] = entry["create"] or create
+
+        for (kind, key), entry in merged.items():
+            model, key_column, _, _ = KINDS[kind]
+            columns = to_columns(kind, entry["fields"])
+            row = None if entry["create"] else model.query.filter(getattr(model, key_column) == key).first()
+            if row is None:
+                if not entry["create"]:
+                    continue  # Creation was dropped; nothing to attach the change to
+                db.session.add(model(**columns))
+            else:
+                for column, value in columns.items():
+                    if column == "attempts":
+                        value = max(value, row.attempts or 0)
+                    setattr(row, column, value)
+        db.session.commit()
+
+    def join(self):
+        self._queue.join()
+
+
+class AuditedStore:
+    """Memory/RESP store whose changes are mirrored to SQLite in the background"""
+
+    def __init__(self, backend, audit):
+        self.backend = backend
+        self.audit = audit
+
+    def create(self, kind, key, state):
+        self.backend.create(kind, key, state)
+        self.audit.record(kind, key, state, create=True)
+
+    def get(self, kind, key):
+        return self.backend.get(kind, key)
+
+    def incr_attempts(self, kind, key):
+        attempts = self.backend.incr_attempts(kind, key)
+        if attempts is not None:
+            self.audit.record(kind, key, {"attempts": attempts})
+        return attempts
+
+    def claim(self, kind, key):
+        claimed = self.backend.claim(kind, key)
+        if claimed:
+            self.audit.record(kind, key, {"used": True})
+        return claimed
+
+    def update(self, kind, key, **fields):
+        self.backend.update(kind, key, **fields)
+        self.audit.record(kind, key, fields)
+
+
+_store = None
+_store_lock = threading.Lock()
+_app = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                url = Config.CHALLENGE_STORE
+                if url.startswith("redis://"):
+                    _store = AuditedStore(RespStore(url), AuditWriter(Config.CHALLENGE_AUDIT_BATCH_SIZE))
+                elif url == "memory":
+                    _store = AuditedStore(MemoryStore(), AuditWriter(Config.CHALLENGE_AUDIT_BATCH_SIZE))
+                else:
+                    _store = SqliteStore()
+    return _store
+
+
+def init_app(app):
+    """Remember the app so the audit writer can push an app context"""
+    global _app
+    _app = app
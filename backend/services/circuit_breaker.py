@@ -0,0 +1,212 @@
+"""
+Circuit Breaker Service - Fail fast when an external provider is degraded.
+
+Each breaker keeps a rolling window of call outcomes in time buckets. When
+enough calls in the window fail, or are slower than the provider's slow-call
+threshold, the breaker opens and calls fail immediately with CircuitOpenError
+instead of waiting out timeouts. After CIRCUIT_OPEN_SECONDS it goes half-open
+and lets a few trial calls through: all succeed -> closed, any fails -> open.
+
+State is per worker process; /api/admin/breakers shows this worker's view.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from backend.config import Config
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name, retry_in):
+        super().__init__(f"{name} temporarily unavailable (circuit open, retry in {retry_in:.0f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class _Attempt:
+    __slots__ = ("failed_flag",)
+
+    def __init__(self):
+        self.failed_flag = False
+
+    def fail(self):
+        """Count this call as a failure even though no exception was raised"""
+        self.failed_flag = True
+
+
+class CircuitBreaker:
+    def __init__(self, name, slow_call_seconds, window_seconds=60, buckets=12, min_calls=10,
+                 failure_rate=0.5, slow_call_rate=0.8, open_seconds=30, half_open_calls=3):
+        self.name = name
+        self.slow_call_seconds = slow_call_seconds
+        self.bucket_seconds = window_seconds / buckets
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+
+        self._buckets = [[0, 0, 0, 0] for _ in range(buckets)]  # [bucket id, calls, failures, slow]
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.trips = 0
+        self.rejected = 0
+        self._trials_in_flight = 0
+        self._trial_successes = 0
+
+    # ---- rolling window ----
+
+    def _bucket(self, now):
+        bucket_id = int(now / self.bucket_seconds)
+        bucket = self._buckets[bucket_id % len(self._buckets)]
+        if bucket[0] != bucket_id:
+            bucket[:] = [bucket_id, 0, 0, 0]
+        return bucket
+
+    def _totals(self, now):
+        oldest = int(now / self.bucket_seconds) - len(self._buckets) + 1
+        calls = failures = slow = 0
+        for bucket_id, c, f, s in self._buckets:
+            if bucket_id >= oldest:
+                calls, failures, slow = calls + c, failures + f, slow + s
+        return calls, failures, slow
+
+    def _reset_window(self):
+        for bucket in self._buckets:
+            bucket[:] = [0, 0, 0, 0]
+
+    # ---- state machine ----
+
+    def _trip(self, now):
+        self.state = OPEN
+        self.opened_at = now
+        self.trips += 1
+
+    def before_call(self):
+        """Admit or reject a call; returns True if it is a half-open trial"""
+        now = time.monotonic()
+        with self._lock:
+            if self.state == OPEN:
+                if now - self.opened_at < self.open_seconds:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, self.open_seconds - (now - self.opened_at))
+                self.state = HALF_OPEN
+                self._trials_in_flight = 0
+                self._trial_successes = 0
+            if self.state == HALF_OPEN:
+                if self._trials_in_flight >= self.half_open_calls:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, 1)
+                self._trials_in_flight += 1
+                return True
+            return False
+
+    def record(self, failed, elapsed, trial=False):
+        now = time.monotonic()
+        slow = elapsed >= self.slow_call_seconds
+        with self._lock:
+            if trial:
+                self._trials_in_flight -= 1
+                if self.state != HALF_OPEN:
+                    return
+                if failed or slow:
+                    self._trip(now)
+                else:
+                    self._trial_successes += 1
+                    if self._trial_successes >= self.half_open_calls:
+                        self.state = CLOSED
+                        self._reset_window()
+                return
+
+            bucket = self._bucket(now)
+            bucket[1] += 1
+            bucket[2] += 1 if failed else 0
+            bucket[3] += 1 if slow else 0
+            if self.state != CLOSED:
+                return
+            calls, failures, slow_calls = self._totals(now)
+            if calls >= self.min_calls and (
+                failures / calls >= self.failure_rate or slow_calls / calls >= self.slow_call_rate
+            ):
+                self._trip(now)
+
+    @contextmanager
+    def call(self):
+        """
+        Guard one call. Raises CircuitOpenError when open. An exception in the
+        block, or attempt.fail(), counts as a failure.
+        """
+        trial = self.before_call()
+        attempt = _Attempt()
+        started = time.monotonic()
+        try:
+            yield attempt
+        except Exception:
+            self.record(True, time.monotonic() - started, trial)
+            raise
+        self.record(attempt.failed_flag, time.monotonic() - started, trial)
+
+    def reset(self):
+        with self._lock:
+            self.state = CLOSED
+            self._reset_window()
+
+    def to_dict(self):
+        now = time.monotonic()
+        with self._lock:
+            calls, failures, slow = self._totals(now)
+            state = self.state
+            if state == OPEN and now - self.opened_at >= self.open_seconds:
+                state = HALF_OPEN  # Next call will be a trial
+            return {
+                "name": self.name,
+                "state": state,
+                "window_calls": calls,
+                "window_failures": failures,
+                "window_slow_calls": slow,
+                "failure_rate": round(failures / calls, 3) if calls else 0.0,
+                "slow_call_seconds": self.slow_call_seconds,
+                "open_for_seconds": round(now - self.opened_at, 1) if state != CLOSED else 0,
+                "trips": self.trips,
+                "rejected": self.rejected,
+            }
+
+
+_breakers = {}
+_registry_lock = threading.Lock()
+
+
+def get(name):
+    """Breaker for a provider, created on first use from Config"""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _registry_lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                breaker = _breakers[name] = CircuitBreaker(
+                    name,
+                    slow_call_seconds=Config.CIRCUIT_SLOW_CALL_SECONDS.get(name, 5.0),
+                    window_seconds=Config.CIRCUIT_WINDOW_SECONDS,
+                    min_calls=Config.CIRCUIT_MIN_CALLS,
+                    failure_rate=Config.CIRCUIT_FAILURE_RATE,
+                    slow_call_rate=Config.CIRCUIT_SLOW_CALL_RATE,
+                    open_seconds=Config.CIRCUIT_OPEN_SECONDS,
+                    half_open_calls=Config.CIRCUIT_HALF_OPEN_CALLS
+                )
+    return breaker
+
+
+def all_states():
+    return [_breakers[name].to_dict() for name in sorted(_breakers)]
+
+
+def reset(name):
+    """Force a breaker closed; returns False if no such breaker has been used"""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        return False
+    breaker.reset()
+    return True
@@ -1,6 +1,8 @@
 import cloudinary
 import cloudinary.uploader
 from flask import current_app
+from backend.services import circuit_breaker, metrics, tracing
+from backend.services.circuit_breaker import CircuitOpenError
 
 def init_cloudinary():
     """Initialize Cloudinary with config from Flask app"""
@@ -11,6 +13,7 @@ def init_cloudinary():
         secure=True
     )
 
+@tracing.traced("cloudinary_service.upload_image", tracing.KIND_CLIENT)
 def upload_image(file, folder='doctors'):
     """
     Upload image to Cloudinary
@@ -22,20 +25,26 @@ def upload_image(file, folder='doctors'):
     """
     try:
         # Upload with transformations
-        result = cloudinary.uploader.upload(
-            file,
-            folder=folder,
-            transformation=[
-                {'width': 800, 'height': 800, 'crop': 'limit'},
-                {'quality': 'auto:good'},
-                {'fetch_format': 'auto'}
-            ]
-        )
+        with circuit_breaker.get("cloudinary").call(), \
+                metrics.external_call("cloudinary", "upload") as call:
+            result = cloudinary.uploader.upload(
+                file,
+                folder=folder,
+                transformation=[
+                    {'width': 800, 'height': 800, 'crop': 'limit'},
+                    {'quality': 'auto:good'},
+                    {'fetch_format': 'auto'}
+                ]
+            )
+            call.outcome = "success"
         
         return {
             'url': result.get('secure_url'),
             'public_id': result.get('public_id')
         }
+    except CircuitOpenError as e:
+        current_app.logger.warning(f"Cloudinary upload skipped: {e}")
+        return None
     except Exception as e:
         current_app.logger.error(f"Cloudinary upload error: {e}")
         return None
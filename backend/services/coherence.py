@@ -0,0 +1,168 @@
+"""
+Coherence Service - Keep every worker's doctor caches in step.
+
+Each gunicorn worker caches doctor data in memory, and a write in one
+worker used to leave the others stale. Now every write to doctors also
+appends the doctor ids to doctor_changes, in the same transaction:
+- ORM writes, through an after_flush hook;
+- Core writes, by calling record() before they commit.
+
+Each worker runs a poller thread. Every COHERENCE_POLL_SECONDS it checks
+PRAGMA data_version on its own connection, which changes only when another
+connection has committed, so an idle database costs one pragma. When the
+version moves it reads the doctor_changes rows past the last id it saw and
+hands the doctor ids to the registered caches. Requests never read the log.
+
+    coherence.register("public_profiles", invalidate)  # invalidate(ids), ids=None means "everything"
+
+The worker that made the change hears it immediately, through
+doctor_events; the others hear it within one poll interval. If the log
+has a gap (rows purged while a worker was stalled) or more than
+COHERENCE_MAX_CHANGES changes arrive at once, caches get None and clear
+themselves.
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from itertools import chain
+from sqlalchemy import event, func, insert
+from sqlalchemy.orm import Session
+from backend.config import Config
+from backend.database import db
+from backend.models.doctor import Doctor
+from backend.models.doctor_change import DoctorChange
+from backend.services import doctor_events
+
+logger = logging.getLogger(__name__)
+
+_listeners = {}  # name -> fn(doctor_ids or None)
+_last_id = None
+_watch = None  # Poller's own sqlite3 connection for PRAGMA data_version
+_data_version = None
+_started = False
+_start_lock = threading.Lock()
+stats = {"polls": 0, "skipped": 0, "changes": 0, "full_invalidations": 0, "last_poll_at": None}
+
+
+def register(name, on_change):
+    """Call on_change(doctor_ids) when doctors change; doctor_ids is None if any may have"""
+    _listeners[name] = on_change
+
+
+def _notify(doctor_ids):
+    if doctor_ids is None:
+        stats["full_invalidations"] += 1
+    for name, on_change in list(_listeners.items()):
+        try:
+            on_change(doctor_ids)
+        except Exception:
+            logger.exception(f"Cache invalidation {name} failed")
+
+
+def record(doctor_ids):
+    """Log changed doctors from a Core write; call inside its transaction, before commit"""
+    now = datetime.utcnow()
+    rows = [{"doctor_id": doctor_id, "changed_at": now} for doctor_id in set(doctor_ids)]
+    if rows:
+        db.session.execute(insert(DoctorChange.__table__), rows)
+
+
+@event.listens_for(Session, "after_flush")
+def _log_flush(session, flush_context):
+    """Log doctors written by this flush, in the same transaction"""
+    ids = {
+        instance.id for instance in chain(session.new, session.dirty, session.deleted)
+        if isinstance(instance, Doctor) and (instance not in session.dirty or session.is_modified(instance))
+    }
+    if ids:
+        now = datetime.utcnow()
+        session.connection().execute(insert(DoctorChange.__table__),
+                                     [{"doctor_id": doctor_id, "changed_at": now} for doctor_id in ids])
+
+
+def _on_local_change(doctor_event):
+    _notify({doctor_event.doctor_id})
+
+
+def _database_unchanged():
+    """True if no other connection has committed since the last check (SQLite only)"""
+    global _watch, _data_version
+    url = db.engine.url
+    if url.get_backend_name() != "sqlite" or not url.database or url.database == ":memory:":
+        return False
+    if _watch is None:
+        _watch = sqlite3.connect(url.database, check_same_thread=False)
+    version = _watch.execute("PRAGMA data_version").fetchone()[0]
+    unchanged = version == _data_version
+    _data_version = version
+    return unchanged
+
+
+def poll():
+    """Hand doctor ids changed since the last poll to the caches; returns how many"""
+    global _last_id
+    stats["polls"] += 1
+    stats["last_poll_at"] = time.time()
+    if _last_id is not None and _database_unchanged():
+        stats["skipped"] += 1
+        return 0
+
+    if _last_id is None:
+        # First poll in this worker: start from the end of the log
+        _database_unchanged()
+        _last_id = db.session.query(func.max(DoctorChange.id)).scalar() or 0
+        _notify(None)
+        return 0
+
+    rows = db.session.query(DoctorChange.id, DoctorChange.doctor_id) \
+        .filter(DoctorChange.id > _last_id).order_by(DoctorChange.id) \
+        .limit(Config.COHERENCE_MAX_CHANGES + 1).all()
+    if not rows:
+        return 0
+
+    # AUTOINCREMENT ids have no holes unless rows were purged before we read them
+    gap = rows[0][0] != _last_id + 1
+    if gap or len(rows) > Config.COHERENCE_MAX_CHANGES:
+        _last_id = db.session.query(func.max(DoctorChange.id)).scalar() or _last_id
+        _notify(None)
+    else:
+        _last_id = rows[-1][0]
+        _notify({doctor_id for _, doctor_id in rows})
+    stats["changes"] += len(rows)
+    return len(rows)
+
+
+def _loop(app):
+    while True:
+        try:
+            with app.app_context():
+                poll()
+        except Exception:
+            logger.exception("Coherence poll failed")
+        time.sleep(Config.COHERENCE_POLL_SECONDS)
+
+
+def start(app):
+    """Start this worker's poller (idempotent)"""
+    global _started
+    if _started:
+        return
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+        threading.Thread(target=_loop, args=(app,), name="coherence", daemon=True).start()
+
+
+def init_app(app):
+    """Own changes invalidate at once; the poller starts on each worker's first request (after fork)"""
+    doctor_events.subscribe(_on_local_change)
+
+    def _start_poller():
+        if not _started:
+            start(app)
+
+    app.before_request(_start_poller)
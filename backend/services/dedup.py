@@ -0,0 +1,252 @@
+"""
+Dedup Service - Find doctor rows that are probably the same person.
+
+Doctors arrive from the Excel import, OTP self-registration, magic link and
+Google sign-up, so the same person can end up with several rows. Comparing
+every pair is O(n²); instead every doctor gets a few blocking keys:
+
+- p:<E.164>                 any of their phone numbers
+- n:<phonetic name>         Soundex of each name word, sorted ("Patel Ramesh" == "Ramesh Patel")
+- g:<cell>:<phonetic word>  one per name word, within a ~500 m grid cell
+
+Only doctors sharing a key are scored against each other. Blocks larger than
+DEDUP_MAX_BLOCK_SIZE (everyone imported at the same placeholder coordinates,
+very common names) are skipped rather than exploding into n² pairs. Keys are
+kept in dedup_keys, so a new doctor is checked with one indexed lookup.
+
+Pairs scoring DEDUP_MIN_SCORE or more are stored in duplicate_candidates for
+review at /api/admin/duplicates; dismissed pairs stay dismissed.
+
+    scan_all()              rebuild the index and candidates for the whole table (daily job)
+    check_doctor(id)        incremental check; runs on doctor change events (see init_app)
+"""
+
+import logging
+import math
+import time
+from datetime import datetime
+from difflib import SequenceMatcher
+from itertools import combinations
+from sqlalchemy import delete, func, insert, select
+from backend.config import Config
+from backend.database import db
+from backend.models.dedup_key import DedupKey
+from backend.models.doctor import Doctor
+from backend.models.duplicate_candidate import DuplicateCandidate
+from backend.normalization.phone import normalize_phone
+from backend.services import doctor_events
+
+logger = logging.getLogger(__name__)
+
+TITLES = {"DR", "DOCTOR", "MR", "MRS", "MISS", "PROF", "SMT", "SHRI"}
+FIELDS = ("id", "name", "phone", "phone_e164", "whatsapp", "email", "latitude", "longitude")
+KEY_FIELDS = {"name", "phone", "phone_e164", "whatsapp", "email"}  # Moves are left to the daily scan
+NAME_FLOOR = 0.4  # SequenceMatcher ratio that unrelated names easily reach
+_SOUNDEX_CODES = {c: d for d, letters in {
+    "1": "BFPV", "2": "CGJKQSXZ", "3": "DT", "4": "L", "5": "MN", "6": "R",
+}.items() for c in letters}
+
+
+def soundex(word):
+    """American Soundex ("MOHAMMED" and "MUHAMMAD" -> M530)"""
+    word = "".join(c for c in word.upper() if c.isalpha())
+    if not word:
+        return ""
+    code, last = word[0], _SOUNDEX_CODES.get(word[0])
+    for c in word[1:]:
+        digit = _SOUNDEX_CODES.get(c)
+        if digit and digit != last:
+            code += digit
+        if c not in "HW":  # H and W don't separate equal codes; vowels do
+            last = digit
+    return (code + "000")[:4]
+
+
+def name_words(name):
+    words = "".join(c if c.isalpha() else " " for c in (name or "").upper()).split()
+    return [w for w in words if w not in TITLES and len(w) > 1]
+
+
+def phones(row):
+    numbers = {row["phone_e164"], normalize_phone(row["phone"]), normalize_phone(row["whatsapp"])}
+    return {n for n in numbers if n}
+
+
+def blocking_keys(row):
+    keys = {f"p:{phone}" for phone in phones(row)}
+    codes = sorted({soundex(w) for w in name_words(row["name"])})
+    if codes:
+        keys.add("n:" + " ".join(codes))
+        if row["latitude"] is not None and row["longitude"] is not None:
+            size = Config.DEDUP_GEO_CELL_DEGREES
+            cell = f"{math.floor(row['latitude'] / size)}:{math.floor(row['longitude'] / size)}"
+            keys.update(f"g:{cell}:{code}" for code in codes)
+    return keys
+
+
+def _distance_m(a, b):
+    lat1, lon1, lat2, lon2 = map(math.radians, (a["latitude"], a["longitude"], b["latitude"], b["longitude"]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 12742000 * math.asin(math.sqrt(h))
+
+
+def score(a, b):
+    """
+    0..1 likelihood that rows a and b are the same doctor, with the reasons.
+    A shared phone or email alone isn't enough (clinics share numbers), and
+    name similarity only counts above NAME_FLOOR.
+    """
+    total, reasons = 0.0, []
+    if phones(a) & phones(b):
+        total += 0.35
+        reasons.append("phone")
+    if a["email"] and b["email"] and a["email"].lower() == b["email"].lower():
+        total += 0.35
+        reasons.append("email")
+
+    words_a, words_b = name_words(a["name"]), name_words(b["name"])
+    similarity = SequenceMatcher(None, " ".join(sorted(words_a)), " ".join(sorted(words_b))).ratio()
+    total += 0.4 * max(0.0, (similarity - NAME_FLOOR) / (1 - NAME_FLOOR))
+    if similarity >= 0.85:
+        reasons.append("name")
+    if words_a and {soundex(w) for w in words_a} == {soundex(w) for w in words_b}:
+        total += 0.1
+        reasons.append("phonetic")
+
+    if None not in (a["latitude"], a["longitude"], b["latitude"], b["longitude"]):
+        distance = _distance_m(a, b)
+        if distance <= 200:
+            total += 0.1
+            reasons.append("nearby")
+        elif distance <= 1000:
+            total += 0.05
+            reasons.append("same_area")
+    return min(total, 1.0), reasons
+
+
+def _rows(where=None):
+    statement = select(*(getattr(Doctor, f) for f in FIELDS))
+    if where is not None:
+        statement = statement.where(where)
+    return {row["id"]: row for row in db.session.execute(statement).mappings()}
+
+
+def _save_candidates(found, replace_open_for=None):
+    """
+    Upsert {(a_id, b_id): (score, reasons)}. Open candidates not in found are
+    removed (all of them, or only those involving replace_open_for).
+    """
+    now = datetime.utcnow()
+    query = DuplicateCandidate.query
+    if replace_open_for is not None:
+        query = query.filter((DuplicateCandidate.doctor_a_id == replace_open_for) |
+                             (DuplicateCandidate.doctor_b_id == replace_open_for))
+    existing = {(c.doctor_a_id, c.doctor_b_id): c for c in query}
+
+    for pair, (pair_score, reasons) in found.items():
+        candidate = existing.pop(pair, None)
+        if candidate is None:
+            db.session.add(DuplicateCandidate(doctor_a_id=pair[0], doctor_b_id=pair[1], score=pair_score,
+                                              reasons=",".join(reasons), status="open", updated_at=now))
+        else:
+            candidate.score, candidate.reasons, candidate.updated_at = pair_score, ",".join(reasons), now
+    for candidate in existing.values():
+        if candidate.status == "open":
+            db.session.delete(candidate)  # No longer looks like a duplicate (edited or deleted)
+
+
+def _score_pairs(pairs, rows):
+    found = {}
+    for a_id, b_id in pairs:
+        a, b = rows.get(a_id), rows.get(b_id)
+        if a is None or b is None:
+            continue
+        pair_score, reasons = score(a, b)
+        if pair_score >= Config.DEDUP_MIN_SCORE:
+            found[(a_id, b_id) if a_id < b_id else (b_id, a_id)] = (pair_score, reasons)
+    return found
+
+
+def scan_all():
+    """Rebuild dedup_keys and duplicate_candidates for the whole table"""
+    started = time.perf_counter()
+    rows = _rows()
+    blocks = {}
+    for doctor_id, row in rows.items():
+        for key in blocking_keys(row):
+            blocks.setdefault(key, []).append(doctor_id)
+
+    pairs, oversized = set(), 0
+    for members in blocks.values():
+        if len(members) > Config.DEDUP_MAX_BLOCK_SIZE:
+            oversized += 1
+            continue
+        pairs.update(combinations(sorted(members), 2))
+    found = _score_pairs(pairs, rows)
+
+    db.session.execute(delete(DedupKey))
+    index_rows = [{"key": key, "doctor_id": doctor_id} for key, members in blocks.items() for doctor_id in members]
+    if index_rows:
+        db.session.execute(insert(DedupKey), index_rows)
+    _save_candidates(found)
+    db.session.commit()
+
+    stats = {
+        "doctors": len(rows),
+        "blocks": len(blocks),
+        "oversized_blocks": oversized,
+        "pairs_compared": len(pairs),
+        "all_pairs": len(rows) * (len(rows) - 1) // 2,
+        "candidates": len(found),
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+    logger.info(f"Dedup scan: {stats}")
+    return stats
+
+
+def check_doctor(doctor_id):
+    """Re-index one doctor and score it against its blocks; returns its candidates"""
+    rows = _rows(Doctor.id == doctor_id)
+    row = rows.get(doctor_id)
+    db.session.execute(delete(DedupKey).where(DedupKey.doctor_id == doctor_id))
+    if row is None:
+        _save_candidates({}, replace_open_for=doctor_id)
+        db.session.commit()
+        return []
+
+    keys = blocking_keys(row)
+    if keys:
+        db.session.execute(insert(DedupKey), [{"key": key, "doctor_id": doctor_id} for key in keys])
+        sizes = db.session.execute(
+            select(DedupKey.key, func.count()).where(DedupKey.key.in_(keys)).group_by(DedupKey.key)
+        ).all()
+        usable = [key for key, size in sizes if 1 < size <= Config.DEDUP_MAX_BLOCK_SIZE]
+        others = set(db.session.scalars(
+            select(DedupKey.doctor_id).where(DedupKey.key.in_(usable), DedupKey.doctor_id != doctor_id)
+        )) if usable else set()
+    else:
+        others = set()
+
+    rows.update(_rows(Doctor.id.in_(others)) if others else {})
+    found = _score_pairs(((doctor_id, other) for other in others), rows)
+    _save_candidates(found, replace_open_for=doctor_id)
+    db.session.commit()
+    return [{"doctor_ids": list(pair), "score": s, "reasons": r} for pair, (s, r) in found.items()]
+
+
+def on_doctor_changed(doctor_event):
+    """Re-check a doctor that was created, deleted or had a name/phone/email change"""
+    if doctor_event.kind in (doctor_events.UPDATED, doctor_events.VERIFIED) and not doctor_event.changed & KEY_FIELDS:
+        return
+    try:
+        candidates = check_doctor(doctor_event.doctor_id)
+        if candidates:
+            logger.info(f"Doctor {doctor_event.doctor_id} looks like a duplicate of {len(candidates)} existing doctor(s)")
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def init_app(app):
+    """Checks run off the request path; a missed burst (queue overflow) triggers a full scan"""
+    doctor_events.subscribe(on_doctor_changed, queued=True, on_overflow=scan_all)
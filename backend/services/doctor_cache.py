@@ -0,0 +1,61 @@
+"""
+Doctor Cache - Per-worker cache of public doctor profiles.
+
+/api/doctor/<id> is the most read endpoint after search and its answer
+only changes when the doctor does. to_public_dict() results are kept in an
+LRU of DOCTOR_CACHE_SIZE entries, so repeat views skip the database.
+Entries are dropped through coherence: at once in the worker that wrote
+the change, within COHERENCE_POLL_SECONDS in the others.
+"""
+
+import threading
+from collections import OrderedDict
+from backend.config import Config
+from backend.database import db
+from backend.models.doctor import Doctor
+from backend.services import coherence
+
+_entries = OrderedDict()  # doctor_id -> public dict
+_lock = threading.Lock()
+_generation = 0  # Bumped on every invalidation so a load racing one isn't cached
+stats = {"hits": 0, "misses": 0, "invalidated": 0}
+
+
+def get_public(doctor_id):
+    """to_public_dict() of a doctor (a copy, safe to modify), or None if there is none"""
+    with _lock:
+        payload = _entries.get(doctor_id)
+        if payload is not None:
+            _entries.move_to_end(doctor_id)
+            stats["hits"] += 1
+            return dict(payload)
+        stats["misses"] += 1
+        generation = _generation
+
+    doctor = db.session.get(Doctor, doctor_id)
+    if doctor is None:
+        return None
+    payload = doctor.to_public_dict()
+    with _lock:
+        if generation == _generation:
+            _entries[doctor_id] = payload
+            if len(_entries) > Config.DOCTOR_CACHE_SIZE:
+                _entries.popitem(last=False)
+    return dict(payload)
+
+
+def invalidate(doctor_ids):
+    """Drop cached profiles of doctor_ids (all of them if None)"""
+    global _generation
+    with _lock:
+        _generation += 1
+        if doctor_ids is None:
+            stats["invalidated"] += len(_entries)
+            _entries.clear()
+            return
+        for doctor_id in doctor_ids:
+            if _entries.pop(doctor_id, None) is not None:
+                stats["invalidated"] += 1
+
+
+coherence.register("public_profiles", invalidate)
@@ -0,0 +1,214 @@
+"""
+Doctor Events - In-process change feed for doctors rows.
+
+Caches, indexes and background checks subscribe here instead of every
+write site calling them. ORM writes are captured by session hooks:
+
+- after_flush records which Doctor rows were created, changed or deleted,
+  tagged with the (sub)transaction they were flushed in;
+- a rolled-back savepoint or transaction drops its events;
+- after_commit delivers what's left, once, after the data is durable.
+
+Writes that bypass the ORM (Core executemany in the Excel import, the
+location write-behind) call publish() after their own commit.
+
+Events are DoctorEvent(kind, doctor_id, changed, values):
+
+    created   a new row; values holds its columns
+    updated   changed is the set of columns that changed, values their new values
+    verified  an update that set verified to True (unverifying is an update)
+    deleted   values holds the row as it was loaded
+
+    doctor_events.subscribe(handler)                                   # in the committing thread
+    doctor_events.subscribe(handler, kinds={CREATED}, queued=True,     # on a background thread
+                            on_overflow=rebuild)
+
+Synchronous handlers run right after commit in the thread that committed
+and must not use that session (after_commit can't emit SQL); their
+exceptions are logged, never raised into the write. Queued handlers run on
+a thread with its own app context, fed by a bounded queue
+(DOCTOR_EVENTS_QUEUE_SIZE per subscriber). If the queue overflows, events
+are dropped and on_overflow() is called once the backlog has drained, so
+the subscriber can rebuild from the table instead of missing changes.
+"""
+
+import logging
+import queue
+import threading
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from backend.config import Config
+from backend.models.doctor import Doctor
+
+logger = logging.getLogger(__name__)
+
+CREATED, UPDATED, VERIFIED, DELETED = "created", "updated", "verified", "deleted"
+KINDS = (CREATED, UPDATED, VERIFIED, DELETED)
+
+_PENDING = "doctor_events"  # session.info key: [(transaction, event), ...]
+_COLUMNS = [attr.key for attr in inspect(Doctor).column_attrs]
+
+_subscribers = []
+_app = None
+
+
+class DoctorEvent:
+    __slots__ = ("kind", "doctor_id", "changed", "values")
+
+    def __init__(self, kind, doctor_id, changed=(), values=None):
+        self.kind = kind
+        self.doctor_id = doctor_id
+        self.changed = frozenset(changed)
+        self.values = values or {}
+
+    def __repr__(self):
+        return f"DoctorEvent({self.kind}, {self.doctor_id}, changed={sorted(self.changed)})"
+
+
+class Subscription:
+    """One handler; queued subscriptions own a worker thread and a bounded queue"""
+
+    def __init__(self, handler, kinds=None, queued=False, on_overflow=None):
+        self.handler = handler
+        self.kinds = frozenset(kinds or KINDS)
+        self.queued = queued
+        self.on_overflow = on_overflow
+        self.name = getattr(handler, "__qualname__", repr(handler))
+        self.stats = {"delivered": 0, "failed": 0, "dropped": 0, "overflows": 0}
+        self._overflowed = False
+        self._queue = queue.Queue(maxsize=Config.DOCTOR_EVENTS_QUEUE_SIZE) if queued else None
+        self._started = False
+        self._lock = threading.Lock()
+
+    def deliver(self, doctor_event):
+        if doctor_event.kind not in self.kinds:
+            return
+        if not self.queued:
+            self._call(doctor_event)
+            return
+        self._start()
+        try:
+            self._queue.put_nowait(doctor_event)
+        except queue.Full:
+            self.stats["dropped"] += 1
+            if not self._overflowed:
+                self._overflowed = True
+                logger.warning(f"Doctor event queue full for {self.name}; it will be asked to rebuild")
+
+    def _call(self, doctor_event):
+        try:
+            self.handler(doctor_event)
+            self.stats["delivered"] += 1
+        except Exception:
+            self.stats["failed"] += 1
+            logger.exception(f"Doctor event handler {self.name} failed on {doctor_event}")
+
+    def _start(self):
+        if self._started:
+            return
+        with self._lock:
+            if not self._started:
+                threading.Thread(target=self._drain, name=f"doctor-events:{self.name}", daemon=True).start()
+                self._started = True
+
+    def _drain(self):
+        while True:
+            doctor_event = self._queue.get()
+            with _app.app_context():
+                self._call(doctor_event)
+                if self._overflowed and self._queue.empty():
+                    self._overflowed = False
+                    self.stats["overflows"] += 1
+                    if self.on_overflow is not None:
+                        try:
+                            self.on_overflow()
+                        except Exception:
+                            logger.exception(f"Doctor event rebuild {self.name} failed")
+            self._queue.task_done()
+
+    def join(self):
+        """Wait until every queued event has been handled"""
+        if self._queue is not None:
+            self._queue.join()
+
+
+def subscribe(handler, kinds=None, queued=False, on_overflow=None):
+    """Register handler(event) for the given kinds (default: all). Returns the Subscription."""
+    subscription = Subscription(handler, kinds, queued, on_overflow)
+    _subscribers.append(subscription)
+    return subscription
+
+
+def publish(kind, doctor_id, changed=(), values=None):
+    """Announce a committed change that didn't go through the ORM"""
+    _dispatch([DoctorEvent(kind, doctor_id, changed, values)])
+
+
+def stats():
+    return {s.name: {**s.stats, "queued": s._queue.qsize() if s.queued else 0} for s in _subscribers}
+
+
+def _dispatch(events):
+    for doctor_event in events:
+        for subscription in _subscribers:
+            subscription.deliver(doctor_event)
+
+
+def _loaded(state, keys):
+    return {key: state.dict[key] for key in keys if key in state.dict}
+
+
+@event.listens_for(Session, "after_flush")
+def _capture(session, flush_context):
+    """Record Doctor changes; new/dirty/deleted and attribute history still show the flushed state here"""
+    transaction = session.get_nested_transaction() or session.get_transaction()
+    pending = session.info.setdefault(_PENDING, [])
+    for instance in session.new:
+        if isinstance(instance, Doctor):
+            state = inspect(instance)
+            pending.append((transaction, DoctorEvent(CREATED, instance.id, _COLUMNS, _loaded(state, _COLUMNS))))
+    for instance in session.dirty:
+        if not isinstance(instance, Doctor):
+            continue
+        state = inspect(instance)
+        changed = [key for key in _COLUMNS if state.attrs[key].history.has_changes()]
+        if not changed:
+            continue
+        verified = "verified" in changed and instance.verified and not (state.attrs.verified.history.deleted or [False])[0]
+        pending.append((transaction, DoctorEvent(VERIFIED if verified else UPDATED, instance.id, changed,
+                                                 _loaded(state, changed))))
+    for instance in session.deleted:
+        if isinstance(instance, Doctor):
+            state = inspect(instance)
+            pending.append((transaction, DoctorEvent(DELETED, instance.id, (), _loaded(state, _COLUMNS))))
+
+
+def _within(transaction, ended):
+    while transaction is not None:
+        if transaction is ended:
+            return True
+        transaction = transaction.parent
+    return False
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard(session, previous_transaction):
+    """Forget events flushed inside a rolled-back transaction or savepoint"""
+    pending = session.info.get(_PENDING)
+    if pending:
+        session.info[_PENDING] = [(t, e) for t, e in pending if not _within(t, previous_transaction)]
+
+
+@event.listens_for(Session, "after_commit")
+def _deliver(session):
+    if session.in_nested_transaction():
+        return  # A savepoint was released; the outer transaction can still roll back
+    pending = session.info.pop(_PENDING, None)
+    if pending:
+        _dispatch([doctor_event for _, doctor_event in pending])
+
+
+def init_app(app):
+    """Remember the app so queued subscribers can push an app context"""
+    global _app
+    _app = app
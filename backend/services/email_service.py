@@ -1,58 +1,82 @@
 """
 Email Service - Send magic links and notifications
-Supports dev mode (console logging) and production (SMTP)
+Supports dev mode (console logging) and production (pooled SMTP, optionally queued)
 """
 
 import logging
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
 from backend.config import Config
+from backend.services import tracing, mail_transport
 
 logger = logging.getLogger(__name__)
 
+def _build_message(to_email: str, subject: str, body: str, html_body: str = None):
+    msg = MIMEMultipart('alternative')
+    msg['From'] = Config.MAIL_FROM
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    
+    # Add plain text
+    msg.attach(MIMEText(body, 'plain'))
+    
+    # Add HTML if provided
+    if html_body:
+        msg.attach(MIMEText(html_body, 'html'))
+    
+    return msg
+
+
+def _log_email(to_email: str, subject: str, body: str):
+    """Development mode - log to console"""
+    logger.warning(f"[DEV MODE] Email to {to_email}")
+    print(f"\n{'='*60}")
+    print(f"📧 EMAIL TO: {to_email}")
+    print(f"SUBJECT: {subject}")
+    print(f"{'='*60}")
+    print(body)
+    print(f"{'='*60}\n")
+
+
+@tracing.traced("email_service.send_email", tracing.KIND_CLIENT)
 def send_email(to_email: str, subject: str, body: str, html_body: str = None):
     """
-    Send email via SMTP or log to console in dev mode.
+    Send email via SMTP (pooled connection) or log to console in dev mode.
+    Blocks until the server accepts the message.
     """
     
     if not Config.EMAIL_SERVICE_ENABLED:
-        # Development mode - log to console
-        logger.warning(f"[DEV MODE] Email to {to_email}")
-        print(f"\n{'='*60}")
-        print(f"📧 EMAIL TO: {to_email}")
-        print(f"SUBJECT: {subject}")
-        print(f"{'='*60}")
-        print(body)
-        print(f"{'='*60}\n")
+        _log_email(to_email, subject, body)
         return True, "Email logged (dev mode)"
     
-    # Production mode - send via SMTP
+    # Production mode - send over a pooled SMTP connection
     try:
-        import smtplib
-        from email.mime.text import MIMEText
-        from email.mime.multipart import MIMEMultipart
-        
-        msg = MIMEMultipart('alternative')
-        msg['From'] = Config.SMTP_USER
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        
-        # Add plain text
-        msg.attach(MIMEText(body, 'plain'))
-        
-        # Add HTML if provided
-        if html_body:
-            msg.attach(MIMEText(html_body, 'html'))
-        
-        # Send via SMTP
-        with smtplib.SMTP(Config.SMTP_HOST, Config.SMTP_PORT) as server:
-            server.starttls()
-            server.login(Config.SMTP_USER, Config.SMTP_PASSWORD)
-            server.send_message(msg)
-        
-        return True, "Email sent"
-        
+        success, error = mail_transport.get_pool().send(_build_message(to_email, subject, body, html_body))
     except Exception as e:
-        logger.error(f"Failed to send email: {str(e)}")
-        return False, f"Email failed: {str(e)}"
+        success, error = False, str(e)
+    
+    if not success:
+        logger.error(f"Failed to send email: {error}")
+        return False, f"Email failed: {error}"
+    
+    return True, "Email sent"
+
+
+def queue_email(to_email: str, subject: str, body: str, html_body: str = None):
+    """
+    Queue email for background delivery and return immediately.
+    Delivery failures are logged by the mail queue, not returned.
+    """
+    
+    if not Config.EMAIL_SERVICE_ENABLED:
+        _log_email(to_email, subject, body)
+        return True, "Email logged (dev mode)"
+    
+    if not mail_transport.get_queue().put(_build_message(to_email, subject, body, html_body)):
+        logger.error(f"Mail queue full, could not queue email to {to_email}")
+        return False, "Email service busy. Please try again shortly."
+    
+    return True, "Email queued"
 
 
 def send_magic_link(email: str, magic_link_url: str):
@@ -113,4 +137,4 @@ SAMD Directory Team
 </html>
 """
     
-    return send_email(email, subject, body, html_body)
+    return queue_email(email, subject, body, html_body)
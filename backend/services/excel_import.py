@@ -0,0 +1,387 @@
+"""
+Excel Import - Load the association's member sheet into doctors in chunks.
+
+The sheet is streamed with openpyxl's read-only reader (or pandas' CSV
+chunker), CHUNK_ROWS rows at a time. Each chunk is normalized column-wise:
+phones with normalize_phone_series(), qualifications once per distinct value.
+The rows are then written with one executemany INSERT and committed, so
+memory stays bounded by the chunk size and not by the length of the sheet.
+
+sync_doctors() re-imports an updated sheet without the delete-and-reload:
+rows are matched on (normalized phone, name), compared by a hash of the
+columns the sheet owns, and only the inserts/updates/deletes are applied.
+Both keep only the first sheet row per match key, so a sync right after an
+import changes nothing. Rows an admin has edited are never touched, and
+extra table rows sharing a key are reported, not deleted.
+
+Both write with Core executemany, so they log the changed ids for other
+workers' caches (coherence.record) in each transaction and publish the doctor
+change events themselves once it has committed.
+
+Run: python -m backend.seed [--dry-run] [path-to-xlsx-or-csv]
+"""
+
+import hashlib
+import logging
+import os
+import time
+import uuid
+from itertools import chain
+import pandas as pd
+from sqlalchemy import bindparam, delete, insert, literal_column, select, update
+from backend.database import db
+from backend.models.doctor import Doctor
+from backend.models.doctor_identity import DoctorIdentity
+from backend.normalization.phone import normalize_phone, normalize_phone_series
+from backend.normalization.qualification import normalize_qualification
+from backend.services import coherence, doctor_events
+
+logger = logging.getLogger(__name__)
+
+CHUNK_ROWS = 2000
+
+# Sheet column -> field (headers as exported from the Google Form, trailing spaces included)
+COLUMNS = {
+    "1. Name": "name",
+    "4. Qualification ": "qualification",
+    "9. Mobile Number": "mobile",
+    "10. Clinic's address ": "address",
+}
+
+# Same defaults the row-by-row importer used
+DEFAULTS = {
+    "experience_years": 5,
+    "rating": 4.5,
+    "review_count": 0,
+    "verified": True,  # All from Excel are verified
+    "city": "Surat",
+    "latitude": 21.1702,  # Surat center
+    "longitude": 72.8311,
+    "profile_photo_url": "https://via.placeholder.com/150",
+}
+
+
+def _cell(value):
+    """Excel stores phone numbers as floats; 9876543210.0 -> '9876543210'"""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return value
+
+
+def _xlsx_chunks(path, chunk_rows):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(h) if h is not None else "" for h in next(rows, ())]
+        wanted = [(i, h) for i, h in enumerate(header) if h in COLUMNS]
+        buffer = []
+        for row in rows:
+            buffer.append([_cell(row[i]) if i < len(row) else None for i, _ in wanted])
+            if len(buffer) >= chunk_rows:
+                yield pd.DataFrame(buffer, columns=[h for _, h in wanted], dtype=object)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=[h for _, h in wanted], dtype=object)
+    finally:
+        workbook.close()
+
+
+def _csv_chunks(path, chunk_rows):
+    yield from pd.read_csv(path, dtype=str, chunksize=chunk_rows, usecols=lambda c: c in COLUMNS)
+
+
+def read_chunks(path, chunk_rows=CHUNK_ROWS):
+    """DataFrames of at most chunk_rows rows, holding only the columns we import"""
+    if path.lower().endswith(".csv"):
+        return _csv_chunks(path, chunk_rows)
+    return _xlsx_chunks(path, chunk_rows)
+
+
+def _text(frame, column):
+    """Stripped string column, NA where the cell is empty or missing"""
+    if column not in frame:
+        return pd.Series(pd.NA, index=frame.index, dtype="string")
+    values = frame[column].astype("string").str.strip()
+    return values.mask(values.isin(["", "nan"]))
+
+
+def build_rows(frame, specialty_cache):
+    """Normalize one chunk into Doctor insert mappings; returns (rows, skipped)"""
+    frame = frame.rename(columns=COLUMNS)
+    names = _text(frame, "name")
+    keep = names.notna()
+    frame, names = frame[keep], names[keep]
+
+    mobiles = normalize_phone_series(_text(frame, "mobile"))
+    addresses = _text(frame, "address")
+    qualifications = _text(frame, "qualification").fillna("")
+
+    # A sheet has a few hundred distinct qualification strings; normalize each once
+    for value in qualifications.unique():
+        if value not in specialty_cache:
+            specialty_cache[value] = normalize_qualification(value)
+    specialties = qualifications.map(specialty_cache)
+
+    chunk = pd.DataFrame({
+        "name": names,
+        "specialty": specialties,
+        "phone": mobiles,
+        "whatsapp": mobiles,
+        "area": addresses.str[:100].fillna("Surat"),
+        "clinic_name": addresses.fillna(names + "'s Clinic"),
+    })
+    rows = chunk.astype(object).where(chunk.notna(), None).to_dict("records")
+    for row in rows:
+        row.update(DEFAULTS, id=str(uuid.uuid4()))
+    return rows, int((~keep).sum())
+
+
+def peak_memory_mb():
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux), or None where unavailable (Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def format_mb(mb):
+    return "n/a" if mb is None else f"{mb:.0f} MB"
+
+
+def row_key(phone, name):
+    """Match key: normalized phone plus case/space-folded name"""
+    return (phone or "", " ".join((name or "").split()).casefold())
+
+
+def first_per_key(rows, seen, report):
+    """Drop rows whose key an earlier sheet row already had (counted in report["source_duplicates"])"""
+    unique = []
+    for row in rows:
+        key = row_key(row["phone"], row["name"])
+        if key in seen:
+            report["source_duplicates"] += 1
+            continue
+        seen[key] = row
+        unique.append(row)
+    return unique
+
+
+def import_doctors(path, chunk_rows=CHUNK_ROWS):
+    """Stream path into the doctors table, one transaction per chunk. Returns a report dict."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+
+    report = {"inserted": 0, "skipped": 0, "source_duplicates": 0, "chunks": 0,
+              "read_seconds": 0.0, "write_seconds": 0.0}
+    specialty_cache = {}
+    seen = {}
+    started = time.perf_counter()
+    chunks = read_chunks(path, chunk_rows)
+
+    while True:
+        t0 = time.perf_counter()
+        frame = next(chunks, None)
+        if frame is None:
+            break
+        rows, skipped = build_rows(frame, specialty_cache)
+        rows = first_per_key(rows, seen, report)
+        t1 = time.perf_counter()
+        try:
+            if rows:
+                db.session.execute(insert(Doctor.__table__), rows)
+                coherence.record(row["id"] for row in rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            logger.exception(f"Chunk {report['chunks'] + 1} failed; {report['inserted']} rows already committed")
+            raise
+        for row in rows:
+            doctor_events.publish(doctor_events.CREATED, row["id"], row.keys(), row)
+        t2 = time.perf_counter()
+
+        report["inserted"] += len(rows)
+        report["skipped"] += skipped
+        report["chunks"] += 1
+        report["read_seconds"] += t1 - t0
+        report["write_seconds"] += t2 - t1
+        elapsed = t2 - started
+        print(f"  chunk {report['chunks']}: {report['inserted']} rows, "
+              f"{report['inserted'] / elapsed:,.0f} rows/sec, peak {format_mb(peak_memory_mb())}")
+
+    report["seconds"] = time.perf_counter() - started
+    report["rows_per_second"] = report["inserted"] / report["seconds"] if report["seconds"] else 0
+    report["peak_memory_mb"] = peak_memory_mb()
+    return report
+
+
+# Columns the sheet owns. Everything else (coordinates, photo, rating, login
+# identities) belongs to the doctor or to other features and is never touched by a sync.
+SYNCED_FIELDS = ("name", "specialty", "phone", "whatsapp", "area", "clinic_name")
+DELETE_BATCH = 500  # Stay under SQLite's bound-parameter limit
+
+# Columns only an admin changes after an import; a value other than the import's marks the row as admin-edited
+ADMIN_FIELDS = ("verified", "experience_years", "city", "degree", "business_mobile")
+
+
+def row_hash(row):
+    digest = hashlib.blake2b(digest_size=16)
+    for field in SYNCED_FIELDS:
+        value = row.get(field)
+        digest.update(b"\x00" if value is None else str(value).encode())
+        digest.update(b"\x1f")
+    return digest.digest()
+
+
+def _load_source(path, chunk_rows, report):
+    source = {}
+    specialty_cache = {}
+    for frame in read_chunks(path, chunk_rows):
+        rows, skipped = build_rows(frame, specialty_cache)
+        report["skipped"] += skipped
+        first_per_key(rows, source, report)
+    return source
+
+
+def _admin_edited(record):
+    return any(record[f] != DEFAULTS.get(f) for f in ADMIN_FIELDS)
+
+
+def _load_existing():
+    """key -> [(id, hash, fields)] for imported rows, oldest first; keys of doctor- or admin-owned rows"""
+    table = Doctor.__table__
+    columns = [table.c.id, table.c.self_registered, table.c.last_login_at] + \
+              [table.c[f] for f in ADMIN_FIELDS] + [table.c[f] for f in SYNCED_FIELDS]
+    existing, owned = {}, set()
+    for record in db.session.execute(select(*columns).order_by(literal_column("rowid"))).mappings():
+        fields = {f: record[f] for f in SYNCED_FIELDS}
+        key = row_key(normalize_phone(fields["phone"]), fields["name"])
+        if record["self_registered"] or record["last_login_at"] is not None or _admin_edited(record):
+            owned.add(key)  # The doctor or an admin maintains this profile now
+        else:
+            existing.setdefault(key, []).append((record["id"], row_hash(fields), fields))
+    return existing, owned
+
+
+def diff(source, existing, owned):
+    """
+    Split source vs table into inserts, updates (id + changed fields), deleted
+    ids and extra ids: rows that share a key with the row kept for it, left
+    over from earlier double loads. Extras are reported for an admin to merge.
+    """
+    inserts, updates, deletes, extras = [], [], [], []
+    unchanged = 0
+    for key, row in source.items():
+        matches = existing.get(key)
+        if not matches:
+            if key not in owned:
+                inserts.append(row)
+            else:
+                unchanged += 1
+            continue
+        if key in owned:
+            # An owned row already stands for this sheet row
+            extras.extend(extra_id for extra_id, _, _ in matches)
+            unchanged += 1
+            continue
+        doctor_id, current_hash, current = matches[0]  # The oldest copy
+        extras.extend(extra_id for extra_id, _, _ in matches[1:])
+        if row_hash(row) == current_hash:
+            unchanged += 1
+            continue
+        changes = {f: row[f] for f in SYNCED_FIELDS if row[f] != current[f]}
+        updates.append({"_id": doctor_id, **changes, "_before": {f: current[f] for f in changes}})
+    for key, matches in existing.items():
+        if key not in source:
+            deletes.extend(doctor_id for doctor_id, _, _ in matches)
+    return inserts, updates, deletes, extras, unchanged
+
+
+def _apply(inserts, updates, deletes):
+    table = Doctor.__table__
+    if inserts:
+        db.session.execute(insert(table), inserts)
+    # Group updates by the set of changed columns so each group is one executemany
+    groups = {}
+    for change in updates:
+        fields = tuple(sorted(f for f in change if not f.startswith("_")))
+        groups.setdefault(fields, []).append(change)
+    for fields, changes in groups.items():
+        statement = update(table).where(table.c.id == bindparam("_id")).values({f: bindparam(f) for f in fields})
+        db.session.execute(statement, [{"_id": c["_id"], **{f: c[f] for f in fields}} for c in changes])
+    for start in range(0, len(deletes), DELETE_BATCH):
+        batch = deletes[start:start + DELETE_BATCH]
+        db.session.execute(delete(DoctorIdentity.__table__).where(DoctorIdentity.__table__.c.doctor_id.in_(batch)))
+        db.session.execute(delete(table).where(table.c.id.in_(batch)))
+    coherence.record(chain((row["id"] for row in inserts), (change["_id"] for change in updates), deletes))
+
+
+def _publish(inserts, updates, deletes):
+    for row in inserts:
+        doctor_events.publish(doctor_events.CREATED, row["id"], row.keys(), row)
+    for change in updates:
+        values = {f: v for f, v in change.items() if not f.startswith("_")}
+        doctor_events.publish(doctor_events.UPDATED, change["_id"], values.keys(), values)
+    for doctor_id in deletes:
+        doctor_events.publish(doctor_events.DELETED, doctor_id)
+
+
+def sync_doctors(path, dry_run=False, chunk_rows=CHUNK_ROWS):
+    """
+    Bring the doctors table in line with the sheet by applying only the delta,
+    in a single transaction. Self-registered doctors and doctors who have
+    logged in are never updated or deleted, nor are rows an admin has edited
+    (ADMIN_FIELDS). Returns a report dict; with
+    dry_run nothing is written and the report carries sample changes.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+
+    report = {"skipped": 0, "source_duplicates": 0, "timings": {}}
+    timings = report["timings"]
+    started = time.perf_counter()
+
+    source = _load_source(path, chunk_rows, report)
+    t_read = time.perf_counter()
+    timings["read_normalize"] = t_read - started
+
+    existing, owned = _load_existing()
+    t_load = time.perf_counter()
+    timings["load_existing"] = t_load - t_read
+
+    inserts, updates, deletes, extras, unchanged = diff(source, existing, owned)
+    t_diff = time.perf_counter()
+    timings["diff"] = t_diff - t_load
+
+    report.update({
+        "source_rows": len(source),
+        "inserted": len(inserts),
+        "updated": len(updates),
+        "deleted": len(deletes),
+        "unchanged": unchanged,
+        "extra_matches": len(extras),
+        "dry_run": dry_run,
+    })
+
+    if dry_run:
+        report["samples"] = {
+            "insert": [{f: row[f] for f in ("name", "phone", "specialty")} for row in inserts[:5]],
+            "update": [{"id": c["_id"], "before": c["_before"],
+                        "after": {f: v for f, v in c.items() if not f.startswith("_")}} for c in updates[:5]],
+            "delete": deletes[:5],
+            "extra": extras[:5],
+        }
+    else:
+        try:
+            _apply(inserts, updates, deletes)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        _publish(inserts, updates, deletes)
+    timings["apply"] = time.perf_counter() - t_diff
+    timings["total"] = time.perf_counter() - started
+    report["peak_memory_mb"] = peak_memory_mb()
+    return report
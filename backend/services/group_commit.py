@@ -0,0 +1,199 @@
+"""
+Group Commit - One writer thread per worker, one transaction per tick.
+
+SQLite allows a single writer. When every request commits on its own, a
+burst of sign-ups, OTP requests and profile edits turns into threads
+queueing on the file lock, and the ones that wait past the busy timeout
+fail with "database is locked".
+
+Instead, request threads hand a write unit to run():
+
+    doctor_id = group_commit.run(lambda session: _create_doctor(session, data))
+
+The writer thread collects the units that arrive within
+GROUP_COMMIT_WINDOW_MS (at most GROUP_COMMIT_MAX_BATCH), opens one
+BEGIN IMMEDIATE transaction, runs each unit in its own savepoint and
+commits once. Every caller is then woken with its unit's return value, or
+its exception: a failing unit only rolls back its savepoint, the rest of
+the batch still commits. If the commit itself fails the whole batch fails.
+
+Rules for units:
+- only touch the session they are given (they may run again if the lock
+  is busy), and return plain values such as ids, not ORM objects;
+- the calling request's own session must not hold uncommitted writes.
+
+After run() returns, the caller's session is expired so objects it
+already loaded show the committed state. With GROUP_COMMIT_ENABLED off,
+run() executes and commits the unit inline, as before.
+"""
+
+import logging
+import queue
+import threading
+import time
+from flask import has_app_context
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from backend.config import Config
+from backend.database import db
+
+logger = logging.getLogger(__name__)
+
+_queue = queue.Queue()
+_writer = None
+_writer_lock = threading.Lock()
+_app = None
+stats = {"units": 0, "failed_units": 0, "transactions": 0, "failed_transactions": 0,
+         "lock_retries": 0, "largest_batch": 0, "timeouts": 0}
+
+
+class _Unit:
+    """A submitted write and, once run, its outcome"""
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.result = None
+        self.error = None
+        self.state = "queued"  # queued -> running -> done, or queued -> cancelled
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+
+    def start(self):
+        with self.lock:
+            if self.state != "queued":
+                return False
+            self.state = "running"
+            return True
+
+    def cancel(self):
+        """Give up on a unit the writer hasn't picked up yet"""
+        with self.lock:
+            if self.state != "queued":
+                return False
+            self.state = "cancelled"
+            return True
+
+
+def run(fn):
+    """
+    Run fn(session) in the writer's next transaction and return its result.
+    Raises whatever fn raised, or the commit error.
+    """
+    if not Config.GROUP_COMMIT_ENABLED or _app is None:
+        return _run_inline(fn)
+    if threading.current_thread() is _writer:
+        # A unit calling run() joins the transaction it is already in
+        with db.session.begin_nested():
+            return fn(db.session)
+
+    _ensure_writer()
+    unit = _Unit(fn)
+    _queue.put(unit)
+    if not unit.done.wait(Config.GROUP_COMMIT_TIMEOUT_SECONDS):
+        if unit.cancel():
+            stats["timeouts"] += 1
+            raise TimeoutError("Write was not committed in time, please retry")
+        unit.done.wait()  # Already running: its outcome is moments away
+
+    if has_app_context():
+        db.session.expire_all()
+    if unit.error is not None:
+        raise unit.error
+    return unit.result
+
+
+def _run_inline(fn):
+    """The per-request commit the writer replaces"""
+    try:
+        result = fn(db.session)
+        db.session.commit()
+        return result
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def _ensure_writer():
+    global _writer
+    if _writer is not None:
+        return
+    with _writer_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_loop, name="group-commit", daemon=True)
+            _writer.start()
+
+
+def _next_batch():
+    units = [_queue.get()]
+    deadline = time.monotonic() + Config.GROUP_COMMIT_WINDOW_MS / 1000
+    while len(units) < Config.GROUP_COMMIT_MAX_BATCH:
+        remaining = deadline - time.monotonic()
+        try:
+            units.append(_queue.get(timeout=remaining) if remaining > 0 else _queue.get_nowait())
+        except queue.Empty:
+            break
+    return [unit for unit in units if unit.start()]
+
+
+def _loop():
+    while True:
+        units = _next_batch()
+        if not units:
+            continue
+        try:
+            with _app.app_context():
+                _commit(units)
+        except Exception as e:
+            logger.exception("Group commit writer failed")
+            for unit in units:
+                unit.result, unit.error = None, e
+        for unit in units:
+            unit.state = "done"
+            unit.done.set()
+
+
+def _commit(units):
+    """Run units in savepoints of one transaction, retrying while the file is locked"""
+    session = db.session
+    immediate = db.engine.dialect.name == "sqlite"
+    for attempt in range(Config.GROUP_COMMIT_LOCK_RETRIES + 1):
+        try:
+            if immediate:
+                # Take the write lock up front (pysqlite would otherwise let the
+                # first savepoint's release commit on its own)
+                session.execute(text("BEGIN IMMEDIATE"))
+            for unit in units:
+                try:
+                    with session.begin_nested():
+                        unit.result, unit.error = unit.fn(session), None
+                except Exception as e:
+                    unit.result, unit.error = None, e
+            session.commit()
+        except OperationalError as e:
+            session.rollback()
+            if "locked" in str(e) and attempt < Config.GROUP_COMMIT_LOCK_RETRIES:
+                stats["lock_retries"] += 1
+                time.sleep(0.05 * 2 ** attempt)
+                continue
+            error = e
+        except Exception as e:
+            session.rollback()
+            error = e
+        else:
+            stats["transactions"] += 1
+            stats["units"] += len(units)
+            stats["failed_units"] += sum(1 for unit in units if unit.error is not None)
+            stats["largest_batch"] = max(stats["largest_batch"], len(units))
+            return
+
+        logger.error(f"Group commit of {len(units)} writes failed: {error}")
+        stats["failed_transactions"] += 1
+        for unit in units:
+            unit.result, unit.error = None, error
+        return
+
+
+def init_app(app):
+    """Remember the app so the writer thread can push an app context"""
+    global _app
+    _app = app
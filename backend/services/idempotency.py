@@ -0,0 +1,218 @@
+"""
+Idempotency Service - Replay stored responses for retried POSTs.
+
+Clients send an `Idempotency-Key` header (e.g. a UUID per user action). The
+first request with a key reserves it, runs the view and stores the response
+for IDEMPOTENCY_TTL_SECONDS. A retry with the same key gets the stored
+response back (with `Idempotent-Replayed: true`) without touching the
+database, the rate limits or the SMS gateway.
+
+- Same key, different body -> 422 (the client reused a key by mistake).
+- Same key while the first request is still running -> 409, retry shortly.
+- 5xx and 429 responses aren't stored, so a retry after a server error or
+  a rate limit runs again.
+
+Backends follow IDEMPOTENCY_STORE: 'sqlite' (the rate limiter's SQLite
+file, shared by the workers on this host), 'memory' (per worker) or a
+Redis-protocol URL shared by all workers.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from functools import wraps
+from flask import request, jsonify, make_response, Response
+from backend.config import Config
+from backend.services.rate_limit import RespClient, SqliteClient
+
+logger = logging.getLogger(__name__)
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+
+class MemoryBackend:
+    def __init__(self):
+        self._entries = {}  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+
+    def _live(self, key, now):
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] <= now:
+            del self._entries[key]
+            return None
+        return entry
+
+    def reserve(self, key, value, ttl):
+        """Store value only if key is free; returns True if reserved"""
+        now = time.monotonic()
+        with self._lock:
+            if self._live(key, now) is not None:
+                return False
+            self._entries[key] = (value, now + ttl)
+            if len(self._entries) > 50000:
+                for stale in [k for k, (_, exp) in self._entries.items() if exp <= now]:
+                    del self._entries[stale]
+            return True
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key, time.monotonic())
+            return entry[0] if entry else None
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class SqliteBackend:
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS idempotency_keys (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL);
+    """
+    PRUNE_EVERY = 1000  # Reservations between sweeps of expired keys
+
+    def __init__(self, path):
+        self.client = SqliteClient(path, self.SCHEMA)
+        self._reserved = 0
+
+    def reserve(self, key, value, ttl):
+        now = time.time()
+        self._reserved += 1
+        with self.client.transaction() as conn:
+            if self._reserved % self.PRUNE_EVERY == 0:
+                conn.execute("DELETE FROM idempotency_keys WHERE expires_at <= ?", (now,))
+            else:
+                conn.execute("DELETE FROM idempotency_keys WHERE key = ? AND expires_at <= ?", (key, now))
+            return conn.execute(
+                "INSERT OR IGNORE INTO idempotency_keys (key, value, expires_at) VALUES (?, ?, ?)", (key, value, now + ttl)
+            ).rowcount == 1
+
+    def get(self, key):
+        with self.client.transaction() as conn:
+            row = conn.execute("SELECT value FROM idempotency_keys WHERE key = ? AND expires_at > ?",
+                               (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl):
+        with self.client.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO idempotency_keys (key, value, expires_at) VALUES (?, ?, ?)",
+                         (key, value, time.time() + ttl))
+
+    def delete(self, key):
+        with self.client.transaction() as conn:
+            conn.execute("DELETE FROM idempotency_keys WHERE key = ?", (key,))
+
+
+class RespBackend:
+    def __init__(self, url):
+        self.client = RespClient(url)
+
+    def reserve(self, key, value, ttl):
+        return self.client.execute("SET", key, value, "NX", "PX", int(ttl * 1000)) == "OK"
+
+    def get(self, key):
+        return self.client.execute("GET", key)
+
+    def set(self, key, value, ttl):
+        self.client.execute("SET", key, value, "PX", int(ttl * 1000))
+
+    def delete(self, key):
+        self.client.execute("DEL", key)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                url = Config.IDEMPOTENCY_STORE
+                if url.startswith("redis://"):
+                    _backend = RespBackend(url)
+                elif url == "memory":
+                    logger.warning("IDEMPOTENCY_STORE=memory is per worker: a retry that reaches another "
+                                   "worker runs again. Use sqlite or redis:// with more than one worker.")
+                    _backend = MemoryBackend()
+                else:
+                    _backend = SqliteBackend(Config.RATE_LIMIT_SQLITE_PATH)
+    return _backend
+
+
+def _replay(record):
+    response = Response(record["body"], status=record["status"], mimetype=record["mimetype"])
+    for name, value in record.get("headers", {}).items():
+        response.headers[name] = value
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(scope):
+    """Honour Idempotency-Key on a POST view; scope keeps keys per endpoint"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return view(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return jsonify({"error": f"{HEADER} too long"}), 400
+
+            backend = get_backend()
+            storage_key = f"idem:{scope}:{hashlib.sha256(key.encode()).hexdigest()}"
+            fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+
+            try:
+                reserved = backend.reserve(
+                    storage_key,
+                    json.dumps({"state": "in_flight", "fingerprint": fingerprint}),
+                    Config.IDEMPOTENCY_IN_FLIGHT_SECONDS
+                )
+            except (OSError, ConnectionError, RuntimeError) as e:
+                logger.warning(f"Idempotency store unavailable, running request: {e}")
+                return view(*args, **kwargs)
+
+            if not reserved:
+                stored = backend.get(storage_key)
+                record = json.loads(stored) if stored else None
+                if record is None:
+                    return jsonify({"error": "Request with this key is being retried, try again"}), 409, {"Retry-After": "1"}
+                if record["fingerprint"] != fingerprint:
+                    return jsonify({"error": f"{HEADER} was already used for a different request"}), 422
+                if record["state"] == "in_flight":
+                    return jsonify({"error": "A request with this key is still in progress"}), 409, {"Retry-After": "1"}
+                return _replay(record)
+
+            try:
+                response = make_response(view(*args, **kwargs))
+            except Exception:
+                backend.delete(storage_key)
+                raise
+
+            if response.status_code >= 500 or response.status_code == 429:
+                backend.delete(storage_key)  # Let the retry run again (the rate limit may have reset by then)
+                return response
+
+            record = {
+                "state": "done",
+                "fingerprint": fingerprint,
+                "status": response.status_code,
+                "mimetype": response.mimetype,
+                "body": response.get_data(as_text=True),
+                "headers": {name: response.headers[name] for name in ("Retry-After", "Location") if name in response.headers},
+            }
+            try:
+                backend.set(storage_key, json.dumps(record), Config.IDEMPOTENCY_TTL_SECONDS)
+            except (OSError, ConnectionError, RuntimeError) as e:
+                logger.warning(f"Could not store idempotent response: {e}")
+            return response
+        return wrapper
+    return decorator
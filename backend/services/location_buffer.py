@@ -0,0 +1,159 @@
+"""
+Location Buffer - Write-behind for doctor live-location updates.
+
+Live location sends a fix every few seconds, mostly GPS jitter around the
+same clinic. Instead of one UPDATE + commit per fix:
+
+- moves under LOCATION_MIN_MOVE_METERS from the doctor's current position
+  are dropped;
+- the rest are kept in memory, one entry per doctor (later fixes replace
+  earlier ones);
+- the location_flush job writes the pending positions every
+  LOCATION_FLUSH_SECONDS, LOCATION_FLUSH_BATCH rows per transaction.
+
+Until then reads see the new position through position() / overlay(), used
+by search distance sorting, /api/doctor/me and the public profile. The
+buffer is per worker, so other workers see a move once it is flushed; a
+crash loses at most one interval of fixes, which the next fix replaces.
+A fix is only written over an older last_location_update, so a buffered
+fix never undoes a newer write-through move.
+The flush writes with Core, so it logs the change for other workers' caches
+and publishes the doctor change events itself.
+"""
+
+import atexit
+import logging
+import math
+import threading
+from datetime import datetime
+from sqlalchemy import bindparam, or_, select, update
+from backend.config import Config
+from backend.database import db
+from backend.models.doctor import Doctor
+from backend.services import coherence, doctor_events
+
+logger = logging.getLogger(__name__)
+
+MOVED_FIELDS = ("latitude", "longitude", "last_location_update")
+
+_pending = {}  # doctor_id -> {"latitude", "longitude", "at"}
+_lock = threading.Lock()
+_app = None
+stats = {"received": 0, "ignored": 0, "coalesced": 0, "flushed": 0, "stale": 0, "batches": 0, "errors": 0}
+
+
+def _distance_m(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 12742000 * math.asin(math.sqrt(h))
+
+
+def position(doctor):
+    """(latitude, longitude) including a pending move"""
+    entry = _pending.get(doctor.id)
+    if entry is not None:
+        return entry["latitude"], entry["longitude"]
+    return doctor.latitude, doctor.longitude
+
+
+def pending_ids():
+    """Doctors with a move not yet written"""
+    with _lock:
+        return set(_pending)
+
+
+def overlay(payload):
+    """Apply a pending move to a serialized doctor dict (to_dict / to_public_dict)"""
+    entry = _pending.get(payload.get("id"))
+    if entry is not None:
+        payload["latitude"] = entry["latitude"]
+        payload["longitude"] = entry["longitude"]
+    return payload
+
+
+def submit(doctor, latitude, longitude):
+    """
+    Queue a location fix. Returns 'ignored' for a sub-threshold move,
+    'buffered' otherwise.
+    """
+    with _lock:
+        stats["received"] += 1
+        current_lat, current_lon = position(doctor)
+        if current_lat is not None and current_lon is not None and \
+                _distance_m(current_lat, current_lon, latitude, longitude) < Config.LOCATION_MIN_MOVE_METERS:
+            stats["ignored"] += 1
+            return "ignored"
+        if doctor.id in _pending:
+            stats["coalesced"] += 1
+        _pending[doctor.id] = {"latitude": latitude, "longitude": longitude, "at": datetime.utcnow()}
+        return "buffered"
+
+
+def discard(doctor_id):
+    """Drop a pending move that a direct write has superseded"""
+    with _lock:
+        _pending.pop(doctor_id, None)
+
+
+def flush():
+    """Write pending positions in batched transactions (scheduler job)"""
+    with _lock:
+        if not _pending:
+            return {"flushed": 0}
+        batch = [{"_id": doctor_id, **entry} for doctor_id, entry in _pending.items()]
+        _pending.clear()
+
+    table = Doctor.__table__
+    # A fix never overwrites a newer one: a write-through move or a
+    # registration, in this worker or another, may have landed since it was buffered
+    statement = update(table).where(
+        table.c.id == bindparam("_id"),
+        or_(table.c.last_location_update.is_(None), table.c.last_location_update < bindparam("at")),
+    ).values(
+        latitude=bindparam("latitude"),
+        longitude=bindparam("longitude"),
+        last_location_update=bindparam("at"),
+    )
+    written = 0
+    for start in range(0, len(batch), Config.LOCATION_FLUSH_BATCH):
+        chunk = batch[start:start + Config.LOCATION_FLUSH_BATCH]
+        try:
+            db.session.execute(statement, chunk)
+            # Still inside the write transaction, so this shows exactly which rows took our fix
+            stamped = dict(db.session.execute(
+                select(table.c.id, table.c.last_location_update)
+                .where(table.c.id.in_([entry["_id"] for entry in chunk]))
+            ).all())
+            chunk = [entry for entry in chunk if stamped.get(entry["_id"]) == entry["at"]]
+            coherence.record(entry["_id"] for entry in chunk)
+            db.session.commit()
+            written += len(chunk)
+            stats["stale"] += len(stamped) - len(chunk)
+            stats["batches"] += 1
+            for entry in chunk:
+                doctor_events.publish(doctor_events.UPDATED, entry["_id"], MOVED_FIELDS,
+                                      {"latitude": entry["latitude"], "longitude": entry["longitude"],
+                                       "last_location_update": entry["at"]})
+        except Exception:
+            db.session.rollback()
+            stats["errors"] += 1
+            logger.exception(f"Location flush failed, re-queueing {len(chunk)} updates")
+            with _lock:
+                for entry in chunk:
+                    # Keep a newer fix that arrived meanwhile
+                    _pending.setdefault(entry["_id"], {k: entry[k] for k in ("latitude", "longitude", "at")})
+    stats["flushed"] += written
+    return {"flushed": written, "pending": len(_pending)}
+
+
+def _flush_at_exit():
+    if _app is not None and _pending:
+        with _app.app_context():
+            flush()
+
+
+def init_app(app):
+    """Remember the app so pending fixes are written on a clean shutdown"""
+    global _app
+    _app = app
+    atexit.register(_flush_at_exit)
@@ -0,0 +1,250 @@
+"""
+Mail Transport - Pooled SMTP connections and a batched send queue.
+
+SMTPPool keeps up to SMTP_POOL_SIZE authenticated connections open and hands
+them out one caller at a time. Connections idle longer than
+SMTP_HEALTHCHECK_SECONDS are probed with NOOP before reuse, ones idle past
+SMTP_IDLE_SECONDS are closed (providers drop them anyway), and a send that
+hits a dropped connection reconnects once and retries. A refused recipient
+or message fails only that message and doesn't count against the breaker.
+
+MailQueue drains queued messages in batches: each worker takes up to
+MAIL_BATCH_SIZE messages and sends them all over one pooled connection.
+"""
+
+import logging
+import queue
+import smtplib
+import threading
+import time
+from backend.config import Config
+from backend.services import circuit_breaker, metrics, tracing
+
+logger = logging.getLogger(__name__)
+
+# The server refused this one message (bad recipient, rejected content); the connection is still usable
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+def _connection_lost(exc):
+    """True for a dropped connection. SMTP replies subclass OSError too, so they are excluded."""
+    if isinstance(exc, (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)):
+        return True
+    return isinstance(exc, OSError) and not isinstance(exc, smtplib.SMTPException)
+
+
+class SMTPPool:
+    def __init__(self, host, port, user="", password="", use_tls=True, size=2,
+                 timeout=10, idle_seconds=240, healthcheck_seconds=30):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.idle_seconds = idle_seconds
+        self.healthcheck_seconds = healthcheck_seconds
+        self._idle = queue.LifoQueue()  # (connection, last_used) - reuse the warmest first
+        self._slots = threading.BoundedSemaphore(size)
+        self.stats = {"connects": 0, "reconnects": 0, "healthchecks_failed": 0, "rejected": 0}
+
+    def _connect(self):
+        with tracing.span("smtp.connect", tracing.KIND_CLIENT), \
+                metrics.external_call("smtp", "connect") as call:
+            conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.use_tls:
+                conn.starttls()
+            if self.user:
+                conn.login(self.user, self.password)
+            call.outcome = "success"
+        self.stats["connects"] += 1
+        return conn
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.quit()
+        except Exception:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _healthy(self, conn):
+        try:
+            return conn.noop()[0] == 250
+        except Exception:
+            self.stats["healthchecks_failed"] += 1
+            return False
+
+    def acquire(self):
+        """Take a live connection (blocks while all are in use)"""
+        self._slots.acquire()
+        try:
+            while True:
+                try:
+                    conn, last_used = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                idle = time.monotonic() - last_used
+                if idle > self.idle_seconds:
+                    self._close(conn)
+                elif idle < self.healthcheck_seconds or self._healthy(conn):
+                    return conn
+                else:
+                    self._close(conn)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn, broken=False):
+        if broken:
+            self._close(conn)
+        else:
+            self._idle.put((conn, time.monotonic()))
+        self._slots.release()
+
+    def send_batch(self, messages):
+        """
+        Send messages over one pooled connection.
+        Returns a list of (success, error) in message order. A message the
+        server refuses fails on its own; a connection error fails the rest.
+        Raises CircuitOpenError without connecting while the SMTP breaker is open.
+        """
+        with circuit_breaker.get("smtp").call() as guard:
+            conn = self.acquire()
+            results = []
+            try:
+                for msg in messages:
+                    with tracing.span("smtp.send", tracing.KIND_CLIENT), \
+                            metrics.external_call("smtp", "send") as call:
+                        try:
+                            try:
+                                conn.send_message(msg)
+                            except Exception as e:
+                                if not _connection_lost(e):
+                                    raise
+                                # Server dropped us: reconnect once and retry this message
+                                self._close(conn)
+                                self.stats["reconnects"] += 1
+                                conn = self._connect()
+                                conn.send_message(msg)
+                        except MESSAGE_ERRORS as e:
+                            # Only this message failed; not a provider failure, keep sending
+                            call.outcome = "rejected"
+                            self.stats["rejected"] += 1
+                            results.append((False, str(e)))
+                            continue
+                        call.outcome = "success"
+                    results.append((True, None))
+            except Exception as e:
+                logger.error(f"SMTP batch failed after {len(results)} messages: {e}")
+                guard.fail()
+                self.release(conn, broken=True)
+                return results + [(False, str(e))] * (len(messages) - len(results))
+            self.release(conn)
+            return results
+
+    def send(self, msg):
+        """Send one message; returns (success, error)"""
+        return self.send_batch([msg])[0]
+
+    def close_all(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(conn)
+
+
+class MailQueue:
+    def __init__(self, pool, workers=2, batch_size=20, maxsize=1000):
+        self.pool = pool
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._workers = workers
+        self._started = False
+        self._lock = threading.Lock()
+        self.stats = {"sent": 0, "failed": 0, "batches": 0}
+
+    def put(self, msg):
+        """Queue a message; returns False if the queue is full"""
+        self._start()
+        try:
+            self._queue.put_nowait(msg)
+        except queue.Full:
+            return False
+        return True
+
+    def _start(self):
+        if self._started:
+            return
+        with self._lock:
+            if not self._started:
+                for i in range(self._workers):
+                    threading.Thread(target=self._drain, name=f"mail-queue-{i}", daemon=True).start()
+                self._started = True
+
+    def _drain(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                results = self.pool.send_batch(batch)
+            except Exception as e:
+                logger.error(f"SMTP connect failed, dropped {len(batch)} messages: {e}")
+                results = [(False, str(e))] * len(batch)
+            for msg, (ok, error) in zip(batch, results):
+                if ok:
+                    self.stats["sent"] += 1
+                else:
+                    self.stats["failed"] += 1
+                    logger.error(f"Failed to send email to {msg['To']}: {error}")
+            self.stats["batches"] += 1
+            for _ in batch:
+                self._queue.task_done()
+
+    def join(self):
+        """Block until everything queued so far has been attempted"""
+        self._queue.join()
+
+
+_pool = None
+_mail_queue = None
+_init_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _init_lock:
+            if _pool is None:
+                _pool = SMTPPool(
+                    Config.SMTP_HOST, Config.SMTP_PORT, Config.SMTP_USER, Config.SMTP_PASSWORD,
+                    use_tls=Config.SMTP_USE_TLS,
+                    size=Config.SMTP_POOL_SIZE,
+                    timeout=Config.SMTP_TIMEOUT_SECONDS,
+                    idle_seconds=Config.SMTP_IDLE_SECONDS,
+                    healthcheck_seconds=Config.SMTP_HEALTHCHECK_SECONDS
+                )
+    return _pool
+
+
+def get_queue():
+    global _mail_queue
+    if _mail_queue is None:
+        pool = get_pool()
+        with _init_lock:
+            if _mail_queue is None:
+                _mail_queue = MailQueue(
+                    pool,
+                    workers=Config.SMTP_POOL_SIZE,
+                    batch_size=Config.MAIL_BATCH_SIZE,
+                    maxsize=Config.MAIL_QUEUE_SIZE
+                )
+    return _mail_queue
@@ -0,0 +1,145 @@
+"""
+Maintenance Service - Purge expired auth/OTP rows and keep SQLite tidy.
+
+Rows are deleted in small batches, each in its own short transaction, with a
+pause in between so request threads can take the write lock. After a purge
+the planner statistics are refreshed with ANALYZE every few runs, and free
+pages are returned with incremental vacuum when the database allows it.
+
+Run manually: python -m backend.services.maintenance [--enable-incremental-vacuum]
+"""
+
+import logging
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import inspect, text
+from backend.config import Config
+from backend.database import db
+
+logger = logging.getLogger(__name__)
+
+# table -> WHERE clause selecting rows that are safe to delete.
+# Used/expired rows are kept PURGE_RETENTION_MINUTES for abuse review.
+PURGE_RULES = {
+    "otp_sessions": "(expires_at < :now OR verified = 1) AND created_at < :retain_after",
+    "auth_sessions": "(expires_at < :now OR used = 1) AND created_at < :retain_after",
+    "otps": "expires_at < :now",
+    "revoked_tokens": "expires_at < :now",  # The token is dead anyway
+    "doctor_changes": "changed_at < :retain_after",  # Workers read it within seconds
+}
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_otp_sessions_expires_at ON otp_sessions (expires_at)",
+    "CREATE INDEX IF NOT EXISTS ix_otp_sessions_mobile_created ON otp_sessions (mobile_number, created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_auth_sessions_expires_at ON auth_sessions (expires_at)",
+    "CREATE INDEX IF NOT EXISTS ix_auth_sessions_token_hash ON auth_sessions (token_hash)",
+]
+
+_runs = 0
+last_report = None
+
+
+def ensure_indexes():
+    """Create the indexes purge and token lookups rely on (older DBs lack them)"""
+    existing = set(inspect(db.engine).get_table_names())
+    for statement in INDEXES:
+        table = statement.split(" ON ")[1].split(" ")[0]
+        if table in existing:
+            db.session.execute(text(statement))
+    db.session.commit()
+
+
+def _purge_table(table, where, params, batch_size, pause):
+    """Delete matching rows batch by batch; returns rows deleted"""
+    statement = text(
+        f"DELETE FROM {table} WHERE rowid IN "
+        f"(SELECT rowid FROM {table} WHERE {where} LIMIT :batch_size)"
+    )
+    total = 0
+    while True:
+        result = db.session.execute(statement, {**params, "batch_size": batch_size})
+        db.session.commit()
+        total += result.rowcount
+        if result.rowcount < batch_size:
+            return total
+        time.sleep(pause)
+
+
+def _incremental_vacuum():
+    """Free pages if auto_vacuum=INCREMENTAL; returns pages freed or None"""
+    mode = db.session.execute(text("PRAGMA auto_vacuum")).scalar()
+    if mode != 2:
+        return None
+    before = db.session.execute(text("PRAGMA freelist_count")).scalar()
+    db.session.execute(text(f"PRAGMA incremental_vacuum({Config.PURGE_VACUUM_PAGES})"))
+    db.session.commit()
+    after = db.session.execute(text("PRAGMA freelist_count")).scalar()
+    return before - after
+
+
+def purge_expired(batch_size=None):
+    """
+    Delete expired/used rows from the auth and OTP tables.
+    Returns a report dict with rows purged per table and time taken.
+    """
+    global _runs, last_report
+
+    batch_size = batch_size or Config.PURGE_BATCH_SIZE
+    pause = Config.PURGE_BATCH_PAUSE_MS / 1000.0
+    now = datetime.utcnow()
+    params = {
+        "now": now,
+        "retain_after": now - timedelta(minutes=Config.PURGE_RETENTION_MINUTES),
+    }
+
+    started = time.perf_counter()
+    ensure_indexes()
+    existing = set(inspect(db.engine).get_table_names())
+
+    purged = {}
+    for table, where in PURGE_RULES.items():
+        if table in existing:
+            purged[table] = _purge_table(table, where, params, batch_size, pause)
+    purge_seconds = time.perf_counter() - started
+
+    _runs += 1
+    analyzed = False
+    if _runs % Config.PURGE_ANALYZE_EVERY == 0 or sum(purged.values()) >= 10 * batch_size:
+        db.session.execute(text("ANALYZE"))
+        db.session.commit()
+        analyzed = True
+
+    vacuumed_pages = _incremental_vacuum()
+
+    last_report = {
+        "ran_at": now.isoformat(),
+        "rows_purged": purged,
+        "total_rows_purged": sum(purged.values()),
+        "purge_seconds": round(purge_seconds, 3),
+        "total_seconds": round(time.perf_counter() - started, 3),
+        "analyzed": analyzed,
+        "vacuumed_pages": vacuumed_pages,
+    }
+    logger.info(f"Purged {last_report['total_rows_purged']} rows in {last_report['purge_seconds']}s: {purged}")
+    return last_report
+
+
+def enable_incremental_vacuum():
+    """One-off: switch the DB to auto_vacuum=INCREMENTAL (rewrites the file)"""
+    with db.engine.connect() as conn:
+        conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+        conn.execute(text("VACUUM"))
+
+
+if __name__ == "__main__":
+    import sys
+    from backend.app import app
+
+    with app.app_context():
+        if "--enable-incremental-vacuum" in sys.argv:
+            enable_incremental_vacuum()
+            print("✅ auto_vacuum set to INCREMENTAL")
+        report = purge_expired()
+        print(f"✅ Purged {report['total_rows_purged']} rows in {report['total_seconds']}s")
+        for table, count in report["rows_purged"].items():
+            print(f"   - {table}: {count}")
@@ -0,0 +1,376 @@
+"""
+Metrics Service - Prometheus-format request, DB pool and provider metrics.
+
+Every thread writes into its own shard (a plain dict) so recording a sample
+never takes a shared lock; a scrape sums the shards. When running under
+gunicorn, set PROMETHEUS_MULTIPROC_DIR and each worker periodically flushes
+its totals there so whichever worker answers /metrics reports all of them.
+Files of workers that have exited are folded into one retired-totals file
+and deleted, so restarts don't grow the directory and a reused PID can't
+overwrite a dead worker's counters.
+"""
+
+import json
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from flask import g, request
+from backend.config import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: dead workers' files are read but never folded
+    fcntl = None
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# name -> (type, help, label names)
+METRICS = {
+    "samd_http_requests_total": (
+        "counter", "HTTP requests handled", ("blueprint", "route", "method", "status")),
+    "samd_http_request_duration_seconds": (
+        "histogram", "HTTP request latency", ("blueprint", "route", "method")),
+    "samd_http_requests_in_flight": (
+        "gauge", "HTTP requests currently being handled", ("blueprint",)),
+    "samd_external_calls_total": (
+        "counter", "Calls to external providers", ("provider", "operation", "outcome")),
+    "samd_external_call_duration_seconds": (
+        "histogram", "External provider call latency", ("provider", "operation")),
+}
+
+_local = threading.local()
+_shards = []  # (weakref to owning thread, shard dict)
+_shards_lock = threading.Lock()  # only taken once per thread and on scrape
+_retired = {}  # totals folded in from threads that have exited
+
+
+def _shard():
+    shard = getattr(_local, "shard", None)
+    if shard is None:
+        shard = _local.shard = {}
+        with _shards_lock:
+            _shards.append((weakref.ref(threading.current_thread()), shard))
+    return shard
+
+
+def inc(name, labels, amount=1):
+    """Increment a counter or gauge for the given label values"""
+    shard = _shard()
+    key = (name, labels)
+    shard[key] = shard.get(key, 0) + amount
+
+
+def observe(name, labels, value, buckets=DEFAULT_BUCKETS):
+    """Record one histogram observation"""
+    shard = _shard()
+    key = (name, labels)
+    hist = shard.get(key)
+    if hist is None:
+        # [count per bucket..., +Inf count, sum]
+        hist = shard[key] = [0] * (len(buckets) + 2)
+    for i, bound in enumerate(buckets):
+        if value <= bound:
+            hist[i] += 1
+            break
+    else:
+        hist[len(buckets)] += 1
+    hist[-1] += value
+
+
+def _merge(into, key, value):
+    current = into.get(key)
+    if current is None:
+        into[key] = list(value) if isinstance(value, list) else value
+    elif isinstance(value, list):
+        for i, v in enumerate(value):
+            current[i] += v
+    else:
+        into[key] = current + value
+
+
+def snapshot():
+    """Sum all thread shards of this process into one dict"""
+    totals = {}
+    with _shards_lock:
+        live = []
+        for thread_ref, shard in _shards:
+            items = list(shard.items())
+            if thread_ref() is None or not thread_ref().is_alive():
+                for key, value in items:
+                    _merge(_retired, key, value)
+            else:
+                live.append((thread_ref, shard))
+                for key, value in items:
+                    _merge(totals, key, value)
+        _shards[:] = live
+        for key, value in _retired.items():
+            _merge(totals, key, value)
+    return totals
+
+
+# ==================== EXTERNAL CALLS ====================
+
+class _ExternalCall:
+    __slots__ = ("outcome",)
+
+    def __init__(self):
+        self.outcome = None
+
+
+@contextmanager
+def external_call(provider, operation):
+    """
+    Time a call to an external provider.
+    Set `call.outcome = "success"` (or any other label) inside the block;
+    an exception records "error" and a block that sets nothing records "failure".
+    """
+    call = _ExternalCall()
+    start = time.perf_counter()
+    try:
+        yield call
+    except Exception:
+        if call.outcome is None:
+            call.outcome = "error"
+        raise
+    finally:
+        inc("samd_external_calls_total", (provider, operation, call.outcome or "failure"))
+        observe("samd_external_call_duration_seconds", (provider, operation),
+                time.perf_counter() - start)
+
+
+# ==================== MULTI-PROCESS ====================
+
+def _multiproc_dir():
+    return Config.METRICS_MULTIPROC_DIR
+
+
+RETIRED_FILE = "samd_retired.json"  # Counters and histograms of workers that have exited
+RETIRE_LOCK_FILE = ".samd_retired.lock"
+
+
+def _encode(totals):
+    return [[name, list(labels), value] for (name, labels), value in totals.items()]
+
+
+def _write(path, totals):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(_encode(totals), f)
+    os.replace(tmp_path, path)
+
+
+def _read(path):
+    """Entries of a flushed file, or None if it is gone or unreadable"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (ValueError, OSError):
+        return None
+
+
+def _is_gauge(name):
+    return METRICS.get(name, ("counter",))[0] == "gauge"
+
+
+def flush_to_disk():
+    """Write this process's totals where sibling workers can read them"""
+    directory = _multiproc_dir()
+    if not directory:
+        return
+    _write(os.path.join(directory, f"samd_{os.getpid()}.json"), snapshot())
+
+
+def _retire(directory, filenames):
+    """
+    Fold dead workers' files into the retired totals, then delete them. Runs
+    under a file lock so two workers scraping at once can't fold a file twice.
+    Gauges are dropped: a dead worker has nothing in flight.
+    """
+    with open(os.path.join(directory, RETIRE_LOCK_FILE), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        retired_path = os.path.join(directory, RETIRED_FILE)
+        retired = {}
+        for name, labels, value in _read(retired_path) or []:
+            _merge(retired, (name, tuple(labels)), value)
+        folded = []
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            entries = _read(path)
+            if entries is None:
+                continue  # Already folded by another worker
+            for name, labels, value in entries:
+                if not _is_gauge(name):
+                    _merge(retired, (name, tuple(labels)), value)
+            folded.append(path)
+        if folded:
+            _write(retired_path, retired)
+            for path in folded:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect():
+    """Totals for every worker: live shards here plus flushed sibling files"""
+    totals = snapshot()
+    directory = _multiproc_dir()
+    if not directory or not os.path.isdir(directory):
+        return totals
+
+    own = f"samd_{os.getpid()}.json"
+    dead = []
+    for filename in os.listdir(directory):
+        if not filename.startswith("samd_") or not filename.endswith(".json") or filename in (own, RETIRED_FILE):
+            continue
+        try:
+            pid = int(filename[5:-5])
+        except ValueError:
+            continue
+        alive = _pid_alive(pid)
+        if not alive and fcntl is not None:
+            dead.append(filename)
+            continue
+        for name, labels, value in _read(os.path.join(directory, filename)) or []:
+            # Gauges of dead workers are meaningless; their counters still count
+            if _is_gauge(name) and not alive:
+                continue
+            _merge(totals, (name, tuple(labels)), value)
+
+    if dead:
+        try:
+            _retire(directory, dead)
+        except OSError:
+            pass  # Still in place; folded on a later scrape
+    for name, labels, value in _read(os.path.join(directory, RETIRED_FILE)) or []:
+        _merge(totals, (name, tuple(labels)), value)
+    return totals
+
+
+def _flush_loop(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            flush_to_disk()
+        except OSError:
+            pass
+
+
+# ==================== RENDERING ====================
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _pool_stats():
+    """Connection pool gauges for this process (read at scrape time)"""
+    from backend.database import db
+
+    pool = db.engine.pool
+    stats = {}
+    for attr in ("size", "checkedin", "checkedout", "overflow"):
+        fn = getattr(pool, attr, None)
+        if callable(fn):
+            stats[attr] = fn()
+    return type(pool).__name__, stats
+
+
+def render():
+    """Render all metrics in the Prometheus text exposition format"""
+    totals = collect()
+    by_name = {}
+    for (name, labels), value in totals.items():
+        by_name.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name, (kind, help_text, label_names) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(by_name.get(name, [])):
+            if kind != "histogram":
+                lines.append(f"{name}{_label_str(label_names, labels)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(DEFAULT_BUCKETS + ("+Inf",), value):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{name}_bucket{_label_str(label_names, labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{_label_str(label_names, labels)} {value[-1]}")
+            lines.append(f"{name}_count{_label_str(label_names, labels)} {cumulative}")
+
+    pool_class, pool_stats = _pool_stats()
+    pid = str(os.getpid())
+    for attr, value in pool_stats.items():
+        name = f"samd_db_pool_{attr}"
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f'{name}{{pool="{pool_class}",pid="{pid}"}} {value}')
+
+    return "\n".join(lines) + "\n"
+
+
+# ==================== FLASK HOOKS ====================
+
+def _request_labels():
+    rule = request.url_rule.rule if request.url_rule else "unmatched"
+    return request.blueprint or "app", rule
+
+
+def _before_request():
+    g._metrics_start = time.perf_counter()
+    g._metrics_status = 500
+    inc("samd_http_requests_in_flight", (request.blueprint or "app",))
+
+
+def _after_request(response):
+    g._metrics_status = response.status_code
+    return response
+
+
+def _teardown_request(exc):
+    start = g.pop("_metrics_start", None)
+    if start is None:
+        return
+    blueprint, route = _request_labels()
+    elapsed = time.perf_counter() - start
+    inc("samd_http_requests_in_flight", (blueprint,), -1)
+    inc("samd_http_requests_total", (blueprint, route, request.method, str(g.pop("_metrics_status", 500))))
+    observe("samd_http_request_duration_seconds", (blueprint, route, request.method), elapsed)
+
+
+def init_app(app):
+    """Register request instrumentation and start the multi-process flusher"""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+    directory = _multiproc_dir()
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        own = f"samd_{os.getpid()}.json"
+        if fcntl is not None and os.path.exists(os.path.join(directory, own)):
+            _retire(directory, [own])  # Left by a dead worker with our PID; keep its counters
+        threading.Thread(
+            target=_flush_loop,
+            args=(Config.METRICS_FLUSH_SECONDS,),
+            name="metrics-flush",
+            daemon=True
+        ).start()
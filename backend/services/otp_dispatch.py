@@ -0,0 +1,132 @@
+"""
+OTP Dispatch Service - Send OTPs from a background worker pool.
+
+request-otp persists the session, enqueues the plain OTP here and returns.
+Workers try WhatsApp then SMS, retrying each channel with exponential backoff,
+and record every attempt on the OTP challenge (see challenge_store) so
+clients can poll /api/auth/otp-status/<session_id>. Jobs live in memory only: if the worker
+process dies, the doctor simply requests a new OTP.
+"""
+
+import logging
+import queue
+import random
+import threading
+import time
+from datetime import datetime
+from backend.config import Config
+from backend.services import challenge_store, otp_service, tracing
+
+logger = logging.getLogger(__name__)
+
+_queue = queue.Queue(maxsize=Config.OTP_DISPATCH_QUEUE_SIZE)
+_workers = []
+_workers_lock = threading.Lock()
+_app = None
+
+
+def enqueue(session_id, phone, otp, prefer_whatsapp=True):
+    """
+    Queue an OTP for delivery.
+    Returns False if the queue is full (caller should answer 503).
+    """
+    _ensure_workers()
+    job = tracing.bind(_deliver)
+    try:
+        _queue.put_nowait((job, session_id, phone, otp, prefer_whatsapp))
+    except queue.Full:
+        logger.error("OTP dispatch queue full")
+        return False
+    return True
+
+
+def _record(session_id, **fields):
+    """Update delivery fields on the session; `attempt` is appended to the log"""
+    store = challenge_store.get_store()
+    attempt = fields.pop("attempt", None)
+    if attempt is not None:
+        session = store.get("otp", session_id)
+        if session is None:
+            return
+        fields["delivery_attempts"] = session.get("delivery_attempts", []) + [attempt]
+    store.update("otp", session_id, **fields)
+
+
+def delivery_status(session_id):
+    """Delivery status dict for /api/auth/otp-status, or None for unknown sessions"""
+    session = challenge_store.get_store().get("otp", session_id)
+    if session is None:
+        return None
+    return {
+        "session_id": session_id,
+        "delivery_status": session.get("delivery_status"),
+        "delivery_channel": session.get("delivery_channel"),
+        "attempts": session.get("delivery_attempts", [])
+    }
+
+
+def _backoff(attempt):
+    base = Config.OTP_DISPATCH_BACKOFF_SECONDS * (2 ** (attempt - 1))
+    return base * random.uniform(0.8, 1.2)
+
+
+def _deliver(session_id, phone, otp, prefer_whatsapp):
+    channels = otp_service.delivery_plan(prefer_whatsapp)
+    deadline = time.monotonic() + Config.OTP_EXPIRY_MINUTES * 60
+    _record(session_id, delivery_status="sending")
+
+    with tracing.span("otp_dispatch.deliver", session_id=session_id):
+        for channel in channels:
+            for attempt in range(1, Config.OTP_DISPATCH_RETRIES + 2):
+                started = time.perf_counter()
+                result = otp_service.send_via(channel, phone, otp)
+                _record(session_id, attempt={
+                    "channel": result.get("channel", channel),
+                    "attempt": attempt,
+                    "success": result["success"],
+                    "message": result["message"],
+                    "ms": round((time.perf_counter() - started) * 1000),
+                    "at": datetime.utcnow().isoformat()
+                })
+                if result["success"]:
+                    _record(session_id, delivery_status="sent", delivery_channel=result.get("channel", channel))
+                    return True
+
+                if result.get("circuit_open"):
+                    break  # Channel is failing fast; retrying it now is pointless
+                delay = _backoff(attempt)
+                if attempt > Config.OTP_DISPATCH_RETRIES or time.monotonic() + delay >= deadline:
+                    break
+                time.sleep(delay)
+
+    logger.warning(f"OTP delivery failed on every channel for session {session_id}")
+    _record(session_id, delivery_status="failed")
+    return False
+
+
+def _worker_loop():
+    while True:
+        job, *args = _queue.get()
+        try:
+            with _app.app_context():
+                job(*args)
+        except Exception:
+            logger.exception("OTP dispatch job failed")
+        finally:
+            _queue.task_done()
+
+
+def _ensure_workers():
+    if _workers:
+        return
+    with _workers_lock:
+        while len(_workers) < Config.OTP_DISPATCH_WORKERS:
+            worker = threading.Thread(target=_worker_loop, name=f"otp-dispatch-{len(_workers)}", daemon=True)
+            worker.start()
+            _workers.append(worker)
+
+
+def init_app(app):
+    """Remember the app so worker threads can push an app context"""
+    global _app
+    _app = app
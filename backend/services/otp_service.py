@@ -1,52 +1,196 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 import requests
+from requests.adapters import HTTPAdapter
 from flask import current_app
+from backend.services import circuit_breaker, metrics, tracing
+from backend.services.circuit_breaker import CircuitOpenError
+from backend.normalization.phone import normalize_phone, gateway_number
 
-def send_otp(phone: str, otp: str, prefer_whatsapp: bool = True) -> dict:
-    """
-    Send OTP via WhatsApp using MTalkz API, fallback to SMS.
-    """
-    api_key = current_app.config.get("MTALKZ_API_KEY")
-    sender_id = current_app.config.get("MTALKZ_SENDER_ID", "SAMDDR")
-    
-    if not api_key:
-        print(f"[OTP SIMULATION] Code for {phone}: {otp}")
-        return {"success": True, "message": "OTP simulated (check console)", "simulated": True}
+CHANNELS = ("whatsapp", "sms")
+
+_session = None
+_session_lock = threading.Lock()
+_hedge_pool = None
+
+
+def _gateway_config():
+    return (
+        current_app.config.get("MTALKZ_API_KEY"),
+        current_app.config.get("MTALKZ_SENDER_ID", "SAMDDR"),
+    )
+
+
+def _http():
+    """Shared keep-alive session so repeat sends skip the TCP+TLS handshake"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                pool_size = current_app.config.get("MTALKZ_POOL_SIZE", 10)
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=0)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
 
+
+def _post(path, **kwargs):
+    config = current_app.config
+    url = config.get("MTALKZ_BASE_URL", "https://api.mtalkz.com") + path
+    timeout = (config.get("MTALKZ_CONNECT_TIMEOUT", 3), config.get("MTALKZ_READ_TIMEOUT", 8))
+    return _http().post(url, timeout=timeout, **kwargs)
+
+
+def _format_phone(phone: str) -> str:
+    e164 = normalize_phone(phone)
+    if e164:
+        return gateway_number(e164)
     phone_clean = ''.join(filter(str.isdigit, phone))[-10:]
-    formatted_phone = f"91{phone_clean}"
-
-    # Try WhatsApp first
-    if prefer_whatsapp:
-        try:
-            payload = {
-                "apikey": api_key,
-                "channel": "whatsapp",
-                "to": formatted_phone,
-                "type": "template",
-                "template_name": "otp_verification",
-                "template_params": [otp],
-                "message": f"Your SAMD Directory verification code is: {otp}. Valid for 5 minutes."
-            }
-            resp = requests.post("https://api.mtalkz.com/v2/whatsapp/send", json=payload, timeout=10)
+    return f"91{phone_clean}"
+
+
+def send_whatsapp(phone: str, otp: str) -> dict:
+    """Send OTP once via the MTalkz WhatsApp template API"""
+    api_key, _ = _gateway_config()
+    payload = {
+        "apikey": api_key,
+        "channel": "whatsapp",
+        "to": _format_phone(phone),
+        "type": "template",
+        "template_name": "otp_verification",
+        "template_params": [otp],
+        "message": f"Your SAMD Directory verification code is: {otp}. Valid for 5 minutes."
+    }
+    try:
+        with circuit_breaker.get("mtalkz.whatsapp").call() as guard, \
+                tracing.span("mtalkz.whatsapp", tracing.KIND_CLIENT), \
+                metrics.external_call("mtalkz", "whatsapp") as call:
+            resp = _post("/v2/whatsapp/send", json=payload)
             if resp.status_code == 200 and resp.json().get('status') == 'success':
+                call.outcome = "success"
                 return {"success": True, "message": "OTP sent via WhatsApp"}
-        except Exception as e:
-            print(f"[OTP] WhatsApp failed: {e}")
+            if not 400 <= resp.status_code < 500:
+                guard.fail()  # 4xx is our request (bad number etc.), not gateway health
+            return {"success": False, "message": f"WhatsApp gateway returned HTTP {resp.status_code}"}
+    except CircuitOpenError:
+        return {"success": False, "message": "WhatsApp temporarily unavailable", "circuit_open": True}
+    except Exception as e:
+        print(f"[OTP] WhatsApp failed: {e}")
+        return {"success": False, "message": "WhatsApp request failed"}
+
 
-    # Fallback to SMS
+def send_sms(phone: str, otp: str) -> dict:
+    """Send OTP once via the MTalkz SMS API"""
+    api_key, sender_id = _gateway_config()
+    payload = {
+        "apikey": api_key,
+        "senderid": sender_id,
+        "number": _format_phone(phone),
+        "message": f"Your SAMD Directory OTP is {otp}. Valid for 5 minutes. Do not share.",
+        "format": "json"
+    }
     try:
-        payload = {
-            "apikey": api_key,
-            "senderid": sender_id,
-            "number": formatted_phone,
-            "message": f"Your SAMD Directory OTP is {otp}. Valid for 5 minutes. Do not share.",
-            "format": "json"
-        }
-        resp = requests.post("https://api.mtalkz.com/v2/sendmessage", data=payload, timeout=10)
-        if resp.status_code == 200 and resp.json().get('status') == 'success':
-            return {"success": True, "message": "OTP sent via SMS"}
+        with circuit_breaker.get("mtalkz.sms").call() as guard, \
+                tracing.span("mtalkz.sms", tracing.KIND_CLIENT), \
+                metrics.external_call("mtalkz", "sms") as call:
+            resp = _post("/v2/sendmessage", data=payload)
+            if resp.status_code == 200 and resp.json().get('status') == 'success':
+                call.outcome = "success"
+                return {"success": True, "message": "OTP sent via SMS"}
+            if not 400 <= resp.status_code < 500:
+                guard.fail()  # 4xx is our request (bad number etc.), not gateway health
+            return {"success": False, "message": f"SMS gateway returned HTTP {resp.status_code}"}
+    except CircuitOpenError:
+        return {"success": False, "message": "SMS temporarily unavailable", "circuit_open": True}
     except Exception as e:
         print(f"[OTP] SMS failed: {e}")
+        return {"success": False, "message": "SMS request failed"}
+
+
+def _in_app_context(fn):
+    """Run fn on a pool thread with this app context and trace"""
+    app = current_app._get_current_object()
+
+    def run(*args):
+        with app.app_context():
+            return fn(*args)
+    return tracing.bind(run)
+
+
+def send_hedged(phone: str, otp: str) -> dict:
+    """
+    Send via WhatsApp; if it hasn't confirmed within MTALKZ_HEDGE_MS, also fire
+    SMS and return whichever succeeds first. The doctor may get both messages;
+    that beats waiting out a slow WhatsApp delivery.
+    """
+    global _hedge_pool
+    if _hedge_pool is None:
+        with _session_lock:
+            if _hedge_pool is None:
+                _hedge_pool = ThreadPoolExecutor(
+                    max_workers=current_app.config.get("MTALKZ_POOL_SIZE", 10),
+                    thread_name_prefix="otp-hedge"
+                )
+
+    budget = current_app.config.get("MTALKZ_HEDGE_MS", 1500) / 1000.0
+    pending = {_hedge_pool.submit(_in_app_context(send_whatsapp), phone, otp): "whatsapp"}
+    done, _ = wait(pending, timeout=budget)
+    if done:
+        result = next(iter(done)).result()
+        if result["success"]:
+            return {**result, "channel": "whatsapp"}
+        pending = {}
+
+    pending[_hedge_pool.submit(_in_app_context(send_sms), phone, otp)] = "sms"
+    result = {"success": False, "message": "WhatsApp and SMS failed"}
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            channel = pending.pop(future)
+            outcome = future.result()
+            if outcome["success"]:
+                return {**outcome, "channel": channel}
+    return result
+
+
+def send_via(channel: str, phone: str, otp: str) -> dict:
+    """
+    Single delivery attempt on one channel: 'whatsapp', 'sms', or 'hedged'
+    (WhatsApp with an SMS hedge; the result's "channel" says which delivered).
+    """
+    api_key, _ = _gateway_config()
+    if not api_key:
+        print(f"[OTP SIMULATION] Code for {phone}: {otp}")
+        return {"success": True, "message": "OTP simulated (check console)", "simulated": True}
+
+    if channel == "hedged":
+        return send_hedged(phone, otp)
+    if channel == "whatsapp":
+        return send_whatsapp(phone, otp)
+    return send_sms(phone, otp)
+
+
+def delivery_plan(prefer_whatsapp: bool = True):
+    """Channels to try in order, honouring MTALKZ_HEDGED"""
+    if not prefer_whatsapp:
+        return ("sms",)
+    if current_app.config.get("MTALKZ_HEDGED"):
+        return ("hedged",)
+    return CHANNELS
+
+
+@tracing.traced("otp_service.send_otp", tracing.KIND_CLIENT)
+def send_otp(phone: str, otp: str, prefer_whatsapp: bool = True) -> dict:
+    """
+    Send OTP via WhatsApp using MTalkz API, fallback to SMS.
+    Synchronous; request handlers use otp_dispatch.enqueue() instead.
+    """
+    for channel in delivery_plan(prefer_whatsapp):
+        result = send_via(channel, phone, otp)
+        if result["success"]:
+            return result
 
     print(f"[OTP FAILED] Code for {phone}: {otp}")
     return {"success": False, "message": "Failed to send OTP"}
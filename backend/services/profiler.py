@@ -0,0 +1,153 @@
+"""
+Profiler Service - Statistical stack sampling of live requests.
+
+A fraction of requests (PROFILE_SAMPLE_RATE, or everything matching during an
+admin-started capture window) is registered with a background sampler thread.
+The sampler periodically grabs the Python stack of each registered request
+thread and counts it as a collapsed stack ("outer;inner;leaf") per route, which
+is the input format flamegraph.pl / speedscope expect.
+"""
+
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from flask import request
+from backend.config import Config
+
+_active = {}  # thread ident -> route of a sampled request in progress
+_stacks = {}  # route -> Counter of collapsed stacks
+_stacks_lock = threading.Lock()
+_wake = threading.Event()
+_sampler = None
+_sampler_lock = threading.Lock()
+
+# Timed capture window started from the admin API
+_capture = {"until": 0.0, "rate": 1.0, "route": None}
+
+
+def _frame_label(frame):
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{frame.f_code.co_name}"
+
+
+def _collapse(frame):
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+
+def _record(route, stack):
+    with _stacks_lock:
+        counts = _stacks.setdefault(route, Counter())
+        if stack not in counts and len(counts) >= Config.PROFILE_MAX_STACKS:
+            stack = "[truncated]"
+        counts[stack] += 1
+
+
+def _sample_loop():
+    interval = Config.PROFILE_INTERVAL_MS / 1000.0
+    own_ident = threading.get_ident()
+    while True:
+        if not _active:
+            _wake.wait()
+            _wake.clear()
+            continue
+        frames = sys._current_frames()
+        for ident, route in list(_active.items()):
+            frame = frames.get(ident)
+            if frame is not None and ident != own_ident:
+                _record(route, _collapse(frame))
+        del frames
+        time.sleep(interval)
+
+
+def _ensure_sampler():
+    global _sampler
+    if _sampler is not None:
+        return
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = threading.Thread(target=_sample_loop, name="profiler-sampler", daemon=True)
+            _sampler.start()
+
+
+def current_rate(route):
+    """Sampling probability for a request to the given route"""
+    if time.time() < _capture["until"]:
+        if _capture["route"] is None or _capture["route"] == route:
+            return _capture["rate"]
+    return Config.PROFILE_SAMPLE_RATE
+
+
+def start_capture(seconds, rate=1.0, route=None):
+    """Sample matching requests at `rate` for the next `seconds` seconds"""
+    _capture.update(until=time.time() + seconds, rate=rate, route=route)
+    _ensure_sampler()
+    return status()
+
+
+def status():
+    """Current sampling configuration and per-route sample counts"""
+    with _stacks_lock:
+        samples = {route: sum(counts.values()) for route, counts in _stacks.items()}
+    remaining = max(0.0, _capture["until"] - time.time())
+    return {
+        "sample_rate": Config.PROFILE_SAMPLE_RATE,
+        "interval_ms": Config.PROFILE_INTERVAL_MS,
+        "capture": {
+            "active": remaining > 0,
+            "seconds_remaining": round(remaining, 1),
+            "rate": _capture["rate"],
+            "route": _capture["route"],
+        },
+        "in_flight": len(_active),
+        "samples": samples,
+    }
+
+
+def collapsed_stacks(route=None):
+    """
+    Flame-graph-ready text: one "frame;frame;frame count" line per stack.
+    With no route, stacks from every route are merged under a route root frame.
+    """
+    with _stacks_lock:
+        if route is not None:
+            items = list(_stacks.get(route, Counter()).items())
+        else:
+            items = [(f"{r};{stack}", n) for r, counts in _stacks.items() for stack, n in counts.items()]
+    items.sort(key=lambda item: item[1], reverse=True)
+    return "".join(f"{stack} {count}\n" for stack, count in items)
+
+
+def reset():
+    """Discard all collected samples"""
+    with _stacks_lock:
+        _stacks.clear()
+
+
+# ==================== FLASK HOOKS ====================
+
+def _before_request():
+    route = request.url_rule.rule if request.url_rule else None
+    if route is None:
+        return
+    rate = current_rate(route)
+    if rate > 0 and random.random() < rate:
+        _ensure_sampler()
+        _active[threading.get_ident()] = route
+        _wake.set()
+
+
+def _teardown_request(exc):
+    _active.pop(threading.get_ident(), None)
+
+
+def init_app(app):
+    """Register the request hooks that opt requests into sampling"""
+    app.before_request(_before_request)
+    app.teardown_request(_teardown_request)
@@ -0,0 +1,338 @@
+"""
+Rate Limit Service - Sliding-window limits keyed by phone, email or IP.
+
+Backends, picked by Config.RATE_LIMIT_BACKEND:
+- sqlite (default): exact sliding log per key in a small SQLite file of its
+  own (RATE_LIMIT_SQLITE_PATH), shared by every worker on the host.
+- memory: exact sliding log per key (at most `limit` timestamps), per process.
+  Each worker counts separately, so only use it with a single worker.
+- redis://host:port/db: sliding-window counter over any Redis-protocol server
+  (Redis, or `python -m backend.tools.resp_server` locally), shared by all
+  workers. Uses only INCR/DECR/GET/PEXPIRE so simple stand-ins work.
+
+If the shared backend is unreachable, requests are allowed and a warning is
+logged: a broken limiter must not lock every doctor out of login.
+"""
+
+import hashlib
+import logging
+import math
+import socket
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from flask import jsonify
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """In-process sliding log: exact, O(limit) memory per key"""
+
+    def __init__(self):
+        self._logs = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit, window):
+        """Record a hit; returns (allowed, retry_after_seconds, undo)"""
+        now = time.monotonic()
+        with self._lock:
+            log = self._logs.get(key)
+            if log is None:
+                log = self._logs[key] = deque(maxlen=limit)
+            while log and log[0] <= now - window:
+                log.popleft()
+            if len(log) >= limit:
+                return False, log[0] + window - now, None
+            log.append(now)
+            if len(self._logs) > 100000:
+                self._evict(now, window)
+            return True, 0, lambda: self._undo(key, now)
+
+    def _undo(self, key, stamp):
+        with self._lock:
+            log = self._logs.get(key)
+            if log and stamp in log:
+                log.remove(stamp)
+
+    def _evict(self, now, window):
+        for key in [k for k, log in self._logs.items() if not log or log[-1] <= now - window]:
+            del self._logs[key]
+
+
+class SqliteClient:
+    """
+    One connection per thread to a small SQLite file outside the app
+    database, so limiter writes never queue behind the group-commit writer.
+    """
+
+    def __init__(self, path, schema):
+        self.path = path
+        self.schema = schema
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=Config.RATE_LIMIT_TIMEOUT_SECONDS, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(self.schema)
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """
+        BEGIN IMMEDIATE ... COMMIT, so read-check-write is atomic across
+        processes. SQLite errors surface as RuntimeError, like RESP errors.
+        """
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.Error as e:
+            raise RuntimeError(f"{self.path}: {e}") from e
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            if isinstance(e, sqlite3.Error):
+                raise RuntimeError(f"{self.path}: {e}") from e
+            raise
+
+
+class SqliteBackend:
+    """Sliding log in a shared SQLite file: exact, and the same for every worker"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS rate_limit_hits (key TEXT NOT NULL, at REAL NOT NULL);
+    CREATE INDEX IF NOT EXISTS ix_rate_limit_hits_key_at ON rate_limit_hits (key, at);
+    """
+    PRUNE_EVERY = 1000  # Hits between sweeps of expired rows
+
+    def __init__(self, path):
+        self.client = SqliteClient(path, self.SCHEMA)
+        self._hits = 0
+        self._longest_window = 0
+
+    def hit(self, key, limit, window):
+        """Record a hit; returns (allowed, retry_after_seconds, undo)"""
+        now = time.time()
+        self._hits += 1
+        self._longest_window = max(self._longest_window, window)
+        with self.client.transaction() as conn:
+            if self._hits % self.PRUNE_EVERY == 0:
+                conn.execute("DELETE FROM rate_limit_hits WHERE at <= ?", (now - self._longest_window,))
+            count, oldest = conn.execute(
+                "SELECT COUNT(*), MIN(at) FROM rate_limit_hits WHERE key = ? AND at > ?", (key, now - window)
+            ).fetchone()
+            if count >= limit:
+                return False, oldest + window - now, None
+            rowid = conn.execute("INSERT INTO rate_limit_hits (key, at) VALUES (?, ?)", (key, now)).lastrowid
+        return True, 0, lambda: self._undo(rowid)
+
+    def _undo(self, rowid):
+        with self.client.transaction() as conn:
+            conn.execute("DELETE FROM rate_limit_hits WHERE rowid = ?", (rowid,))
+
+
+class RespError(RuntimeError):
+    """An error reply (-ERR ...); the connection is still usable"""
+
+
+class RespClient:
+    """Minimal Redis-protocol (RESP2) client, one connection per thread"""
+
+    def __init__(self, url):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.password = parsed.password
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=Config.RATE_LIMIT_TIMEOUT_SECONDS)
+        self._local.sock = sock
+        self._local.reader = sock.makefile("rb")
+        try:
+            if self.password:
+                self._send(("AUTH", self.password))
+            if self.db:
+                self._send(("SELECT", self.db))
+        except Exception:
+            self._close()  # Not authenticated / wrong db: don't leave it for the next command
+            raise
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def _read(self):
+        line = self._local.reader.readline()
+        if not line:
+            raise ConnectionError("RESP server closed the connection")
+        prefix, rest = line[:1], line[1:-2]
+        if prefix == b"+":
+            return rest.decode()
+        if prefix == b"-":
+            return RespError(rest.decode())  # Raised by _send once every reply has been read
+        if prefix == b":":
+            return int(rest)
+        if prefix == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self._local.reader.read(length + 2)
+            return data[:-2].decode()
+        if prefix == b"*":
+            count = int(rest)
+            return None if count < 0 else [self._read() for _ in range(count)]
+        raise ConnectionError(f"Bad RESP reply: {line!r}")
+
+    def _send(self, *commands):
+        out = []
+        for command in commands:
+            out.append(f"*{len(command)}\r\n".encode())
+            for arg in command:
+                arg = str(arg).encode()
+                out.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        self._local.sock.sendall(b"".join(out))
+        replies = [self._read() for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+    def pipeline(self, *commands):
+        """
+        Send commands in one round trip; reconnects once on a dropped socket.
+        An error reply raises RespError after all replies are read, so the
+        connection stays in step; any other failure drops the connection.
+        """
+        for attempt in (1, 2):
+            try:
+                if getattr(self._local, "sock", None) is None:
+                    self._connect()
+                return self._send(*commands)
+            except RespError:
+                raise
+            except (OSError, ConnectionError):
+                self._close()
+                if attempt == 2:
+                    raise
+            except Exception:
+                self._close()
+                raise
+
+    def execute(self, *args):
+        return self.pipeline(args)[0]
+
+
+class RespBackend:
+    """Sliding-window counter: previous window weighted by its remaining overlap"""
+
+    def __init__(self, url):
+        self.client = RespClient(url)
+
+    def hit(self, key, limit, window):
+        now = time.time()
+        bucket = int(now // window)
+        weight = 1 - (now % window) / window
+        current_key, previous_key = f"{key}:{bucket}", f"{key}:{bucket - 1}"
+        ttl_ms = int(window * 2000)
+
+        current, _, previous = self.client.pipeline(
+            ("INCR", current_key), ("PEXPIRE", current_key, ttl_ms), ("GET", previous_key)
+        )
+        estimate = (int(previous or 0) * weight) + current
+        if estimate <= limit:
+            return True, 0, lambda: self.client.execute("DECR", current_key)
+
+        self.client.execute("DECR", current_key)  # Rejected hits don't count
+        # Earliest time the weighted previous window decays enough for one more hit
+        previous = int(previous or 0)
+        if previous == 0 or current > limit:
+            return False, (bucket + 1) * window - now, None
+        needed_weight = (limit - current) / previous
+        return False, max((weight - needed_weight) * window, 1), None
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                url = Config.RATE_LIMIT_BACKEND
+                if url.startswith("redis://"):
+                    _backend = RespBackend(url)
+                elif url == "memory":
+                    logger.warning("RATE_LIMIT_BACKEND=memory counts per worker: with N workers every limit "
+                                   "is N times higher. Use sqlite or redis:// with more than one worker.")
+                    _backend = MemoryBackend()
+                else:
+                    _backend = SqliteBackend(Config.RATE_LIMIT_SQLITE_PATH)
+    return _backend
+
+
+def _key(rule, value):
+    digest = hashlib.sha256(str(value).strip().lower().encode()).hexdigest()[:24]
+    return f"rl:{rule}:{digest}"
+
+
+def check(*hits):
+    """
+    Record one hit against each (rule, value) pair, e.g. ("otp:phone", mobile).
+    Rules are looked up in Config.RATE_LIMITS; empty values are skipped.
+    Returns seconds until retry if any limit is exceeded, else None. A
+    rejected request doesn't count against any rule, so a blocked IP can't
+    use up a phone's quota.
+    """
+    backend = get_backend()
+    counted = []
+    for rule, value in hits:
+        if not value:
+            continue
+        limit, window = Config.RATE_LIMITS[rule]
+        try:
+            allowed, retry_after, undo = backend.hit(_key(rule, value), limit, window)
+        except (OSError, ConnectionError, RuntimeError) as e:
+            logger.warning(f"Rate limiter unavailable, allowing request: {e}")
+            return None
+        if not allowed:
+            for undo in counted:
+                try:
+                    undo()
+                except (OSError, ConnectionError, RuntimeError) as e:
+                    logger.warning(f"Could not take back a rate limit hit: {e}")
+            return max(1, math.ceil(retry_after))
+        counted.append(undo)
+    return None
+
+
+def retry_message(retry_after):
+    minutes = max(1, math.ceil(retry_after / 60))
+    return f"Try again in {minutes} minute{'s' if minutes != 1 else ''}."
+
+
+def too_many_requests(retry_after, message="Too many requests."):
+    """Standard 429 response with a Retry-After header"""
+    return (
+        jsonify({"error": f"{message} {retry_message(retry_after)}", "retry_after": retry_after}),
+        429,
+        {"Retry-After": str(retry_after)}
+    )
@@ -0,0 +1,130 @@
+"""
+Token Revocation Service - In-memory JWT denylist kept in sync across workers.
+
+Each worker holds every unexpired revoked jti in memory: a bloom filter in
+front (almost every token checked is not revoked, and a negative answer costs
+a few hashes) and an exact jti -> exp map behind it to rule out false
+positives. Checking a token never touches the database.
+
+Revocations are written to the revoked_tokens table. Every worker loads the
+table once, then picks up new rows by id every REVOCATION_SYNC_SECONDS, so a
+logout on one worker takes effect on the others within a few seconds.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from datetime import datetime
+from backend.config import Config
+from backend.database import db
+from backend.models.revoked_token import RevokedToken
+from backend.services import group_commit
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    def __init__(self, bits, hashes):
+        self.bits = bits
+        self.hashes = hashes
+        self._array = bytearray((bits + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self._array[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        return all(self._array[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+_bloom = BloomFilter(Config.REVOCATION_BLOOM_BITS, Config.REVOCATION_BLOOM_HASHES)
+_revoked = {}  # jti -> token exp (epoch seconds)
+_last_id = 0
+_loaded = False
+_next_prune = 0.0
+_lock = threading.Lock()
+
+
+def _add(jti, expires_at):
+    _revoked[jti] = expires_at
+    _bloom.add(jti)
+
+
+def _rebuild():
+    """Drop expired entries and rebuild the bloom filter without them"""
+    global _bloom
+    now = time.time()
+    for jti in [jti for jti, exp in _revoked.items() if exp <= now]:
+        del _revoked[jti]
+    bloom = BloomFilter(Config.REVOCATION_BLOOM_BITS, Config.REVOCATION_BLOOM_HASHES)
+    for jti in _revoked:
+        bloom.add(jti)
+    _bloom = bloom
+
+
+def sync():
+    """
+    Pull revocations added since the last sync (all of them on first call).
+    Runs on the scheduler in every worker; returns rows picked up.
+    """
+    global _last_id, _loaded, _next_prune
+    rows = db.session.query(RevokedToken.id, RevokedToken.jti, RevokedToken.expires_at) \
+        .filter(RevokedToken.id > _last_id, RevokedToken.expires_at > datetime.utcnow()) \
+        .order_by(RevokedToken.id).all()
+    with _lock:
+        for row_id, jti, expires_at in rows:
+            _add(jti, _epoch(expires_at))
+            _last_id = max(_last_id, row_id)
+        # Expired jtis only waste filter capacity; shed them now and then
+        if time.monotonic() >= _next_prune:
+            _rebuild()
+            _next_prune = time.monotonic() + 3600
+        _loaded = True
+    return len(rows)
+
+
+def _epoch(dt):
+    return (dt - datetime(1970, 1, 1)).total_seconds()
+
+
+def is_revoked(jti):
+    """Constant-time check against the in-memory denylist"""
+    global _loaded
+    if not _loaded:
+        # First check in this worker: load the table once
+        try:
+            sync()
+        except Exception:
+            # Table missing or DB busy: fail open, the scheduled sync retries
+            db.session.rollback()
+            logger.exception("Could not load revoked tokens")
+            _loaded = True
+    if jti not in _bloom:
+        return False
+    return jti in _revoked
+
+
+def revoke(jti, expires_at, doctor_id=None, reason="logout"):
+    """Revoke a token now in this worker and persist it for the others"""
+    if not isinstance(expires_at, datetime):
+        expires_at = datetime.utcfromtimestamp(expires_at)
+    def persist(session):
+        if session.query(RevokedToken).filter_by(jti=jti).first() is None:
+            session.add(RevokedToken(jti=jti, doctor_id=doctor_id, expires_at=expires_at, reason=reason))
+    
+    group_commit.run(persist)
+    with _lock:
+        _add(jti, _epoch(expires_at))
+    logger.info(f"Revoked token {jti[:8]}... for doctor {doctor_id} ({reason})")
+
+
+def stats():
+    return {"revoked": len(_revoked), "last_id": _last_id, "bloom_bits": _bloom.bits}
+
@@ -0,0 +1,159 @@
+"""
+Scheduler Service - Periodic background jobs inside the web process.
+
+Jobs are registered with `every()` and run on one daemon thread inside an app
+context; a job that mustn't wait behind long ones (own_thread=True) gets a
+thread of its own. The thread starts on the first request (so it survives gunicorn's
+fork). Every worker ticks every job; for single_process jobs a per-job lock
+file holds the start time of the last run, and a worker only runs the job
+if, under the lock, no worker has started it within the last interval. So
+the job runs once per interval across all workers, never concurrently.
+"""
+
+import logging
+import os
+import threading
+import time
+from backend.config import Config
+from backend.services import tracing
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: no cross-process locking
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_jobs = {}
+_started = False
+_start_lock = threading.Lock()
+
+
+class Job:
+    def __init__(self, name, seconds, fn, single_process, own_thread=False):
+        self.name = name
+        self.seconds = seconds
+        self.fn = fn
+        self.single_process = single_process
+        self.own_thread = own_thread
+        self.next_run = time.monotonic() + seconds
+        self.last_run_at = None
+        self.last_result = None
+        self.last_error = None
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "interval_seconds": self.seconds,
+            "last_run_at": self.last_run_at,
+            "last_result": self.last_result,
+            "last_error": self.last_error,
+        }
+
+
+def every(name, seconds, fn, single_process=True, own_thread=False):
+    """
+    Run `fn()` every `seconds` seconds.
+    With single_process=True it runs once per interval across all worker
+    processes (whichever worker's tick claims it first); otherwise every
+    worker runs it. With own_thread=True it runs on a dedicated thread, so
+    long jobs (purge, dedup scan, snapshot build) can't delay it.
+    """
+    _jobs[name] = Job(name, seconds, fn, single_process, own_thread)
+
+
+def jobs():
+    return [job.to_dict() for job in _jobs.values()]
+
+
+def _lock_path(name):
+    return os.path.join(Config.SCHEDULER_LOCK_DIR, f".samd-job-{name}.lock")
+
+
+def _claim(lock_file, job):
+    """Under the lock: True (and record the start) unless another worker ran the job this interval"""
+    lock_file.seek(0)
+    try:
+        last_started = float(lock_file.read().strip() or 0)
+    except ValueError:
+        last_started = 0.0
+    now = time.time()
+    # One second of slack: workers' ticks are a second apart at most
+    if now - last_started < job.seconds - 1:
+        return False
+    lock_file.seek(0)
+    lock_file.truncate()
+    lock_file.write(repr(now))
+    lock_file.flush()
+    return True
+
+
+def run_job(app, job):
+    """
+    Run one job now, under its cross-process lock if it has one. A
+    single_process job another worker already ran this interval is skipped.
+    """
+    lock_file = None
+    if job.single_process and fcntl is not None:
+        lock_file = open(_lock_path(job.name), "a+")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None  # Another worker is running it
+        if not _claim(lock_file, job):
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+            return None  # Another worker already ran it this interval
+
+    try:
+        with app.app_context(), tracing.span(f"job.{job.name}"):
+            job.last_result = job.fn()
+            job.last_error = None
+    except Exception as e:
+        logger.exception(f"Scheduled job {job.name} failed")
+        job.last_error = str(e)
+    finally:
+        job.last_run_at = time.time()
+        if lock_file is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+    return job.last_result
+
+
+def _loop(app, jobs):
+    while True:
+        now = time.monotonic()
+        for job in jobs:
+            if now >= job.next_run:
+                job.next_run = now + job.seconds
+                run_job(app, job)
+        time.sleep(1)
+
+
+def start(app):
+    """Start the scheduler thread for this process (idempotent)"""
+    global _started
+    if _started:
+        return
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+        shared = [job for job in _jobs.values() if not job.own_thread]
+        threading.Thread(target=_loop, args=(app, shared), name="scheduler", daemon=True).start()
+        for job in _jobs.values():
+            if job.own_thread:
+                threading.Thread(target=_loop, args=(app, [job]), name=f"scheduler-{job.name}", daemon=True).start()
+
+
+def init_app(app):
+    """Start the scheduler lazily on the first request of each worker"""
+    if not app.config.get("SCHEDULER_ENABLED"):
+        return
+
+    def _start_scheduler():
+        if not _started:
+            start(app)
+
+    app.before_request(_start_scheduler)
@@ -1,4 +1,6 @@
 from backend.models.doctor import Doctor
+from backend.services import location_buffer, search_snapshot, tracing
+import heapq
 import math
 
 def haversine(lat1, lon1, lat2, lon2):
@@ -9,9 +11,9 @@ def haversine(lat1, lon1, lat2, lon2):
         math.cos(math.radians(lat2)) * math.sin(dlon/2)**2
     return R * 2 * math.asin(math.sqrt(a))
 
-def search_doctors(query="", city=None, area=None, specialty=None, limit=50, user_lat=None, user_lng=None):
+def _filtered(query, city, area, specialty):
     q = Doctor.query.filter(Doctor.verified == True)
-    
+
     # Text Search
     if query:
         q = q.filter(
@@ -29,21 +31,78 @@ def search_doctors(query="", city=None, area=None, specialty=None, limit=50, use
     if specialty:
         q = q.filter(Doctor.specialty == specialty)
 
-    doctors = q.all()
-
-    # Distance Sorting
-    if user_lat and user_lng:
-        try:
-             doctors.sort(
-                key=lambda d: haversine(
-                    float(user_lat), float(user_lng), d.latitude, d.longitude
-                ) if d.latitude and d.longitude else float('inf')
-            )
-        except Exception as e:
-            print(f"Error sorting by distance: {e}")
+    return q
 
-    # Rating sort as fallback/secondary is generally good, but for now strict distance if provided
+def _origin(user_lat, user_lng):
     if not (user_lat and user_lng):
-         doctors.sort(key=lambda x: x.rating or 0, reverse=True)
+        return None
+    try:
+        return float(user_lat), float(user_lng)
+    except (TypeError, ValueError) as e:
+        print(f"Error sorting by distance: {e}")
+        return None
+
+def _distance(origin, lat, lng):
+    # NaN (missing in the snapshot) is truthy, so test it explicitly
+    if lat and lng and not (math.isnan(lat) or math.isnan(lng)):
+        return haversine(origin[0], origin[1], lat, lng)
+    return float('inf')
+
+def _rank(results, origin):
+    # Strict distance if a location is given, otherwise best rated first
+    if origin:
+        results.sort(key=lambda d: _distance(origin, d["latitude"], d["longitude"]))
+    else:
+        results.sort(key=lambda d: d["rating"] or 0, reverse=True)
+    return results
+
+@tracing.traced("search_doctors")
+def search_doctors(query="", city=None, area=None, specialty=None, limit=50, user_lat=None, user_lng=None):
+    """
+    Verified doctors matching the filters, as public dicts (contact info masked)
+
+    Served from the shared search snapshot. Doctors changed since it was
+    built, or with a buffered location move, are read from the database
+    instead, so results match the table. Without a usable snapshot the
+    whole search runs against the database.
+    """
+    origin = _origin(user_lat, user_lng)
+    snapshot, changed = search_snapshot.view()
+
+    if snapshot is None:
+        with tracing.span("search.filter"):
+            q = _filtered(query, city, area, specialty)
+        with tracing.span("search.fetch") as fetch_span:
+            # Buffered live-location moves count before they are flushed
+            results = [location_buffer.overlay(d.to_public_dict()) for d in q.all()]
+            fetch_span.set_attribute("search.rows", len(results))
+        with tracing.span("search.sort"):
+            return _rank(results, origin)[:limit]
+
+    changed |= location_buffer.pending_ids()
+    with tracing.span("search.filter") as filter_span:
+        numbers = snapshot.match(query, city, area, specialty)
+        filter_span.set_attribute("search.rows", len(numbers))
+
+    with tracing.span("search.distance"):
+        if origin:
+            # Enough nearest candidates to fill limit after skipping changed doctors
+            ordered = heapq.nsmallest(limit + len(changed), numbers,
+                                      key=lambda n: _distance(origin, snapshot.lat[n], snapshot.lon[n]))
+        else:
+            ordered = numbers  # Snapshot order is rating order
+        results = []
+        for number in ordered:
+            if len(results) == limit:
+                break
+            if snapshot.doctor_id(number) not in changed:
+                results.append(snapshot.payload(number))
+
+    if changed:
+        with tracing.span("search.fetch") as fetch_span:
+            fresh = _filtered(query, city, area, specialty).filter(Doctor.id.in_(changed)).all()
+            results.extend(location_buffer.overlay(d.to_public_dict()) for d in fresh)
+            fetch_span.set_attribute("search.rows", len(fresh))
 
-    return doctors[:limit]
+    with tracing.span("search.sort"):
+        return _rank(results, origin)[:limit]
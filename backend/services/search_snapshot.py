@@ -0,0 +1,375 @@
+"""
+Search Snapshot - A read-only search index file shared by all workers.
+
+Loading and indexing the whole directory in every gunicorn worker would
+multiply memory by the worker count. Instead one worker at a time (the
+search_snapshot_build job, under the scheduler's file lock) writes the
+verified doctors into a single file. It writes a temp file and os.replace()s
+it into SEARCH_SNAPSHOT_PATH, so readers only ever see a complete file.
+Every worker mmap()s the newest file read-only. A cold worker just pages
+the file in, and all workers share the same pages through the OS page cache.
+
+Layout (little-endian, sections 8-byte aligned):
+
+    header    magic, format version, doctor and term counts, built_from (the
+              last doctor_changes id the build saw), built_at, then the
+              (offset, length) of each section below
+    ids       per doctor: (offset, length) of its id in strings
+    fields    per doctor: (offset, length) of name, specialty, area, city and
+              its to_public_dict() as JSON
+    lat, lon, rating    per doctor, float64 (NaN when missing)
+    terms     sorted by term: (term offset, term length, first posting, count)
+    postings  uint32 doctor numbers, ascending
+    strings   UTF-8 string pool, repeated values stored once
+
+Doctors are numbered best rated first, so every postings list is already in
+rating order. Terms are "t:<trigram>" of the lowercased name, specialty and
+area, for ?q= substring search, plus exact "c:<city>", "a:<area>" and
+"s:<specialty>" filter keys.
+
+The file lags the table by up to SEARCH_SNAPSHOT_BUILD_SECONDS. Workers
+hear about doctors changed since built_from through coherence. Search
+reads those few doctors from the database instead of the snapshot (see
+search_service), so results are never stale.
+
+Build one by hand (e.g. at deploy): python -m backend.services.search_snapshot
+"""
+
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from sqlalchemy import func
+from backend.config import Config
+from backend.database import db
+from backend.models.doctor import Doctor
+from backend.models.doctor_change import DoctorChange
+from backend.services import coherence
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"SAMDSRCH"
+FORMAT_VERSION = 1
+SECTIONS = ("ids", "fields", "lat", "lon", "rating", "terms", "postings", "strings")
+FIELDS = ("name", "specialty", "area", "city", "payload")
+TEXT_FIELDS = ("name", "specialty", "area")  # What ?q= matches, as the SQL ilike did
+FILTER_KEYS = (("c:", "city"), ("a:", "area"), ("s:", "specialty"))
+
+_HEADER = struct.Struct("<8sIIIQd")  # magic, version, doctors, terms, built_from, built_at
+_SECTION = struct.Struct("<QQ")  # offset, length
+HEADER_SIZE = _HEADER.size + len(SECTIONS) * _SECTION.size
+
+
+def trigrams(text):
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _uint32s(values):
+    data = array("I", values)
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data.tobytes()
+
+
+def _float64s(values):
+    data = array("d", (math.nan if v is None else float(v) for v in values))
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data.tobytes()
+
+
+# ---- building -------------------------------------------------------------
+
+class _StringPool:
+    def __init__(self):
+        self.data = bytearray()
+        self._seen = {}
+
+    def add(self, text):
+        encoded = (text or "").encode()
+        ref = self._seen.get(encoded)
+        if ref is None:
+            ref = (len(self.data), len(encoded))
+            self.data += encoded
+            self._seen[encoded] = ref
+        return ref
+
+
+def build(path=None):
+    """Write a snapshot of the verified doctors to path, atomically. Returns stats."""
+    path = path or Config.SEARCH_SNAPSHOT_PATH
+    started = time.perf_counter()
+    # Read the log position first: anything committed after it is treated as changed by readers
+    built_from = db.session.query(func.max(DoctorChange.id)).scalar() or 0
+    doctors = Doctor.query.filter(Doctor.verified == True).all()
+    doctors.sort(key=lambda d: d.rating or 0, reverse=True)
+
+    pool = _StringPool()
+    ids, fields, postings = [], [], {}
+    for number, doctor in enumerate(doctors):
+        ids.extend(pool.add(doctor.id))
+        values = {"name": doctor.name, "specialty": doctor.specialty, "area": doctor.area, "city": doctor.city,
+                  "payload": json.dumps(doctor.to_public_dict(), separators=(",", ":"))}
+        for field in FIELDS:
+            fields.extend(pool.add(values[field]))
+        terms = {f"t:{gram}" for field in TEXT_FIELDS for gram in trigrams(values[field] or "")}
+        terms.update(prefix + values[field] for prefix, field in FILTER_KEYS if values[field])
+        for term in terms:
+            postings.setdefault(term, []).append(number)
+
+    term_rows, posting_values = [], []
+    for term in sorted(postings, key=str.encode):
+        offset, length = pool.add(term)
+        term_rows.extend((offset, length, len(posting_values), len(postings[term])))
+        posting_values.extend(postings[term])
+
+    sections = {
+        "ids": _uint32s(ids),
+        "fields": _uint32s(fields),
+        "lat": _float64s(d.latitude for d in doctors),
+        "lon": _float64s(d.longitude for d in doctors),
+        "rating": _float64s(d.rating or 0 for d in doctors),
+        "terms": _uint32s(term_rows),
+        "postings": _uint32s(posting_values),
+        "strings": bytes(pool.data),
+    }
+    table, body, offset = [], bytearray(), HEADER_SIZE
+    for name in SECTIONS:
+        data = sections[name]
+        table.append(_SECTION.pack(offset, len(data)))
+        padding = -len(data) % 8
+        body += data + b"\0" * padding
+        offset += len(data) + padding
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, len(doctors), len(postings), built_from, time.time())
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(header + b"".join(table) + body)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    report = {"doctors": len(doctors), "terms": len(postings), "bytes": offset, "built_from": built_from,
+              "seconds": round(time.perf_counter() - started, 3)}
+    logger.info(f"Search snapshot built: {report}")
+    return report
+
+
+def _built_from(path):
+    """built_from of the snapshot on disk, or None if there is no usable one"""
+    try:
+        with open(path, "rb") as f:
+            magic, version, _, _, built_from, _ = _HEADER.unpack(f.read(_HEADER.size))
+    except (OSError, struct.error):
+        return None
+    return built_from if magic == MAGIC and version == FORMAT_VERSION else None
+
+
+def build_if_stale():
+    """Rebuild if doctors changed since the file on disk was built (scheduler job)"""
+    if not Config.SEARCH_SNAPSHOT_ENABLED:
+        return None
+    latest = db.session.query(func.max(DoctorChange.id)).scalar() or 0
+    built_from = _built_from(Config.SEARCH_SNAPSHOT_PATH)
+    if built_from is not None and built_from >= latest:
+        return None
+    return build()
+
+
+# ---- reading --------------------------------------------------------------
+
+class Snapshot:
+    """A mapped snapshot file. Nothing is copied out of the mapping up front."""
+
+    def __init__(self, path):
+        if sys.byteorder != "little":
+            raise ValueError("search snapshots are little-endian")
+        with open(path, "rb") as f:
+            self.file_key = _file_key(os.fstat(f.fileno()))
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count, self.term_count, self.built_from, self.built_at = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} search snapshot")
+        view = memoryview(self._mmap)
+        sections = {}
+        for i, name in enumerate(SECTIONS):
+            offset, length = _SECTION.unpack_from(self._mmap, _HEADER.size + i * _SECTION.size)
+            sections[name] = view[offset:offset + length]
+        self._ids = sections["ids"].cast("I")
+        self._fields = sections["fields"].cast("I")
+        self.lat = sections["lat"].cast("d")
+        self.lon = sections["lon"].cast("d")
+        self.rating = sections["rating"].cast("d")
+        self._terms = sections["terms"].cast("I")
+        self._postings = sections["postings"].cast("I")
+        self._strings = sections["strings"]
+
+    def _string(self, offset, length):
+        return str(self._strings[offset:offset + length], "utf-8")
+
+    def doctor_id(self, number):
+        return self._string(self._ids[2 * number], self._ids[2 * number + 1])
+
+    def field(self, number, name):
+        base = number * 2 * len(FIELDS) + 2 * FIELDS.index(name)
+        return self._string(self._fields[base], self._fields[base + 1])
+
+    def payload(self, number):
+        return json.loads(self.field(number, "payload"))
+
+    def postings(self, term):
+        """Ascending doctor numbers for a term (binary search over the term table)"""
+        key = term.encode()
+        lo, hi = 0, self.term_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.term_count and self._term(lo) == key:
+            first, count = self._terms[4 * lo + 2], self._terms[4 * lo + 3]
+            return self._postings[first:first + count]
+        return self._postings[0:0]
+
+    def _term(self, i):
+        offset, length = self._terms[4 * i], self._terms[4 * i + 1]
+        return bytes(self._strings[offset:offset + length])
+
+    def match(self, query="", city=None, area=None, specialty=None):
+        """Doctor numbers matching like the SQL filters, best rated first"""
+        filters = {"city": city, "area": area, "specialty": specialty}
+        lists = [self.postings(prefix + filters[field]) for prefix, field in FILTER_KEYS if filters[field]]
+        needle = (query or "").lower()
+        lists.extend(self.postings(f"t:{gram}") for gram in trigrams(needle))
+        if lists:
+            lists.sort(key=len)
+            smallest, rest = lists[0], lists[1:]
+            numbers = [n for n in smallest if all(_contains(other, n) for other in rest)]
+        else:
+            numbers = range(self.count)
+        if needle:
+            # Trigrams narrow it down; the substring test decides (and covers queries under 3 characters)
+            numbers = [n for n in numbers if any(needle in self.field(n, f).lower() for f in TEXT_FIELDS)]
+        return numbers
+
+
+def _contains(sorted_numbers, number):
+    i = bisect_left(sorted_numbers, number)
+    return i < len(sorted_numbers) and sorted_numbers[i] == number
+
+
+def _file_key(stat):
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+# ---- this worker's view ---------------------------------------------------
+
+_current = None
+_changed = set()  # Doctors changed since _current was built
+_changed_all = False  # Can't tell which: don't use the snapshot until the next one
+_collecting = None  # Changes heard while a new file is being mapped
+_lock = threading.Lock()
+stats = {"mapped": 0, "mapped_at": None, "built_from": None, "doctors": 0, "errors": 0}
+
+
+def _on_change(doctor_ids):
+    global _changed_all
+    with _lock:
+        if doctor_ids is None:
+            _changed_all = True
+        else:
+            _changed.update(doctor_ids)
+        if _collecting is not None:
+            _collecting.append(doctor_ids)
+
+
+def refresh():
+    """
+    Map the snapshot file if a newer one was written (scheduler job in every
+    worker), and re-read from doctor_changes which doctors changed since it
+    was built after a full invalidation.
+    """
+    global _current, _changed, _changed_all, _collecting
+    if not Config.SEARCH_SNAPSHOT_ENABLED:
+        return None
+    try:
+        key = _file_key(os.stat(Config.SEARCH_SNAPSHOT_PATH))
+    except FileNotFoundError:
+        return None
+    if _current is not None and _current.file_key == key:
+        if not _changed_all:
+            return None
+        snapshot = _current  # Same file; re-read what changed since it from the log
+    else:
+        try:
+            snapshot = Snapshot(Config.SEARCH_SNAPSHOT_PATH)
+        except (OSError, ValueError, struct.error):
+            stats["errors"] += 1
+            logger.exception("Could not map search snapshot")
+            return None
+
+    _previous = _current
+    with _lock:
+        _collecting = []
+    try:
+        changed = {doctor_id for doctor_id, in db.session.query(DoctorChange.doctor_id)
+                   .filter(DoctorChange.id > snapshot.built_from)}
+        oldest = db.session.query(func.min(DoctorChange.id)).scalar()
+        # Log rows after built_from already purged: we can't tell what changed
+        changed_all = oldest is not None and oldest > snapshot.built_from + 1
+    except Exception:
+        with _lock:
+            _collecting = None
+        raise
+
+    with _lock:
+        for doctor_ids in _collecting:
+            if doctor_ids is None:
+                changed_all = True
+            else:
+                changed.update(doctor_ids)
+        _current, _changed, _changed_all, _collecting = snapshot, changed, changed_all, None
+    if snapshot is not _previous:
+        stats.update(mapped=stats["mapped"] + 1, mapped_at=time.time(), built_from=snapshot.built_from,
+                     doctors=snapshot.count)
+    return {"doctors": snapshot.count, "built_from": snapshot.built_from, "changed_since": len(changed)}
+
+
+def view():
+    """
+    (snapshot, changed doctor ids) for a search, or (None, None) when search
+    should read the database: no snapshot yet, or too much changed since it.
+    """
+    if not Config.SEARCH_SNAPSHOT_ENABLED:
+        return None, None
+    if _current is None:
+        refresh()
+    with _lock:
+        if _current is None or _changed_all or len(_changed) > Config.SEARCH_SNAPSHOT_MAX_CHANGED:
+            return None, None
+        return _current, set(_changed)
+
+
+coherence.register("search_snapshot", _on_change)
+
+
+if __name__ == "__main__":
+    from backend.app import app
+
+    with app.app_context():
+        report = build()
+        print(f"✅ Search snapshot: {report['doctors']} doctors, {report['terms']} terms, "
+              f"{report['bytes'] / 1024:.0f} KB in {report['seconds']}s -> {Config.SEARCH_SNAPSHOT_PATH}")
@@ -0,0 +1,323 @@
+"""
+Tracing Service - Lightweight spans exported in OTLP/JSON.
+
+Spans are opened with `span()` (or the `traced` decorator) and nest through a
+context variable, so SQL statements and outbound calls made while handling a
+request become children of that request's span. Finished spans are batched by
+a background exporter and either appended to TRACING_EXPORT_PATH (one OTLP
+JSON document per line, readable by the collector's otlpjsonfile receiver) or
+POSTed to an OTLP/HTTP collector at TRACING_OTLP_ENDPOINT.
+
+Background work keeps its parent trace by running under `bind(fn)`, which
+captures the submitting thread's current span.
+"""
+
+import contextvars
+import json
+import logging
+import queue
+import random
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT = 1, 2, 3
+STATUS_OK, STATUS_ERROR = 1, 2
+
+_current = contextvars.ContextVar("samd_current_span", default=None)
+_queue = queue.Queue(maxsize=10000)
+_exporter = None
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind",
+                 "start_ns", "end_ns", "attributes", "status", "status_message")
+
+    def __init__(self, name, kind=KIND_INTERNAL, parent=None, trace_id=None, parent_id=None):
+        self.trace_id = parent.trace_id if parent else (trace_id or secrets.token_hex(16))
+        self.parent_id = parent.span_id if parent else parent_id
+        self.span_id = secrets.token_hex(8)
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = {}
+        self.status = STATUS_OK
+        self.status_message = ""
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_error(self, exc):
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(exc).__name__}: {exc}"
+
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+
+class _NoopSpan:
+    """Returned when tracing is disabled or the trace is not sampled"""
+
+    def set_attribute(self, key, value):
+        pass
+
+    def record_error(self, exc):
+        pass
+
+    def traceparent(self):
+        return None
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def enabled():
+    return Config.TRACING_ENABLED
+
+
+def current_span():
+    return _current.get()
+
+
+def start_span(name, kind=KIND_INTERNAL, traceparent=None, **attributes):
+    """
+    Start a span as a child of the current one (or of `traceparent`).
+    Returns (span, token); pass both to `end_span`.
+    """
+    parent = _current.get()
+    if not enabled() or parent is NOOP_SPAN:
+        return NOOP_SPAN, None
+
+    if parent is None:
+        trace_id, parent_id = _parse_traceparent(traceparent)
+        if trace_id is None and random.random() >= Config.TRACING_SAMPLE_RATE:
+            return NOOP_SPAN, _current.set(NOOP_SPAN)
+        span = Span(name, kind, trace_id=trace_id, parent_id=parent_id)
+    else:
+        span = Span(name, kind, parent=parent)
+    span.attributes.update(attributes)
+    return span, _current.set(span)
+
+
+def end_span(span, token):
+    if token is not None:
+        _current.reset(token)
+    if span is NOOP_SPAN:
+        return
+    span.end_ns = time.time_ns()
+    _ensure_exporter()
+    try:
+        _queue.put_nowait(span)
+    except queue.Full:
+        pass  # Dropping spans beats blocking a request
+
+
+@contextmanager
+def span(name, kind=KIND_INTERNAL, **attributes):
+    """Context manager around `start_span`/`end_span`"""
+    current, token = start_span(name, kind, **attributes)
+    try:
+        yield current
+    except Exception as e:
+        current.record_error(e)
+        raise
+    finally:
+        end_span(current, token)
+
+
+def traced(name, kind=KIND_INTERNAL):
+    """Decorator that runs the function inside a span"""
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            with span(name, kind):
+                return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def bind(fn):
+    """
+    Capture the caller's current span so `fn` continues the same trace
+    when it later runs on a worker or scheduler thread.
+
+    Only the span is carried over: copying the whole context would also
+    carry the request's Flask app/request context, and with it the
+    request's db.session, into the other thread.
+    """
+    parent = _current.get()
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = _current.set(parent)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return wrapper
+
+
+def _parse_traceparent(header):
+    """W3C traceparent: version-traceid-spanid-flags"""
+    if not header:
+        return None, None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None, None
+    return parts[1], parts[2]
+
+
+# ==================== EXPORT ====================
+
+def _attr_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _span_to_otlp(s):
+    data = {
+        "traceId": s.trace_id,
+        "spanId": s.span_id,
+        "name": s.name,
+        "kind": s.kind,
+        "startTimeUnixNano": str(s.start_ns),
+        "endTimeUnixNano": str(s.end_ns),
+        "attributes": [{"key": k, "value": _attr_value(v)} for k, v in s.attributes.items()],
+        "status": {"code": s.status, "message": s.status_message} if s.status_message else {"code": s.status},
+    }
+    if s.parent_id:
+        data["parentSpanId"] = s.parent_id
+    return data
+
+
+def to_otlp(spans):
+    """Wrap spans in an OTLP ExportTraceServiceRequest (JSON encoding)"""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [
+                {"key": "service.name", "value": {"stringValue": Config.TRACING_SERVICE_NAME}},
+            ]},
+            "scopeSpans": [{
+                "scope": {"name": "backend.services.tracing"},
+                "spans": [_span_to_otlp(s) for s in spans],
+            }],
+        }]
+    }
+
+
+def _export(spans):
+    payload = to_otlp(spans)
+    if Config.TRACING_OTLP_ENDPOINT:
+        import requests
+        requests.post(Config.TRACING_OTLP_ENDPOINT, json=payload, timeout=5)
+    else:
+        with open(Config.TRACING_EXPORT_PATH, "a") as f:
+            f.write(json.dumps(payload, separators=(",", ":")) + "\n")
+
+
+def _export_loop():
+    batch_size = 512
+    while True:
+        spans = [_queue.get()]
+        deadline = time.monotonic() + Config.TRACING_EXPORT_INTERVAL_SECONDS
+        while len(spans) < batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                spans.append(_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        try:
+            _export(spans)
+        except Exception as e:
+            logger.warning(f"Trace export failed, dropped {len(spans)} spans: {e}")
+
+
+def _ensure_exporter():
+    global _exporter
+    if _exporter is None:
+        _exporter = threading.Thread(target=_export_loop, name="trace-exporter", daemon=True)
+        _exporter.start()
+
+
+# ==================== FLASK / SQLALCHEMY HOOKS ====================
+
+def _before_request():
+    rule = request.url_rule.rule if request.url_rule else "unmatched"
+    g._trace_span, g._trace_token = start_span(
+        f"{request.method} {rule}",
+        KIND_SERVER,
+        traceparent=request.headers.get("traceparent"),
+        **{"http.method": request.method, "http.route": rule, "flask.blueprint": request.blueprint or "app"}
+    )
+
+
+def _after_request(response):
+    current = g.get("_trace_span")
+    if current is not None:
+        current.set_attribute("http.status_code", response.status_code)
+        if response.status_code >= 500:
+            current.status = STATUS_ERROR
+    return response
+
+
+def _teardown_request(exc):
+    current = g.pop("_trace_span", None)
+    if current is None:
+        return
+    if exc is not None:
+        current.record_error(exc)
+    end_span(current, g.pop("_trace_token", None))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is None:
+        return  # Only trace SQL issued inside a traced operation
+    sql_span, token = start_span("db.query", KIND_CLIENT, **{
+        "db.system": conn.engine.dialect.name,
+        "db.statement": statement[:1000],
+    })
+    if executemany:
+        sql_span.set_attribute("db.executemany", True)
+    conn.info.setdefault("_trace_spans", []).append((sql_span, token))
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stack = conn.info.get("_trace_spans")
+    if stack:
+        end_span(*stack.pop())
+
+
+def _handle_error(exception_context):
+    stack = exception_context.connection.info.get("_trace_spans") if exception_context.connection else None
+    if stack:
+        sql_span, token = stack.pop()
+        sql_span.record_error(exception_context.original_exception)
+        end_span(sql_span, token)
+
+
+def init_app(app):
+    """Register request and SQL span hooks (no-op unless TRACING_ENABLED)"""
+    if not enabled():
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_error)
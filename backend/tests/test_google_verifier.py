@@ -0,0 +1,165 @@
+"""
+Google ID token verifier against a locally generated key set: no network,
+the JWKS fetch is injected and the clock is controlled.
+"""
+
+import json
+import time
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from backend.auth import google_verifier
+from backend.auth.google_verifier import GoogleTokenVerifier, JWKSCache
+
+CLIENT_ID = "test-client.apps.googleusercontent.com"
+
+
+class Clock:
+    def __init__(self):
+        self.now = time.time()
+
+    def time(self):
+        return self.now
+
+
+class KeySet:
+    """RSA keys by kid, served as a JWKS by fetch()"""
+
+    def __init__(self, max_age=3600):
+        self.private = {}
+        self.published = []
+        self.max_age = max_age
+        self.fetches = 0
+        self.fail = False
+
+    def add(self, kid, publish=True):
+        self.private[kid] = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        if publish:
+            self.publish(kid)
+
+    def publish(self, kid):
+        jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(self.private[kid].public_key()))
+        self.published.append({**jwk, "kid": kid, "alg": "RS256", "use": "sig"})
+
+    def fetch(self):
+        self.fetches += 1
+        if self.fail:
+            raise ConnectionError("JWKS unavailable")
+        return {"keys": list(self.published)}, self.max_age
+
+    def token(self, kid, **overrides):
+        now = int(time.time())
+        claims = {"iss": "https://accounts.google.com", "aud": CLIENT_ID, "sub": "1234567890",
+                  "email": "doc@example.com", "iat": now, "exp": now + 3600, **overrides}
+        return jwt.encode(claims, self.private[kid], algorithm="RS256", headers={"kid": kid})
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(google_verifier, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def keys():
+    keys = KeySet()
+    keys.add("k1")
+    return keys
+
+
+@pytest.fixture
+def verifier(keys, clock):
+    return GoogleTokenVerifier(CLIENT_ID, jwks=JWKSCache(fetch=keys.fetch))
+
+
+def test_valid_token(verifier, keys):
+    claims, from_cache = verifier.verify(keys.token("k1"))
+
+    assert claims["sub"] == "1234567890"
+    assert claims["email"] == "doc@example.com"
+    assert from_cache is False
+
+
+def test_wrong_audience(verifier, keys):
+    with pytest.raises(jwt.InvalidAudienceError):
+        verifier.verify(keys.token("k1", aud="someone-else"))
+
+
+def test_wrong_issuer(verifier, keys):
+    with pytest.raises(jwt.InvalidIssuerError):
+        verifier.verify(keys.token("k1", iss="https://evil.example.com"))
+
+
+def test_expired_token(verifier, keys):
+    now = int(time.time())
+    with pytest.raises(jwt.ExpiredSignatureError):
+        verifier.verify(keys.token("k1", iat=now - 7200, exp=now - 3600))
+
+
+def test_bad_signature(verifier, keys):
+    keys.add("k2", publish=False)
+    header, payload, _ = keys.token("k1").split(".")
+    forged = ".".join([header, payload, keys.token("k2").split(".")[2]])
+    with pytest.raises(jwt.InvalidSignatureError):
+        verifier.verify(forged)
+
+
+def test_unknown_kid_refresh_is_rate_limited(verifier, keys, clock):
+    verifier.verify(keys.token("k1"))
+    assert keys.fetches == 1
+
+    # Google rotated in k2 just after our fetch: no second fetch within JWKS_MIN_REFRESH_SECONDS
+    keys.add("k2")
+    with pytest.raises(jwt.InvalidTokenError, match="Unknown signing key"):
+        verifier.verify(keys.token("k2"))
+    assert keys.fetches == 1
+
+    clock.now += google_verifier.JWKS_MIN_REFRESH_SECONDS + 1
+    claims, _ = verifier.verify(keys.token("k2"))
+    assert claims["sub"] == "1234567890"
+    assert keys.fetches == 2
+
+
+def test_keys_refetched_after_max_age(verifier, keys, clock):
+    keys.max_age = 100
+    verifier.verify(keys.token("k1", sub="a"))
+    verifier.verify(keys.token("k1", sub="b"))
+    assert keys.fetches == 1
+
+    clock.now += 101
+    verifier.verify(keys.token("k1", sub="c"))
+    assert keys.fetches == 2
+
+
+def test_cached_keys_served_when_refresh_fails(verifier, keys, clock):
+    keys.max_age = 100
+    verifier.verify(keys.token("k1", sub="a"))
+
+    keys.fail = True
+    clock.now += 101
+    claims, _ = verifier.verify(keys.token("k1", sub="b"))
+    assert claims["sub"] == "b"
+    assert keys.fetches == 2
+
+    # The failed refresh backs off instead of hitting the JWKS endpoint on every login
+    verifier.verify(keys.token("k1", sub="c"))
+    assert keys.fetches == 2
+
+
+def test_refresh_failure_without_cached_keys_raises(verifier, keys):
+    keys.fail = True
+    with pytest.raises(ConnectionError):
+        verifier.verify(keys.token("k1"))
+
+
+def test_verified_token_cache_hit(verifier, keys):
+    token = keys.token("k1")
+    first, from_cache = verifier.verify(token)
+    assert from_cache is False
+
+    keys.fail = True  # A cache hit needs neither the keys nor a signature check
+    second, from_cache = verifier.verify(token)
+    assert from_cache is True
+    assert second == first
+    assert keys.fetches == 1
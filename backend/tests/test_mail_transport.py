@@ -0,0 +1,65 @@
+"""
+Pooled SMTP transport against the local stand-in (backend/tools/mock_smtp.py).
+Needs aiosmtpd: pip install aiosmtpd
+"""
+
+import socket
+from email.message import EmailMessage
+import pytest
+
+pytest.importorskip("aiosmtpd")
+
+from backend.services import circuit_breaker
+from backend.services.mail_transport import SMTPPool
+from backend.tools import mock_smtp
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _message(to):
+    msg = EmailMessage()
+    msg["From"] = "dev@localhost"
+    msg["To"] = to
+    msg["Subject"] = "Your login link"
+    msg.set_content("https://example.invalid/magic")
+    return msg
+
+
+@pytest.fixture
+def smtp_server():
+    port = _free_port()
+    controller, handler = mock_smtp.start(port, reject=["bad@example.com"])
+    circuit_breaker.reset("smtp")
+    yield port, handler
+    controller.stop()
+
+
+def test_batch_reuses_one_connection(smtp_server):
+    port, handler = smtp_server
+    pool = SMTPPool("127.0.0.1", port, use_tls=False, size=1)
+
+    assert pool.send_batch([_message("a@example.com"), _message("b@example.com")]) == [(True, None)] * 2
+    assert pool.send(_message("c@example.com")) == (True, None)
+
+    assert len(handler.messages) == 3
+    assert pool.stats["connects"] == 1
+    pool.close_all()
+
+
+def test_rejected_recipient_fails_only_that_message(smtp_server):
+    port, handler = smtp_server
+    pool = SMTPPool("127.0.0.1", port, use_tls=False, size=1)
+    batch = [_message(to) for to in ("ok1@example.com", "bad@example.com", "ok2@example.com", "ok3@example.com")]
+
+    results = pool.send_batch(batch)
+
+    assert [ok for ok, _ in results] == [True, False, True, True]
+    assert "550" in results[1][1]
+    assert [rcpt for _, (rcpt,), _ in handler.messages] == ["ok1@example.com", "ok2@example.com", "ok3@example.com"]
+    assert pool.stats["connects"] == 1 and pool.stats["reconnects"] == 0
+    assert circuit_breaker.get("smtp").to_dict()["window_failures"] == 0
+    pool.close_all()
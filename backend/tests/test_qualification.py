@@ -0,0 +1,46 @@
+"""
+Qualification -> specialty regression table. The inputs are spellings
+from the association's sheet (and a few edge cases) that earlier matchers
+got wrong.
+"""
+
+import pytest
+
+from backend.normalization.qualification import DEFAULT_SPECIALTY, normalize_qualification
+
+CASES = [
+    # Dotted initials, including a stray double dot
+    ("M.B.B.S.", "General Physician"),
+    ("B. H. M. S", "Homeopathic Physician"),
+    ("B.H..M.S", "Homeopathic Physician"),
+    # Degrees match whole words: no MS inside BAMS, no MD inside MDS
+    ("BAMS", "Ayurvedic Physician"),
+    ("BUMS", "Unani Physician"),
+    ("MDS Endodontist", "Dental Specialist"),
+    ("MD (Hom)", "Homeopathic Specialist"),
+    # Spelled-out dental degrees; "ENT" is not found inside "DENTAL"
+    ("Bachelor of dental surgeon", "Dentist"),
+    ("Bachelor of Dental Surgery", "Dentist"),
+    ("Bachlor Of Dental Surgeon & Diploma Of Cosmetology", "Dentist"),
+    ("B.D.S (Bachelor of Dental Surgery)", "Dentist"),
+    ("MDS (Conservative Dentistry)", "Dental Specialist"),
+    ("BDS, MDS Orthodontics", "Dental Specialist"),
+    # Specialty keywords outrank the degree
+    ("MBBS MS OBGYN", "Gynecologist"),
+    ("MBBS, MS (OBG)", "Gynecologist"),
+    ("MBBS, DGO, Gynaecologist", "Gynecologist"),
+    ("MS Ortho", "Orthopedic"),
+    ("MBBS DNB ENT", "ENT Specialist"),
+    ("MBBS, MS", "Surgeon"),
+    ("PARENTERAL nutrition", DEFAULT_SPECIALTY),
+]
+
+
+@pytest.mark.parametrize("qualification, specialty", CASES)
+def test_normalize_qualification(qualification, specialty):
+    assert normalize_qualification(qualification) == specialty
+
+
+@pytest.mark.parametrize("empty", [None, "", float("nan")])
+def test_empty_qualification(empty):
+    assert normalize_qualification(empty) == DEFAULT_SPECIALTY
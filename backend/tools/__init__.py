@@ -0,0 +1 @@
+# Development tools: local stand-in servers and benchmarks
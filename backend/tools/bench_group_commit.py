@@ -0,0 +1,132 @@
+"""
+Benchmark SQLite writes: a commit per request vs the group-commit writer.
+
+Request threads each insert otp_sessions rows (what request-otp does with
+the sqlite challenge store), first with every thread committing its own
+transaction, then through group_commit.run(). Reports writes/sec, latency
+and "database is locked" failures for both, plus how many writes the
+writer packed into each transaction.
+
+Runs against a scratch database file (never the app's samd.db) in --dir;
+put it on the disk the app uses, since fsync cost is what grouping saves
+and a tmpfs makes every commit nearly free. --processes adds worker
+processes writing to the same file, like gunicorn workers.
+
+Usage: python -m backend.tools.bench_group_commit [--threads 8] [--writes 200] [--processes 1] [--dir DIR]
+"""
+
+import argparse
+import multiprocessing
+import os
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from backend.config import Config
+
+
+def _create_table(path):
+    """Scratch schema, without importing the app (workers build theirs on this file)"""
+    from sqlalchemy import create_engine
+    from backend.models.session import OTPSession
+    engine = create_engine(f"sqlite:///{path}")
+    OTPSession.__table__.create(engine)
+    engine.dispose()
+
+
+def _setup(path):
+    Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+    Config.SCHEDULER_ENABLED = False
+    from backend.app import app
+    return app
+
+
+def _row():
+    from backend.models.session import OTPSession
+    return OTPSession(id=str(uuid.uuid4()), mobile_number="+919876543210", otp_hash="0" * 64,
+                      expires_at=datetime.utcnow() + timedelta(minutes=5))
+
+
+def _worker(app, grouped, writes, latencies, errors):
+    from backend.database import db
+    from backend.services import group_commit
+    with app.app_context():
+        for _ in range(writes):
+            started = time.perf_counter()
+            try:
+                if grouped:
+                    group_commit.run(lambda session: session.add(_row()))
+                else:
+                    db.session.add(_row())
+                    db.session.commit()
+                latencies.append((time.perf_counter() - started) * 1000)
+            except Exception as e:
+                db.session.rollback()
+                errors.append(type(e).__name__ + (": locked" if "locked" in str(e) else ""))
+
+
+def _process(path, grouped, threads, writes, results):
+    app = _setup(path)
+    Config.GROUP_COMMIT_ENABLED = grouped
+    latencies, errors = [], []
+    started = time.time()
+    workers = [threading.Thread(target=_worker, args=(app, grouped, writes, latencies, errors)) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    finished = time.time()
+    from backend.services import group_commit
+    results.put((latencies, errors, dict(group_commit.stats), started, finished))
+
+
+def bench(label, path, grouped, threads, writes, processes):
+    context = multiprocessing.get_context("spawn")  # Fresh interpreter: the app binds to this file
+    results = context.Queue()
+    procs = [context.Process(target=_process, args=(path, grouped, threads, writes, results))
+             for _ in range(processes)]
+    for proc in procs:
+        proc.start()
+    outcomes = [results.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+    # Writing time only, not interpreter start-up
+    seconds = max(outcome[4] for outcome in outcomes) - min(outcome[3] for outcome in outcomes)
+
+    latencies = sorted(l for outcome in outcomes for l in outcome[0])
+    errors = [e for outcome in outcomes for e in outcome[1]]
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0
+    print(f"{label:<22} {len(latencies) / seconds:>9,.0f} writes/sec   "
+          f"p50 {statistics.median(latencies) if latencies else 0:6.1f} ms   p95 {p95:6.1f} ms   "
+          f"failed {len(errors)}")
+    if errors:
+        print(f"{'':<22} e.g. {errors[0]}")
+    transactions = sum(outcome[2]["transactions"] for outcome in outcomes)
+    if grouped and transactions:
+        units = sum(outcome[2]["units"] for outcome in outcomes)
+        print(f"{'':<22} {transactions} transactions, {units / transactions:.1f} writes each, "
+              f"largest {max(outcome[2]['largest_batch'] for outcome in outcomes)}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=8, help="request threads per process")
+    parser.add_argument("--writes", type=int, default=200, help="writes per thread")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--dir", default=Config.BASE_DIR, help="where the scratch database is created")
+    args = parser.parse_args()
+
+    total = args.threads * args.writes * args.processes
+    print(f"{args.processes} process(es) x {args.threads} threads x {args.writes} writes = {total} writes, "
+          f"window {Config.GROUP_COMMIT_WINDOW_MS} ms\n")
+    with tempfile.TemporaryDirectory(dir=args.dir) as scratch:
+        for label, grouped in (("commit per request", False), ("group commit", True)):
+            path = os.path.join(scratch, f"{'grouped' if grouped else 'direct'}.db")
+            _create_table(path)
+            bench(label, path, grouped, args.threads, args.writes, args.processes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark OTP send latency against the local mock gateway.
+
+Compares:
+- per-request connections (the old bare requests.post behaviour)
+- the pooled keep-alive session in otp_service
+- hedged mode with a slow WhatsApp leg
+
+The mock speaks plain HTTP on localhost, so the pooled numbers understate the
+saving against the real gateway, where every new connection also pays TLS.
+
+Usage: python -m backend.tools.bench_otp_send [--sends 200] [--whatsapp-ms 20] [--sms-ms 20]
+"""
+
+import argparse
+import statistics
+import time
+import requests
+from backend.app import app
+from backend.services import otp_service
+from backend.tools.mock_mtalkz import MockGateway
+
+
+def _summary(label, samples, gateway):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<28} mean {statistics.mean(samples):7.1f} ms   "
+          f"p50 {statistics.median(samples):7.1f} ms   p95 {p95:7.1f} ms   "
+          f"connections {gateway.connections}")
+
+
+def bench_unpooled(gateway, sends):
+    samples = []
+    for i in range(sends):
+        started = time.perf_counter()
+        requests.post(f"{gateway.base_url}/v2/whatsapp/send", json={"to": i}, timeout=10)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def bench_send_otp(sends):
+    samples = []
+    with app.app_context():
+        for _ in range(sends):
+            started = time.perf_counter()
+            result = otp_service.send_otp("9876543210", "123456")
+            assert result["success"], result
+            samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sends", type=int, default=200)
+    parser.add_argument("--whatsapp-ms", type=int, default=20)
+    parser.add_argument("--sms-ms", type=int, default=20)
+    args = parser.parse_args()
+
+    app.config["MTALKZ_API_KEY"] = "bench"
+    print(f"{args.sends} sends, WhatsApp {args.whatsapp_ms} ms, SMS {args.sms_ms} ms server time\n")
+
+    gateway = MockGateway(whatsapp_ms=args.whatsapp_ms, sms_ms=args.sms_ms).start()
+    _summary("new connection per send", bench_unpooled(gateway, args.sends), gateway)
+    gateway.shutdown()
+
+    gateway = MockGateway(whatsapp_ms=args.whatsapp_ms, sms_ms=args.sms_ms).start()
+    app.config.update(MTALKZ_BASE_URL=gateway.base_url, MTALKZ_HEDGED=False)
+    _summary("pooled session", bench_send_otp(args.sends), gateway)
+    gateway.shutdown()
+
+    # Hedging only matters when WhatsApp is slow: make it 10x the SMS leg
+    slow_ms = args.sms_ms * 10
+    hedge_ms = args.sms_ms * 2
+    gateway = MockGateway(whatsapp_ms=slow_ms, sms_ms=args.sms_ms).start()
+    otp_service._session = None  # New gateway port, fresh pool
+    app.config.update(MTALKZ_BASE_URL=gateway.base_url, MTALKZ_HEDGED=False)
+    sends = max(10, args.sends // 10)
+    _summary(f"sequential, WhatsApp {slow_ms} ms", bench_send_otp(sends), gateway)
+    app.config.update(MTALKZ_HEDGED=True, MTALKZ_HEDGE_MS=hedge_ms)
+    _summary(f"hedged after {hedge_ms} ms", bench_send_otp(sends), gateway)
+    gateway.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark qualification -> specialty normalization.
+
+Compares, over synthetic qualification strings built the way members type
+them ("M.B.B.S., MD (Paed)", "bds dental surgeon", ...):
+- the old two-loop substring scan (dict order decides precedence)
+- the compiled matcher without its memo
+- normalize_qualification() with the LRU memo (what importers and routes use)
+
+Also counts the strings on which old and new disagree, with a few examples,
+so a change in the priority rules is visible before it reaches the data.
+
+The memo only pays off when spellings repeat, as they do in a member sheet;
+--distinct 0 makes every row unique to show the matcher's raw cost.
+
+Usage: python -m backend.tools.bench_qualification [--rows 1000000] [--distinct 2000] [--seed 7]
+"""
+
+import argparse
+import random
+import time
+from backend.normalization import qualification
+from backend.normalization.qualification import normalize_qualification
+
+# The pre-compiled-matcher tables and loop, in their original dict order
+LEGACY_DEGREES = {
+    'MBBS': 'General Physician', 'MD': 'Specialist', 'MS': 'Surgeon', 'DNB': 'Specialist',
+    'DM': 'Super Specialist', 'MCH': 'Super Specialist', 'BDS': 'Dentist', 'MDS': 'Dental Specialist',
+    'BAMS': 'Ayurvedic Physician', 'MD (AYU)': 'Ayurvedic Specialist', 'BHMS': 'Homeopathic Physician',
+    'MD (HOM)': 'Homeopathic Specialist', 'BPT': 'Physiotherapist', 'B.P.T': 'Physiotherapist',
+    'MPT': 'Physiotherapy Specialist', 'B.SC NURSING': 'Nurse', 'GNM': 'Nurse', 'B.PHARM': 'Pharmacist',
+    'M.PHARM': 'Pharmacist', 'BUMS': 'Unani Physician', 'BNYS': 'Naturopathy & Yoga',
+}
+LEGACY_KEYWORDS = {
+    **qualification.SPECIALTY_KEYWORDS, 'SURG': 'Surgeon', 'PHYSICIAN': 'General Physician',
+}
+
+
+def legacy_normalize(qual_str):
+    if not qual_str or qual_str != qual_str:
+        return 'General Physician'
+    qual_upper = str(qual_str).upper().strip()
+    for keyword, specialty in LEGACY_KEYWORDS.items():
+        if keyword in qual_upper:
+            return specialty
+    for degree, specialty in LEGACY_DEGREES.items():
+        if degree in qual_upper:
+            return specialty
+    return 'General Physician'
+
+
+DEGREES = ["MBBS", "M.B.B.S.", "MD", "M.D.", "MS", "DNB", "DM", "MCh", "BDS", "MDS", "BAMS", "BHMS",
+           "MD (Ayu)", "MD (Hom)", "BPT", "B.P.T", "MPT", "B.Sc Nursing", "GNM", "B.Pharm", "BUMS", "BNYS"]
+SUFFIXES = ["", "", "", "(Paed)", "Medicine", "Ortho", "Orthodontics", "General Surgeon", "Dental Surgeon",
+            "Gynec & Obst", "Cardiology", "Dermatology", "ENT", "Ophthalmology", "Physician", "Psychiatry",
+            "Radiology", "Anesthesia", "Pathology", "Neurology"]
+
+
+def _random_qualification(rng):
+    degrees = rng.sample(DEGREES, rng.choice((1, 1, 2, 3)))
+    text = rng.choice((", ", " ", " / ")).join(degrees)
+    suffix = rng.choice(SUFFIXES)
+    text = f"{text} {suffix}".strip()
+    return rng.choice((str.upper, str.lower, str.title, lambda s: s))(text)
+
+
+def synthetic(rows, seed, distinct):
+    """rows strings drawn from a pool of `distinct` spellings (0 = every row freshly generated)"""
+    rng = random.Random(seed)
+    if not distinct:
+        return [_random_qualification(rng) for _ in range(rows)]
+    pool = [_random_qualification(rng) for _ in range(distinct)]
+    return [rng.choice(pool) for _ in range(rows)]
+
+
+def _time(label, fn, values):
+    started = time.perf_counter()
+    for value in values:
+        fn(value)
+    seconds = time.perf_counter() - started
+    print(f"{label:<30} {seconds:7.2f} s   {len(values) / seconds:>12,.0f} rows/sec")
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--distinct", type=int, default=2000,
+                        help="distinct spellings, like a real member sheet; 0 = all rows random")
+    args = parser.parse_args()
+
+    values = synthetic(args.rows, args.seed, args.distinct)
+    print(f"{len(values):,} qualification strings, {len(set(values)):,} distinct\n")
+
+    uncached = qualification._match.__wrapped__
+    _time("legacy substring loops", legacy_normalize, values)
+    _time("compiled matcher, no memo", lambda v: uncached(str(v).upper().strip()), values)
+    qualification._match.cache_clear()
+    _time("normalize_qualification", normalize_qualification, values)
+    info = qualification._match.cache_info()
+    print(f"\nmemo: {info.hits:,} hits, {info.misses:,} misses, {info.currsize:,} entries")
+
+    changed = {}
+    for value in set(values):
+        old, new = legacy_normalize(value), normalize_qualification(value)
+        if old != new:
+            changed[value] = (old, new)
+    print(f"{len(changed):,} distinct strings map differently from the legacy loops, e.g.:")
+    for value, (old, new) in sorted(changed.items())[:10]:
+        print(f"  {value!r}: {old} -> {new}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Local mock of the mTalkz WhatsApp/SMS gateway for tests and benchmarks.
+
+Answers POST /v2/whatsapp/send and /v2/sendmessage with {"status": "success"}
+after a configurable delay, or fails a configurable fraction of requests.
+Speaks HTTP/1.1 keep-alive so connection reuse shows up in benchmarks.
+
+Usage: python -m backend.tools.mock_mtalkz [--port 8765] [--whatsapp-ms 300]
+                                            [--sms-ms 100] [--fail-rate 0.0]
+Then:  MTALKZ_BASE_URL=http://127.0.0.1:8765 MTALKZ_API_KEY=test
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROUTES = {"/v2/whatsapp/send": "whatsapp", "/v2/sendmessage": "sms"}
+
+
+class MockGateway(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, whatsapp_ms=300, sms_ms=100, fail_rate=0.0):
+        super().__init__(("127.0.0.1", port), MockGatewayHandler)
+        self.latency = {"whatsapp": whatsapp_ms / 1000.0, "sms": sms_ms / 1000.0}
+        self.fail_rate = fail_rate
+        self.requests = {"whatsapp": 0, "sms": 0}
+        self.connections = 0
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        """Serve on a daemon thread; returns self"""
+        threading.Thread(target=self.serve_forever, name="mock-mtalkz", daemon=True).start()
+        return self
+
+
+class MockGatewayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    wbufsize = -1  # Send headers and body in one segment (avoids delayed-ACK stalls)
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        channel = ROUTES.get(self.path)
+        if channel is None:
+            return self._reply(404, {"status": "error", "message": "not found"})
+
+        self.server.requests[channel] += 1
+        time.sleep(self.server.latency[channel])
+        if random.random() < self.server.fail_rate:
+            return self._reply(200, {"status": "error", "message": "simulated failure"})
+        self._reply(200, {"status": "success", "channel": channel})
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--whatsapp-ms", type=int, default=300)
+    parser.add_argument("--sms-ms", type=int, default=100)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = MockGateway(args.port, args.whatsapp_ms, args.sms_ms, args.fail_rate)
+    print(f"Mock mTalkz gateway on {server.base_url}")
+    server.serve_forever()
@@ -0,0 +1,64 @@
+"""
+Local SMTP stand-in for testing the pooled mail transport.
+
+Accepts everything, keeps received messages in memory and counts sessions,
+so connection reuse is visible. Recipients passed as `reject` are refused
+with 550, like a mailbox that doesn't exist. Needs aiosmtpd (pip install
+aiosmtpd); it is a development-only dependency.
+
+Usage: python -m backend.tools.mock_smtp [port] [rejected@address ...]   (default 8025)
+Then:  SMTP_HOST=127.0.0.1 SMTP_PORT=8025 SMTP_USE_TLS=False SMTP_USER= MAIL_FROM=dev@localhost EMAIL_SERVICE_ENABLED=True
+"""
+
+import sys
+import time
+
+
+class RecordingHandler:
+    def __init__(self, reject=()):
+        self.messages = []
+        self.sessions = 0
+        self.reject = {address.lower() for address in reject}
+        self.rejected = []
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sessions += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.lower() in self.reject:
+            self.rejected.append(address)
+            return "550 5.1.1 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((envelope.mail_from, list(envelope.rcpt_tos), envelope.content))
+        return "250 Message accepted"
+
+
+def start(port=8025, reject=()):
+    """Start the stand-in on a background thread; returns (controller, handler)"""
+    try:
+        from aiosmtpd.controller import Controller
+    except ImportError:
+        raise SystemExit("mock_smtp needs aiosmtpd: pip install aiosmtpd")
+
+    handler = RecordingHandler(reject)
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    return controller, handler
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8025
+    controller, handler = start(port, reject=sys.argv[2:])
+    print(f"SMTP stand-in listening on 127.0.0.1:{port}")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"{len(handler.messages)} messages over {handler.sessions} sessions, "
+                  f"{len(handler.rejected)} recipients rejected")
+    except KeyboardInterrupt:
+        controller.stop()
@@ -0,0 +1,134 @@
+"""
+Local Redis-protocol stand-in for development and tests.
+
+Implements just the commands the shared backends use (strings with expiry,
+INCR/DECR, SET NX/XX PX, GETDEL). Not persistent, not for production.
+
+Usage: python -m backend.tools.resp_server [port]   (default 6379)
+Then:  RATE_LIMIT_BACKEND=redis://localhost:6379/0
+"""
+
+import socketserver
+import sys
+import threading
+import time
+
+_data = {}  # key -> (value, expires_at or None)
+_lock = threading.Lock()
+
+
+def _get(key):
+    item = _data.get(key)
+    if item is None:
+        return None
+    value, expires_at = item
+    if expires_at is not None and time.time() >= expires_at:
+        del _data[key]
+        return None
+    return value
+
+
+def _incr(key, amount):
+    item = _data.get(key)
+    current = int(_get(key) or 0) + amount
+    expires_at = item[1] if item and key in _data else None
+    _data[key] = (str(current), expires_at)
+    return current
+
+
+def _set(args):
+    key, value = args[0], args[1]
+    options = [a.upper() for a in args[2:]]
+    expires_at = None
+    for flag, scale in (("PX", 1000.0), ("EX", 1.0)):
+        if flag in options:
+            expires_at = time.time() + float(args[2 + options.index(flag) + 1]) / scale
+    exists = _get(key) is not None
+    if ("NX" in options and exists) or ("XX" in options and not exists):
+        return None
+    _data[key] = (value, expires_at)
+    return "OK"
+
+
+def execute(command, args):
+    """Run one command under the global lock; returns a Python reply value"""
+    with _lock:
+        if command == "PING":
+            return "PONG"
+        if command in ("SELECT", "AUTH"):
+            return "OK"
+        if command == "GET":
+            return _get(args[0])
+        if command == "SET":
+            return _set(args)
+        if command == "GETDEL":
+            value = _get(args[0])
+            _data.pop(args[0], None)
+            return value
+        if command == "DEL":
+            return sum(1 for key in args if _data.pop(key, None) is not None)
+        if command in ("INCR", "DECR"):
+            return _incr(args[0], 1 if command == "INCR" else -1)
+        if command == "INCRBY":
+            return _incr(args[0], int(args[1]))
+        if command in ("PEXPIRE", "EXPIRE"):
+            value = _get(args[0])
+            if value is None:
+                return 0
+            scale = 1000.0 if command == "PEXPIRE" else 1.0
+            _data[args[0]] = (value, time.time() + float(args[1]) / scale)
+            return 1
+        if command == "PTTL":
+            item = _data.get(args[0])
+            if _get(args[0]) is None:
+                return -2
+            return -1 if item[1] is None else int((item[1] - time.time()) * 1000)
+        if command == "FLUSHALL":
+            _data.clear()
+            return "OK"
+    raise ValueError(f"unknown command '{command}'")
+
+
+def _encode(value):
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if value in ("OK", "PONG"):
+        return f"+{value}\r\n".encode()
+    data = value.encode()
+    return b"$%d\r\n%s\r\n" % (len(data), data)
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            if not line.startswith(b"*"):
+                continue
+            args = []
+            for _ in range(int(line[1:-2])):
+                length = int(self.rfile.readline()[1:-2])
+                args.append(self.rfile.read(length + 2)[:-2].decode())
+            try:
+                reply = _encode(execute(args[0].upper(), args[1:]))
+            except (ValueError, IndexError) as e:
+                reply = f"-ERR {e}\r\n".encode()
+            self.wfile.write(reply)
+
+
+class RespServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+def serve(port=6379, host="127.0.0.1"):
+    server = RespServer((host, port), RespHandler)
+    print(f"RESP stand-in listening on {host}:{port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    serve(int(sys.argv[1]) if len(sys.argv) > 1 else 6379)